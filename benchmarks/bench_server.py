@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Benchmark server: boots make_app() on top of the fake backend
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Started by http_bench.py as a child process, so the load generator doesn't
+# share the event loop (nor the RSS) with the server being measured.
+#
+# Usage: bench_server.py <port> <fake_root> <routes_json_fpath>
+# ------------------------------------------------------------------------------
+
+import os
+import sys
+import json
+import signal
+import asyncio
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    port = int(sys.argv[1])
+    os.environ['ZYNTHIAN_WEBCONF_FAKE_BACKEND'] = "1"
+    os.environ['ZYNTHIAN_WEBCONF_FAKE_ROOT'] = sys.argv[2]
+    os.environ.setdefault('ZYNTHIAN_WEBCONF_LOG_LEVEL', "40")
+
+    # Templates & static paths are relative to the repo dir
+    os.chdir(REPO_DIR)
+    sys.path.insert(0, REPO_DIR)
+
+    from terminado import SingleTermManager
+    import zynthian_webconf as webconf
+    from lib.tmp_storage import tmp_storage
+
+    webconf.term_manager = SingleTermManager(shell_command=['./zynbash.sh'])
+    tmp_storage.init()
+    app = webconf.make_app()
+
+    # Dump the route table, so the driver can check its coverage
+    with open(sys.argv[3], "w") as fh:
+        json.dump([rule.matcher.regex.pattern for rule in app.wildcard_router.rules], fh)
+
+    async def serve():
+        app.listen(port, address="127.0.0.1", max_body_size=webconf.MAX_STREAMED_SIZE)
+        webconf.stall_monitor.start()
+        from lib.engine_registry import engine_registry
+        engine_registry.load()
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        await stop.wait()
+        await webconf.term_manager.shutdown()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Compare two HTTP benchmark results files
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Usage: compare.py <base.json> <new.json> [--threshold PERCENT]
+#
+# Prints the p50/p95/p99 & throughput change of every scenario. Exits with
+# code 1 when some p95 got slower than the threshold, so it can gate CI.
+# ------------------------------------------------------------------------------
+
+import sys
+import json
+import argparse
+
+
+def delta(base, new):
+    if not base or new is None:
+        return None
+    return 100.0 * (new - base) / base
+
+
+def fmt_delta(d):
+    return "-" if d is None else "{:+.1f}%".format(d)
+
+
+def describe(results):
+    git = results.get('meta', {}).get('git', {})
+    return "{} {}".format((git.get('commit') or "unknown")[:10], "(dirty)" if git.get('dirty') else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare webconf benchmark results")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("-t", "--threshold", type=float, default=10.0,
+                        help="p95 slowdown, in percent, reported as a regression (default 10)")
+    args = parser.parse_args()
+
+    with open(args.base) as fh:
+        base = json.load(fh)
+    with open(args.new) as fh:
+        new = json.load(fh)
+
+    print("base: {}\nnew:  {}\n".format(describe(base), describe(new)))
+    print("{:<18} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9}  {}".format(
+        "scenario", "p50 ms", "p50", "p95 ms", "p95", "p99", "req/s", ""))
+
+    regressions = []
+    for name, r in new['scenarios'].items():
+        b = base['scenarios'].get(name)
+        if not b:
+            print("{:<18} (new scenario)".format(name))
+            continue
+        d50 = delta(b['latency_ms']['p50'], r['latency_ms']['p50'])
+        d95 = delta(b['latency_ms']['p95'], r['latency_ms']['p95'])
+        d99 = delta(b['latency_ms']['p99'], r['latency_ms']['p99'])
+        drps = delta(b['throughput_rps'], r['throughput_rps'])
+        flag = ""
+        if d95 is not None and d95 > args.threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif r['errors'] > b['errors']:
+            flag = "MORE ERRORS"
+            regressions.append(name)
+        p50 = r['latency_ms']['p50']
+        p95 = r['latency_ms']['p95']
+        print("{:<18} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9}  {}".format(
+            name, "-" if p50 is None else "{:.1f}".format(p50), fmt_delta(d50),
+            "-" if p95 is None else "{:.1f}".format(p95), fmt_delta(d95),
+            fmt_delta(d99), fmt_delta(drps), flag))
+
+    for name in base['scenarios']:
+        if name not in new['scenarios']:
+            print("{:<18} (missing in new results)".format(name))
+
+    rss_base = base['rss']['peak']
+    rss_new = new['rss']['peak']
+    print("\nRSS peak: {:.1f} MB => {:.1f} MB ({})".format(
+        rss_base / 1048576.0, rss_new / 1048576.0, fmt_delta(delta(rss_base, rss_new))))
+
+    if regressions:
+        print("\n{} regression(s): {}".format(len(regressions), ", ".join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+
+# ------------------------------------------------------------------------------
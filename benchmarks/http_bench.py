@@ -0,0 +1,468 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# HTTP Benchmark Suite
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Boots webconf (make_app() on the fake backend) in a child process, drives
+# the routes with concurrent clients and reports latency percentiles,
+# throughput & server RSS. Results are saved as JSON, to be compared across
+# commits with compare.py.
+# ------------------------------------------------------------------------------
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import base64
+import socket
+import shutil
+import asyncio
+import platform
+import argparse
+import tempfile
+import subprocess
+from urllib.parse import quote, urlencode
+
+import psutil
+import tornado
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+DEFAULT_PASSWORD = "opensynth"
+RSS_SAMPLE_PERIOD = 0.05
+
+# ------------------------------------------------------------------------------
+# Scenarios: (name, method, path, body). Paths with "{...}" are filled with
+# targets from the fake data tree.
+# ------------------------------------------------------------------------------
+
+SCENARIOS = [
+    ("dashboard", "GET", "/", None),
+    ("login", "GET", "/login", None),
+    ("lib-snapshot", "GET", "/lib-snapshot", None),
+    ("lib-presets", "GET", "/lib-presets", None),
+    ("lib-presets-tree", "GET", "/lib-presets/get_tree?ENGINE=ZY", None),
+    ("lib-captures", "GET", "/lib-captures", None),
+    ("hw-kit", "GET", "/hw-kit", None),
+    ("hw-audio", "GET", "/hw-audio", None),
+    ("hw-display", "GET", "/hw-display", None),
+    ("hw-wiring", "GET", "/hw-wiring", None),
+    ("hw-options", "GET", "/hw-options", None),
+    ("sw-update", "GET", "/sw-update", None),
+    ("sw-pianoteq", "GET", "/sw-pianoteq", None),
+    ("sw-dsp56300", "GET", "/sw-dsp56300", None),
+    ("sw-engines", "GET", "/sw-engines", None),
+    ("sw-repos", "GET", "/sw-repos", None),
+    ("ui-options", "GET", "/ui-options", None),
+    ("ui-keybind", "GET", "/ui-keybind", None),
+    ("ui-log", "GET", "/ui-log", None),
+    ("ui-midi-options", "GET", "/ui-midi-options", None),
+    ("ui-midi-log", "GET", "/ui-midi-log", None),
+    ("sys-wifi", "GET", "/sys-wifi", None),
+    ("sys-backup", "GET", "/sys-backup", None),
+    ("sys-security", "GET", "/sys-security", None),
+    ("sys-reboot", "GET", "/sys-reboot", None),
+    ("sys-poweroff", "GET", "/sys-poweroff", None),
+    ("sys-perf", "GET", "/sys-perf", None),
+    ("sys-stalls", "GET", "/sys-stalls", None),
+    ("sys-profiles", "GET", "/sys-profiles", None),
+    ("sys-update-status", "GET", "/sys-update-status", None),
+    ("sys-memory", "GET", "/sys-memory", None),
+    ("sys-logging", "GET", "/sys-logging", None),
+    ("zynterm", "GET", "/zynterm", None),
+    ("metrics", "GET", "/metrics", None),
+    ("api-index", "GET", "/api/v1", None),
+    ("api-snapshots", "GET", "/api/v1/snapshots", None),
+    ("api-presets", "GET", "/api/v1/presets?engine=ZY", None),
+    ("api-captures", "GET", "/api/v1/captures", None),
+    ("api-engines", "GET", "/api/v1/engines", None),
+    ("api-midi-ports", "GET", "/api/v1/midi-ports", None),
+    ("api-system", "GET", "/api/v1/system", None),
+    ("dl-capture", "GET", "/lib-captures?stream={capture_q}", None),
+    ("dl-snapshot", "GET", "/lib-snapshot/download/{snapshot_b64}", None),
+    ("dl-preset", "POST", "/lib-presets/download", {'ENGINE': "ZY", 'SEL_FULLPATH': "{preset}"}),
+    ("static-css", "GET", "/css/bootstrap.css", None),
+    ("static-js", "GET", "/js/zynthian-websocket.js", None),
+    ("static-img", "GET", "/img/loading.gif", None),
+    ("static-favicon", "GET", "/favicon.ico", None),
+    ("static-bower", "GET", "/bower_components/jquery/dist/jquery.min.js", None),
+    ("static-mockup", "GET", "/mockup/index.html", None),
+    ("static-xstatic", "GET", "/xstatic/termjs/term.js", None)
+]
+
+# Routes that are not driven, with the reason
+SKIPPED_ROUTES = {
+    r"/logout": "drops the session",
+    r"/lib-presets/(.*)/(.*)$": "same handler as /lib-presets/(.*)",
+    r"/lib-snapshot/ajax/(.*)$": "mutating actions",
+    r"/lib-snapshot/remove/(.*)/(.*)$": "mutating actions",
+    r"/lib-snapshot/remove-chain/(.*)/(.*)$": "mutating actions",
+    r"/lib-snapshot/add/(.*)/(.*)$": "mutating actions",
+    r"/hw-audio-mixer$": "mutating actions (POST only)",
+    r"/hw-audio-mixer/(.*)/(.*)$": "mutating actions (POST only)",
+    r"/sys-reboot/confirmed$": "reboots the host",
+    r"/upload$": "mutating actions",
+    r"/mockup/capture/(.*\.log)$": "needs a running capture",
+    r"/(.*\.html)$": "no html dir in the tree",
+    r"/fonts/(.*)$": "same handler as the other static files",
+    r"/sys-profiles/([0-9]+)$": "needs a stored profile",
+    r"/sys-profiles/([0-9]+)\.pstats$": "needs a stored profile",
+    r"/ws$": "websocket",
+    r"/zynterm_ws": "websocket"
+}
+
+# ------------------------------------------------------------------------------
+# Statistics
+# ------------------------------------------------------------------------------
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(latencies, errors, statuses, nbytes, wall_time):
+    lat = sorted(latencies)
+    ms = lambda v: None if v is None else round(v * 1000.0, 3)
+    return {
+        'requests': len(lat) + errors,
+        'errors': errors,
+        'statuses': {str(k): v for k, v in sorted(statuses.items())},
+        'bytes': nbytes,
+        'wall_s': round(wall_time, 3),
+        'throughput_rps': round(len(lat) / wall_time, 2) if wall_time > 0 else None,
+        'latency_ms': {
+            'min': ms(lat[0] if lat else None),
+            'mean': ms(sum(lat) / len(lat) if lat else None),
+            'p50': ms(percentile(lat, 50)),
+            'p95': ms(percentile(lat, 95)),
+            'p99': ms(percentile(lat, 99)),
+            'max': ms(lat[-1] if lat else None)
+        }
+    }
+
+# ------------------------------------------------------------------------------
+# RSS sampler: tracks the server's peak RSS while a scenario runs
+# ------------------------------------------------------------------------------
+
+
+class RssSampler:
+
+    def __init__(self, pid):
+        self.proc = psutil.Process(pid)
+        self.peak = 0
+        self.task = None
+
+    def rss(self):
+        rss = self.proc.memory_info().rss
+        self.peak = max(self.peak, rss)
+        return rss
+
+    async def run(self):
+        while True:
+            self.rss()
+            await asyncio.sleep(RSS_SAMPLE_PERIOD)
+
+    def start(self):
+        self.peak = 0
+        self.task = asyncio.ensure_future(self.run())
+
+    def stop(self):
+        self.task.cancel()
+        return self.peak
+
+    def cpu_time(self):
+        t = self.proc.cpu_times()
+        return t.user + t.system
+
+# ------------------------------------------------------------------------------
+# Benchmark
+# ------------------------------------------------------------------------------
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_info():
+    def git(*args):
+        try:
+            return subprocess.check_output(["git"] + list(args), cwd=REPO_DIR, stderr=subprocess.DEVNULL, text=True).strip()
+        except Exception:
+            return None
+    return {
+        'commit': git("rev-parse", "HEAD"),
+        'subject': git("log", "-1", "--format=%s"),
+        'dirty': bool(git("status", "--porcelain", "--untracked-files=no"))
+    }
+
+
+def find_targets(root):
+    """Pick the download targets from the fake data tree."""
+    my_data_dir = root + "/zynthian-my-data"
+    targets = {}
+    for dpath, key, fext in ((my_data_dir + "/capture", "capture", ".wav"),
+                             (my_data_dir + "/snapshots", "snapshot", ".zss"),
+                             (my_data_dir + "/presets/zynaddsubfx", "preset", ".xiz")):
+        for dirpath, dirnames, filenames in sorted(os.walk(dpath)):
+            dirnames.sort()
+            files = sorted(f for f in filenames if f.endswith(fext))
+            if files:
+                targets[key] = os.path.join(dirpath, files[0])
+                break
+    targets['capture_q'] = quote(targets['capture'], safe="")
+    targets['snapshot_b64'] = base64.b64encode(targets['snapshot'].encode()).decode()
+    return targets
+
+
+def expand(value, targets):
+    return re.sub(r"\{(\w+)\}", lambda m: targets[m.group(1)], value)
+
+
+def check_coverage(routes, scenarios):
+    """Return the route patterns that no scenario, nor the skip list, covers."""
+    uncovered = []
+    for pattern in routes:
+        if pattern.rstrip("$") in (p.rstrip("$") for p in SKIPPED_ROUTES):
+            continue
+        if not any(re.match(pattern, s['path'].split("?")[0]) for s in scenarios):
+            uncovered.append(pattern)
+    return uncovered
+
+
+class Benchmark:
+
+    def __init__(self, args):
+        self.args = args
+        self.base_url = None
+        self.cookie = None
+        self.client = AsyncHTTPClient(max_clients=args.concurrency)
+
+    async def login(self):
+        req = HTTPRequest(self.base_url + "/login", method="POST", follow_redirects=False,
+                          body=urlencode({'PASSWORD': self.args.password}))
+        res = await self.client.fetch(req, raise_error=False)
+        for header in res.headers.get_list("Set-Cookie"):
+            if header.startswith("user="):
+                self.cookie = header.split(";")[0]
+        if not self.cookie:
+            raise RuntimeError("Login failed (HTTP {})".format(res.code))
+
+    async def fetch(self, scenario):
+        headers = {'Cookie': self.cookie}
+        body = None
+        if scenario['body'] is not None:
+            body = urlencode(scenario['body'])
+        req = HTTPRequest(self.base_url + scenario['path'], method=scenario['method'], body=body,
+                          headers=headers, follow_redirects=False, request_timeout=self.args.timeout)
+        ts = time.perf_counter()
+        res = await self.client.fetch(req, raise_error=False)
+        return time.perf_counter() - ts, res
+
+    async def run_scenario(self, scenarios, nreq, sampler):
+        latencies = []
+        statuses = {}
+        state = {'errors': 0, 'bytes': 0, 'next': 0}
+
+        async def worker():
+            while state['next'] < nreq:
+                scenario = scenarios[state['next'] % len(scenarios)]
+                state['next'] += 1
+                dt, res = await self.fetch(scenario)
+                statuses[res.code] = statuses.get(res.code, 0) + 1
+                if res.code >= 400 or res.code < 200:
+                    state['errors'] += 1
+                else:
+                    latencies.append(dt)
+                    state['bytes'] += len(res.body or b"")
+
+        # Warm up caches & templates, out of the measurement
+        for scenario in scenarios:
+            for i in range(self.args.warmup):
+                await self.fetch(scenario)
+
+        cpu0 = sampler.cpu_time()
+        sampler.start()
+        ts = time.perf_counter()
+        await asyncio.gather(*[worker() for i in range(self.args.concurrency)])
+        wall_time = time.perf_counter() - ts
+        result = summarize(latencies, state['errors'], statuses, state['bytes'], wall_time)
+        result['rss_peak'] = sampler.stop()
+        result['rss_after'] = sampler.rss()
+        result['server_cpu_s'] = round(sampler.cpu_time() - cpu0, 3)
+        return result
+
+    async def run(self, server_pid, routes, targets):
+        scenarios = []
+        for name, method, path, body in SCENARIOS:
+            if self.args.only and not any(re.search(p, name) for p in self.args.only):
+                continue
+            scenarios.append({
+                'name': name,
+                'method': method,
+                'path': expand(path, targets),
+                'body': None if body is None else {k: expand(v, targets) for k, v in body.items()}
+            })
+
+        uncovered = check_coverage(routes, scenarios) if not self.args.only else []
+        for pattern in uncovered:
+            print("WARNING: route '{}' is not covered by any scenario".format(pattern), file=sys.stderr)
+
+        await self.login()
+        sampler = RssSampler(server_pid)
+        rss_start = sampler.rss()
+
+        results = {}
+        for scenario in scenarios:
+            results[scenario['name']] = await self.run_scenario([scenario], self.args.requests, sampler)
+            self.print_row(scenario['name'], results[scenario['name']])
+        if self.args.mixed and len(scenarios) > 1:
+            results['mixed'] = await self.run_scenario(scenarios, self.args.requests * len(scenarios), sampler)
+            self.print_row("mixed", results['mixed'])
+
+        return {
+            'scenarios': results,
+            'uncovered_routes': uncovered,
+            'rss': {
+                'start': rss_start,
+                'peak': max(r['rss_peak'] for r in results.values()) if results else rss_start,
+                'end': sampler.rss()
+            }
+        }
+
+    @staticmethod
+    def print_header():
+        print("{:<18} {:>6} {:>5} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+            "scenario", "reqs", "errs", "p50 ms", "p95 ms", "p99 ms", "req/s", "RSS MB"))
+
+    @staticmethod
+    def print_row(name, r):
+        fmt = lambda v: "-" if v is None else "{:.1f}".format(v)
+        print("{:<18} {:>6} {:>5} {:>9} {:>9} {:>9} {:>9} {:>9.1f}".format(
+            name, r['requests'], r['errors'], fmt(r['latency_ms']['p50']), fmt(r['latency_ms']['p95']),
+            fmt(r['latency_ms']['p99']), fmt(r['throughput_rps']), r['rss_peak'] / 1048576.0), flush=True)
+
+# ------------------------------------------------------------------------------
+# Server process
+# ------------------------------------------------------------------------------
+
+
+def wait_for_port(port, proc, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Benchmark server exited with code {}".format(proc.returncode))
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Benchmark server didn't start in {} seconds".format(timeout))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Webconf HTTP benchmark (fake backend)")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="concurrent clients (default 8)")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="requests per scenario (default 200)")
+    parser.add_argument("-w", "--warmup", type=int, default=3, help="warm up requests per scenario (default 3)")
+    parser.add_argument("-s", "--scale", type=int, default=1, help="fake data size multiplier (default 1)")
+    parser.add_argument("-o", "--output", default=None, help="results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--only", action="append", help="regex on the scenario names, may be repeated")
+    parser.add_argument("--mixed", action="store_true", help="also run all the scenarios interleaved")
+    parser.add_argument("--timeout", type=float, default=60.0, help="request timeout in seconds")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--keep-root", action="store_true", help="don't delete the fake data tree")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="webconf-bench-")
+    routes_fpath = root + "/routes.json"
+    port = free_port()
+    env = dict(os.environ)
+    env['ZYNTHIAN_WEBCONF_FAKE_SCALE'] = str(args.scale)
+    env['ZYNTHIAN_WEBCONF_FAKE_PASSWORD'] = args.password
+    # The fake backend still runs some host commands, that complain on stderr
+    server_log = open(root + "/server.log", "w")
+    proc = subprocess.Popen([sys.executable, BENCH_DIR + "/bench_server.py", str(port), root, routes_fpath],
+                            env=env, stdout=server_log, stderr=subprocess.STDOUT)
+    try:
+        try:
+            wait_for_port(port, proc, 120)
+        except RuntimeError:
+            with open(root + "/server.log") as fh:
+                sys.stderr.write(fh.read())
+            raise
+        with open(routes_fpath) as fh:
+            routes = json.load(fh)
+
+        bench = Benchmark(args)
+        bench.base_url = "http://127.0.0.1:{}".format(port)
+        Benchmark.print_header()
+        results = asyncio.run(bench.run(proc.pid, routes, find_targets(root)))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        server_log.close()
+        if not args.keep_root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    git = git_info()
+    results['meta'] = {
+        'git': git,
+        'date': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'host': platform.node(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'tornado': tornado.version,
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'warmup': args.warmup,
+        'scale': args.scale
+    }
+    output = args.output
+    if not output:
+        output = "{}/results/{}{}.json".format(BENCH_DIR, (git['commit'] or "unknown")[:10], "-dirty" if git['dirty'] else "")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as fh:
+        json.dump(results, fh, indent=2)
+    print("RSS start/peak/end: {:.1f}/{:.1f}/{:.1f} MB".format(*(results['rss'][k] / 1048576.0 for k in ('start', 'peak', 'end'))))
+    print("Results saved to '{}'".format(output))
+
+
+if __name__ == "__main__":
+    main()
+
+# ------------------------------------------------------------------------------
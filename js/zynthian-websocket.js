@@ -1,4 +1,9 @@
-function connectZynthianWebSocket(onopenDeferred){
+// Close codes that mean webconf is restarting or went away: reconnect
+var ZYNTHIAN_WS_RECONNECT_CODES = [1001, 1006];
+var ZYNTHIAN_WS_RECONNECT_DELAY = 1000;
+var ZYNTHIAN_WS_RECONNECT_TRIES = 30;
+
+function connectZynthianWebSocket(onopenDeferred, messageHandler, tries){
 	var url = window.location.href
 	var parts = url.split("/");
 	var wsprot = "ws"
@@ -8,13 +13,25 @@ function connectZynthianWebSocket(onopenDeferred){
 		console.log("zynthianSocket:onconnecting:",evn);
 
 	}
+	// Handlers are kept across reconnections
+	zynthianSocket.messageHandler = messageHandler || {};
 	zynthianSocket.onopen = function(evn){
 		console.log("zynthianSocket:onopen:",evn);
-		this.messageHandler = {};
+		this.opened = true;
 		onopenDeferred.resolve();
+		if (messageHandler && typeof window.onZynthianSocketReconnect === "function") {
+			window.onZynthianSocketReconnect();
+		}
 	}
 	zynthianSocket.onclose = function(evn){
 		console.log("zynthianSocket.onclose:",evn);
+		if (ZYNTHIAN_WS_RECONNECT_CODES.indexOf(evn.code)<0) return;
+		var ntries = this.opened ? 0 : (tries || 0) + 1;
+		if (ntries > ZYNTHIAN_WS_RECONNECT_TRIES) return;
+		var handlers = this.messageHandler;
+		setTimeout(function() {
+			connectZynthianWebSocket(onopenDeferred, handlers, ntries);
+		}, ZYNTHIAN_WS_RECONNECT_DELAY);
 	}
 
 	zynthianSocket.onmessage = function(evn){
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Structured Access Log
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# In-memory ring of the last requests & websocket messages, with their route,
+# status, duration, response size & phase breakdown. It's the application's
+# log_function, so it replaces tornado's access log lines: successful requests
+# are logged at debug level, client errors as warnings & server errors as
+# errors. The response size is the body bytes written to the request's
+# connection, counted by count_response_bytes() (hooked by the HTTP server).
+# ------------------------------------------------------------------------------
+
+import os
+import math
+import time
+import logging
+from collections import deque
+from tornado.log import access_log as tornado_access_log
+
+DEFAULT_SIZE = 1000
+DEFAULT_TOP = 20
+
+
+def get_env_size():
+    try:
+        return int(os.environ.get('ZYNTHIAN_WEBCONF_ACCESS_LOG_SIZE', DEFAULT_SIZE))
+    except ValueError:
+        logging.error("Bad ZYNTHIAN_WEBCONF_ACCESS_LOG_SIZE => using {}".format(DEFAULT_SIZE))
+        return DEFAULT_SIZE
+
+
+def percentile(sorted_values, p):
+    # Nearest rank
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100.0 * len(sorted_values)) - 1)]
+
+
+def count_response_bytes(request_conn):
+    """Count the body bytes written to the request connection, as its response_bytes."""
+    request_conn.response_bytes = 0
+    write_headers = request_conn.write_headers
+    write = request_conn.write
+
+    def count_write_headers(start_line, headers, chunk=None, *args, **kwargs):
+        if chunk:
+            request_conn.response_bytes += len(chunk)
+        return write_headers(start_line, headers, chunk, *args, **kwargs)
+
+    def count_write(chunk, *args, **kwargs):
+        request_conn.response_bytes += len(chunk)
+        return write(chunk, *args, **kwargs)
+
+    request_conn.write_headers = count_write_headers
+    request_conn.write = count_write
+
+
+class AccessLog:
+
+    def __init__(self, size=DEFAULT_SIZE):
+        self.entries = deque(maxlen=size)
+        self.start_ts = time.time()
+
+    def clear(self):
+        self.entries.clear()
+
+    def add(self, kind, method, uri, route, status, seconds, nbytes, phases=None):
+        self.entries.append({
+            'ts': round(time.time(), 3),
+            'kind': kind,
+            'method': method,
+            'uri': uri,
+            'route': route,
+            'status': status,
+            'duration_ms': round(1000 * seconds, 2),
+            'bytes': nbytes,
+            'phases': phases or {}
+        })
+
+    def log_request(self, handler):
+        """Application log_function: record the finished request & log it."""
+        request = handler.request
+        status = handler.get_status()
+        seconds = request.request_time()
+        phases = None
+        timer = getattr(handler, "timer", None)
+        if timer:
+            phases = {phase: round(1000 * dt, 2) for phase, dt in timer.phases.items()}
+        nbytes = getattr(request.connection, "response_bytes", None)
+        self.add("http", request.method, request.uri, type(handler).__name__, status, seconds, nbytes, phases)
+
+        if status < 400:
+            log_method = tornado_access_log.debug
+        elif status < 500:
+            log_method = tornado_access_log.warning
+        else:
+            log_method = tornado_access_log.error
+        log_method("%d %s %.2fms", status, handler._request_summary(), 1000.0 * seconds)
+
+    def log_message(self, route, nbytes, seconds, error=False):
+        """Record a websocket message, handled in "seconds"."""
+        self.add("ws", "WS", None, route, 500 if error else 200, seconds, nbytes)
+
+    # ---------------------------------------------------------------------------
+    # Reporting
+    # ---------------------------------------------------------------------------
+
+    def get_entries(self):
+        """Logged entries, newest first."""
+        return list(reversed(self.entries))
+
+    def get_routes(self):
+        """Per route stats, slowest p95 first."""
+        routes = {}
+        for entry in self.entries:
+            routes.setdefault((entry['kind'], entry['route']), []).append(entry)
+        res = []
+        for (kind, route), entries in routes.items():
+            durations = sorted(e['duration_ms'] for e in entries)
+            sizes = [e['bytes'] for e in entries if e['bytes'] is not None]
+            res.append({
+                'kind': kind,
+                'route': route,
+                'count': len(entries),
+                'errors': sum(1 for e in entries if e['status'] >= 500),
+                'p50_ms': percentile(durations, 50),
+                'p95_ms': percentile(durations, 95),
+                'max_ms': durations[-1],
+                'mean_bytes': round(sum(sizes) / len(sizes)) if sizes else None,
+                'max_bytes': max(sizes) if sizes else None
+            })
+        res.sort(key=lambda r: -r['p95_ms'])
+        return res
+
+    def get_slowest(self, top=DEFAULT_TOP):
+        return sorted(self.entries, key=lambda e: -e['duration_ms'])[:top]
+
+    def get_largest(self, top=DEFAULT_TOP):
+        return sorted((e for e in self.entries if e['bytes']), key=lambda e: -e['bytes'])[:top]
+
+
+access_log = AccessLog(get_env_size())
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Performance (Access Log) Handler
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import tornado.web
+from collections import OrderedDict
+
+from lib.access_log import access_log, DEFAULT_TOP
+from lib.zynthian_config_handler import ZynthianBasicHandler
+
+# ------------------------------------------------------------------------------
+# Performance (Access Log) Handler
+# ------------------------------------------------------------------------------
+
+
+class AccessLogHandler(ZynthianBasicHandler):
+
+    @tornado.web.authenticated
+    def get(self, errors=None):
+        config = OrderedDict([
+            ['SIZE', access_log.entries.maxlen],
+            ['COUNT', len(access_log.entries)],
+            ['ROUTES', access_log.get_routes()],
+            ['SLOWEST', access_log.get_slowest(DEFAULT_TOP)],
+            ['LARGEST', access_log.get_largest(DEFAULT_TOP)]
+        ])
+        # The JSON export has the whole log
+        if self.genjson:
+            config['ENTRIES'] = access_log.get_entries()
+        super().get("perf.html", "Performance", config, errors)
+
+    @tornado.web.authenticated
+    def post(self):
+        if self.get_argument('_command', '') == "CLEAR":
+            access_log.clear()
+        self.get()
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,469 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# JSON REST API (v1)
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Read-only JSON API under /api/v1, for scripts & lightweight clients:
+#
+#   /api/v1                  => resource list
+#   /api/v1/snapshots        => snapshot banks & snapshots
+#   /api/v1/presets?engine=  => preset banks & presets of an engine
+#   /api/v1/captures         => audio & MIDI captures
+#   /api/v1/engines          => engines
+#   /api/v1/midi-ports       => MIDI input & output ports
+#   /api/v1/system           => system status
+#
+# Collections return {"items": [...], "total": N, "next_cursor": ...}:
+#
+#  + Items are sorted by their "id" (a path, an engine code ...) & paginated
+#    with "limit" and "cursor" (the "next_cursor" of the previous page, also
+#    sent as a Link header). The cursor holds the last id sent, so pages don't
+#    shift when items are added or removed meanwhile.
+#  + "fields" (e.g. fields=id,name) selects the item fields. Expensive
+#    fields are only sent when asked for.
+#  + Items can be filtered by some fields (e.g. type=snapshot, enabled=1).
+#  + Collections built from files have a strong ETag from their version (see
+#    check_data_version), checked before building the response. The items of
+#    the current version are cached, so walking the pages is cheap.
+#
+# Errors are JSON too: {"error": {"status": 400, "message": "..."}}. Requests
+# need the login cookie, or get a 401 (no redirect to the login page).
+# ------------------------------------------------------------------------------
+
+import os
+import time
+import base64
+import logging
+import binascii
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+import psutil
+import mutagen
+import tornado.web
+
+import zyngine.zynthian_lv2 as zynthian_lv2
+
+from lib.fs_watcher import fs_watcher
+from lib.config_writer import config_writer
+from lib.engine_registry import engine_registry
+from lib.service_monitor import service_monitor
+from lib.zynthian_config_handler import ZynthianBasicHandler
+from lib.snapshot_config_handler import SnapshotConfigHandler
+from lib.presets_config_handler import PresetsConfigHandler
+from lib.captures_config_handler import CapturesConfigHandler
+
+API_VERSION = 1
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# Item lists kept, for all the collections
+MAX_CACHED_LISTS = 16
+
+CAPTURE_TYPES = ("wav", "ogg", "mp3", "mid", "log", "mp4")
+
+START_TIME = time.time()
+
+# ------------------------------------------------------------------------------
+# Base handlers
+# ------------------------------------------------------------------------------
+
+
+class ApiHandler(ZynthianBasicHandler):
+
+    def prepare(self):
+        if not self.current_user:
+            raise tornado.web.HTTPError(401, reason="Login required")
+        super().prepare()
+
+    def write_error(self, status_code, **kwargs):
+        message = self._reason
+        if "exc_info" in kwargs:
+            exc = kwargs["exc_info"][1]
+            if isinstance(exc, tornado.web.HTTPError) and exc.log_message:
+                message = exc.log_message
+        self.set_header("Cache-Control", "no-store")
+        self.write_json({'error': {'status': status_code, 'message': message}})
+
+    def get_fields(self):
+        """Fields asked for with "fields", or None."""
+        fields = self.get_query_argument("fields", "")
+        return [f.strip() for f in fields.split(",") if f.strip()] or None
+
+    def select_fields(self, item, fields):
+        return {k: item[k] for k in fields if k in item}
+
+    def write_object(self, data):
+        fields = self.get_fields()
+        if fields:
+            data = self.select_fields(data, fields)
+        self.write_json(data)
+
+
+class ApiCollectionHandler(ApiHandler):
+
+    # Fields not sent unless asked for
+    expensive_fields = ()
+    # Fields that can be used as filters
+    filters = ()
+    # Filters taking a boolean value (1/0, true/false). The rest are compared as strings.
+    bool_filters = ()
+    # Data not versioned (live state) => not cached
+    versioned = True
+
+    items_cache = OrderedDict()
+
+    def get_version(self):
+        """Version of the data the items are built from."""
+        return None
+
+    def get_cache_key(self):
+        return type(self).__name__
+
+    def get_items(self, fields):
+        """Items, as dicts with an "id". fields: expensive fields to include (if possible)."""
+        return []
+
+    def get(self):
+        limit = self.get_limit()
+        after = self.decode_cursor(self.get_query_argument("cursor", ""))
+        fields = self.get_fields()
+        expensive = [f for f in (fields or ()) if f in self.expensive_fields]
+
+        version = None
+        if self.versioned:
+            version = self.get_version()
+            if self.check_data_version(API_VERSION, version):
+                return
+        else:
+            self.set_header("Cache-Control", "no-store")
+
+        items = self.get_cached_items(version, expensive)
+        items = self.filter_items(items)
+        total = len(items)
+        if after is not None:
+            items = [item for item in items if item['id'] > after]
+        page = items[:limit]
+        next_cursor = None
+        if len(items) > limit:
+            next_cursor = self.encode_cursor(page[-1]['id'])
+            args = {k: self.get_query_argument(k) for k in self.request.query_arguments}
+            args['cursor'] = next_cursor
+            self.set_header("Link", '<{}?{}>; rel="next"'.format(self.request.path, urlencode(args)))
+
+        if fields:
+            page = [self.select_fields(item, fields) for item in page]
+        else:
+            page = [{k: v for k, v in item.items() if k not in self.expensive_fields} for item in page]
+        self.write_json({
+            'items': page,
+            'total': total,
+            'limit': limit,
+            'next_cursor': next_cursor
+        })
+
+    def get_limit(self):
+        try:
+            limit = int(self.get_query_argument("limit", DEFAULT_LIMIT))
+        except ValueError:
+            raise tornado.web.HTTPError(400, "Bad limit")
+        if limit < 1:
+            raise tornado.web.HTTPError(400, "Bad limit")
+        return min(limit, MAX_LIMIT)
+
+    @staticmethod
+    def encode_cursor(item_id):
+        return base64.urlsafe_b64encode(str(item_id).encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        if not cursor:
+            return None
+        try:
+            return base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode()
+        except (binascii.Error, UnicodeDecodeError):
+            raise tornado.web.HTTPError(400, "Bad cursor")
+
+    def get_cached_items(self, version, expensive):
+        if version is None:
+            return sorted(self.get_items(expensive), key=lambda item: item['id'])
+        key = (self.get_cache_key(), version, tuple(sorted(expensive)))
+        items = self.items_cache.get(key)
+        if items is None:
+            items = sorted(self.get_items(expensive), key=lambda item: item['id'])
+            self.items_cache[key] = items
+            while len(self.items_cache) > MAX_CACHED_LISTS:
+                self.items_cache.popitem(last=False)
+        else:
+            self.items_cache.move_to_end(key)
+        return items
+
+    def filter_items(self, items):
+        for name in self.filters:
+            value = self.get_query_argument(name, None)
+            if value is None:
+                continue
+            value = value.lower()
+            if name in self.bool_filters:
+                value = value in ("1", "true", "yes", "on")
+            items = [item for item in items if self.match_filter(item.get(name), value)]
+        return items
+
+    @staticmethod
+    def match_filter(field, value):
+        if isinstance(value, bool):
+            return bool(field) == value
+        field = str(field).lower()
+        # Numbers may be zero padded (bank_num = "001")
+        if field.isdigit() and value.isdigit():
+            return int(field) == int(value)
+        return field == value
+
+# ------------------------------------------------------------------------------
+# Resources
+# ------------------------------------------------------------------------------
+
+
+class ApiIndexHandler(ApiHandler):
+
+    def get(self):
+        self.write_json({
+            'version': API_VERSION,
+            'resources': ["/api/v1/{}".format(name) for name in (
+                "snapshots", "presets", "captures", "engines", "midi-ports", "system")]
+        })
+
+
+class ApiSnapshotsHandler(ApiCollectionHandler, SnapshotConfigHandler):
+
+    expensive_fields = ("details",)
+    filters = ("type", "bank_num")
+
+    def get_version(self):
+        return self.get_snapshots_version()
+
+    def get_items(self, fields):
+        items = []
+
+        def add_nodes(nodes):
+            for node in nodes:
+                items.append({
+                    'id': os.path.relpath(node['fullpath'], self.SNAPSHOTS_DIRECTORY),
+                    'type': node['node_type'].lower(),
+                    'name': node['name'],
+                    'path': node['fullpath'],
+                    'bank_num': node['bank_num'],
+                    'bank_name': node['bank_name'],
+                    'prog_num': node['prog_num'],
+                    'details': node['prog_details'] or None
+                })
+                add_nodes(node.get('nodes', ()))
+
+        add_nodes(self.get_snapshots_data())
+        return items
+
+
+class ApiPresetsHandler(ApiCollectionHandler, PresetsConfigHandler):
+
+    filters = ("type", "bank", "readonly")
+    bool_filters = ("readonly",)
+
+    def get_engine_code(self):
+        return self.get_query_argument("engine", "ZY")
+
+    def get_argument(self, name, *args, **kwargs):
+        # The engine is selected with "engine", like the other API arguments
+        if name == "ENGINE":
+            return self.get_engine_code()
+        return super().get_argument(name, *args, **kwargs)
+
+    def get_version(self):
+        self.init_engine()
+        if not self.eng_info:
+            raise tornado.web.HTTPError(404, "Unknown engine or engine without presets: '{}'".format(
+                self.get_engine_code()))
+        return self.get_presets_version()
+
+    def get_cache_key(self):
+        return (type(self).__name__, self.eng_code)
+
+    def get_items(self, fields):
+        items = []
+        for node in self.get_presets_data():
+            # Bank groups have no path
+            if node['fullpath'] is None:
+                group = node['name']
+                banks = node['nodes']
+            else:
+                group = None
+                banks = [node]
+            for bank in banks:
+                items.append({
+                    'id': bank['fullpath'],
+                    'type': "bank",
+                    'name': bank['name'],
+                    'group': group,
+                    'bank': bank['fullpath'],
+                    'readonly': bank['readonly']
+                })
+                for preset in bank['nodes']:
+                    items.append({
+                        'id': preset['fullpath'],
+                        'type': "preset",
+                        'name': preset['name'],
+                        'group': group,
+                        'bank': bank['fullpath'],
+                        'readonly': preset['readonly']
+                    })
+        return items
+
+
+class ApiCapturesHandler(ApiCollectionHandler):
+
+    expensive_fields = ("duration",)
+    filters = ("type",)
+
+    def get_version(self):
+        return fs_watcher.get_version(CapturesConfigHandler.CAPTURES_DIRECTORY)
+
+    def get_items(self, fields):
+        items = []
+        dpath = CapturesConfigHandler.CAPTURES_DIRECTORY
+        try:
+            entries = list(os.scandir(dpath))
+        except OSError as e:
+            logging.error("Can't list captures in '{}': {}".format(dpath, e))
+            return items
+        for entry in entries:
+            ftype = os.path.splitext(entry.name)[1][1:].lower()
+            if ftype not in CAPTURE_TYPES or not entry.is_file():
+                continue
+            st = entry.stat()
+            item = {
+                'id': entry.name,
+                'type': ftype,
+                'name': entry.name,
+                'path': entry.path,
+                'size': st.st_size,
+                'mtime': st.st_mtime
+            }
+            if "duration" in fields:
+                try:
+                    item['duration'] = round(mutagen.File(entry.path).info.length, 3)
+                except Exception:
+                    item['duration'] = None
+            items.append(item)
+        return items
+
+
+class ApiEnginesHandler(ApiCollectionHandler):
+
+    filters = ("type", "cat", "enabled")
+    bool_filters = ("enabled",)
+
+    def get_version(self):
+        return engine_registry.version
+
+    def get_items(self, fields):
+        items = []
+        for code, info in zynthian_lv2.engines.items():
+            # ENGINE is the engine class, not serializable
+            item = {k.lower(): v for k, v in info.items() if k != "ENGINE"}
+            # Engine's numeric ID
+            item['index'] = item.pop('id', None)
+            item['id'] = code
+            items.append(item)
+        return items
+
+
+class ApiMidiPortsHandler(ApiCollectionHandler):
+
+    # Live jack ports
+    versioned = False
+    filters = ("direction",)
+
+    def get_items(self, fields):
+        # Loads zyngui & jack => only when asked for
+        from lib.midi_config_handler import get_ports_config
+        items = []
+        ports = get_ports_config()
+        for direction in ("IN", "OUT"):
+            for port in ports[direction]:
+                items.append({
+                    'id': port['name'],
+                    'direction': direction.lower(),
+                    'name': port['name'],
+                    'shortname': port['shortname'],
+                    'alias': port['alias']
+                })
+        return items
+
+
+class ApiSystemHandler(ApiHandler):
+
+    def get(self):
+        self.set_header("Cache-Control", "no-store")
+        mem = psutil.virtual_memory()
+        try:
+            disk = psutil.disk_usage(os.environ.get('ZYNTHIAN_MY_DATA_DIR', "/"))
+            disk = {'total': disk.total, 'used': disk.used, 'free': disk.free, 'percent': disk.percent}
+        except OSError:
+            disk = None
+        self.write_object({
+            'hostname': self.get_hostname(),
+            'time': time.time(),
+            'boot_time': psutil.boot_time(),
+            'load': os.getloadavg(),
+            'cpu_count': psutil.cpu_count(),
+            'memory': {'total': mem.total, 'used': mem.used, 'available': mem.available, 'percent': mem.percent},
+            'disk': disk,
+            'temperature': self.get_temperature(),
+            'services': self.get_services(),
+            'update_sys': config_writer.get_status(),
+            'reboot_required': bool(self.reboot_flag),
+            'webconf': {'pid': os.getpid(), 'start_time': START_TIME}
+        })
+
+    @staticmethod
+    def get_services():
+        service_monitor.refresh()
+        return {name: service_monitor.states.get(name, False) for name in sorted(service_monitor.services)}
+
+    @staticmethod
+    def get_hostname():
+        try:
+            with open("/etc/hostname") as f:
+                return f.readline().strip()
+        except OSError:
+            return os.uname().nodename
+
+    @staticmethod
+    def get_temperature():
+        try:
+            for sensors in psutil.sensors_temperatures().values():
+                if sensors:
+                    return sensors[0].current
+        except Exception:
+            pass
+        return None
+
+# ------------------------------------------------------------------------------
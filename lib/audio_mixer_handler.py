@@ -67,13 +67,15 @@ class AudioMixerHandler(tornado.web.RequestHandler):
 
     @classmethod
     def register_websocket(self, websocket_message_handler: ZynthianWebSocketMessageHandler):
-        AudioMixerHandler.websocket_message_handler_list.append(
-            websocket_message_handler)
+        if websocket_message_handler not in AudioMixerHandler.websocket_message_handler_list:
+            AudioMixerHandler.websocket_message_handler_list.append(
+                websocket_message_handler)
 
     @classmethod
     def unregister_websocket(self, websocket_message_handler: ZynthianWebSocketMessageHandler):
-        AudioMixerHandler.websocket_message_handler_list.remove(
-            websocket_message_handler)
+        if websocket_message_handler in AudioMixerHandler.websocket_message_handler_list:
+            AudioMixerHandler.websocket_message_handler_list.remove(
+                websocket_message_handler)
 
 
 class AudioConfigMessageHandler(ZynthianWebSocketMessageHandler):
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Request Body Limits
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Tornado buffers the whole request body in memory before calling a (non
+# streaming) handler, up to the server's max_body_size. The server limit is
+# set for the biggest uploads, so the limit is set per route instead:
+#
+#  + Handler classes declare their limit in "max_body_size". Without it,
+#    DEFAULT_MAX_BODY_SIZE is used (ZYNTHIAN_WEBCONF_MAX_BODY_SIZE, bytes).
+#    Files are only accepted by the streaming upload handlers, that write
+#    them to disk as they come and raise the limit.
+#  + The route is resolved when the request headers are received, so a
+#    Content-Length over the limit is answered with a 413 before reading any
+#    of the body (and before a "100 Continue"), and the connection is closed.
+#  + Chunked bodies have no Content-Length: tornado stops reading them when
+#    they go over the limit (400 & connection closed).
+# ------------------------------------------------------------------------------
+
+import os
+import logging
+import tornado.web
+
+KB = 1024
+MB = 1024 * KB
+
+
+def get_env_max_body_size():
+    try:
+        return int(os.environ.get('ZYNTHIAN_WEBCONF_MAX_BODY_SIZE', MB))
+    except ValueError:
+        logging.error("Bad ZYNTHIAN_WEBCONF_MAX_BODY_SIZE => using {}".format(MB))
+        return MB
+
+
+DEFAULT_MAX_BODY_SIZE = get_env_max_body_size()
+
+
+def get_max_body_size(handler_class):
+    return getattr(handler_class, "max_body_size", None) or DEFAULT_MAX_BODY_SIZE
+
+
+@tornado.web.stream_request_body
+class BodyTooLargeHandler(tornado.web.RequestHandler):
+    """Answers 413 as soon as the headers are received. Streamed, so the body is never read."""
+
+    def initialize(self, max_body_size):
+        self.max_body_size = max_body_size
+
+    def check_xsrf_cookie(self):
+        pass
+
+    def prepare(self):
+        raise tornado.web.HTTPError(413, "Request body of {} bytes, the limit is {}".format(
+            self.request.headers.get("Content-Length"), self.max_body_size))
+
+    def data_received(self, chunk):
+        pass
+
+
+class BodyLimitApplication(tornado.web.Application):
+    """Application enforcing the request body limit of each route's handler."""
+
+    def get_handler_delegate(self, request, target_class, target_kwargs=None, path_args=None, path_kwargs=None):
+        max_body_size = get_max_body_size(target_class)
+        try:
+            content_length = int(request.headers.get("Content-Length", 0))
+        except ValueError:
+            # Rejected by tornado when reading the body
+            content_length = 0
+        if content_length > max_body_size:
+            return super().get_handler_delegate(request, BodyTooLargeHandler, {'max_body_size': max_body_size})
+        if request.connection:
+            request.connection.set_max_body_size(max_body_size)
+        return super().get_handler_delegate(request, target_class, target_kwargs, path_args, path_kwargs)
+
+# ------------------------------------------------------------------------------
@@ -28,13 +28,18 @@ import json
 import shutil
 import mutagen
 import fnmatch
+import inspect
 import logging
 import jsonpickle
-import subprocess
 import tornado.web
 from zipfile import ZipFile
+from subprocess import STDOUT
 
-from lib.upload_handler import TMP_DIR
+from lib.body_limit import MB
+from lib.job_executor import job_executor
+from lib.job_workers import extract_zip
+from lib.transfer_service import transfer_service
+from lib.tmp_storage import tmp_storage, get_tree_size
 from lib.zynthian_config_handler import ZynthianBasicHandler
 
 # ------------------------------------------------------------------------------
@@ -43,7 +48,9 @@ from lib.zynthian_config_handler import ZynthianBasicHandler
 
 
 class CapturesConfigHandler(ZynthianBasicHandler):
-    CAPTURES_DIRECTORY = "/zynthian/zynthian-my-data/capture"
+    CAPTURES_DIRECTORY = os.environ.get('ZYNTHIAN_MY_DATA_DIR', "/zynthian/zynthian-my-data") + "/capture"
+    # Capture logs are posted as text
+    max_body_size = 16 * MB
 
     selectedTreeNode = 0
     selected_full_path = ''
@@ -70,7 +77,7 @@ class CapturesConfigHandler(ZynthianBasicHandler):
 
             super().get("captures.html", "Captures", config, errors)
 
-    def post(self):
+    async def post(self):
         action = self.get_argument('ZYNTHIAN_CAPTURES_ACTION', None)
         if not action and self.get_argument('INSTALL_FPATH', None):
             action = 'UPLOAD'
@@ -80,11 +87,13 @@ class CapturesConfigHandler(ZynthianBasicHandler):
             errors = {
                 'REMOVE': lambda: self.do_remove(),
                 'RENAME': lambda: self.do_rename(),
-                'DOWNLOAD': lambda: self.do_download(self.get_argument('ZYNTHIAN_CAPTURES_FULLPATH')),
+                'DOWNLOAD': lambda: self.do_download(self.get_argument('ZYNTHIAN_CAPTURES_FULLPATH'), True),
                 'CONVERT_OGG': lambda: self.do_convert_ogg(),
                 'UPLOAD': lambda: self.do_install_file(),
                 'SAVE_LOG': lambda: self.do_save_log()
             }[action]()
+            if inspect.isawaitable(errors):
+                errors = await errors
 
         if (action not in ('DOWNLOAD', 'SAVE_LOG')):
             self.get(errors)
@@ -146,7 +155,7 @@ class CapturesConfigHandler(ZynthianBasicHandler):
                     src_fpath, dest_fpath))
                 shutil.move(src_fpath, dest_fpath)
 
-    def do_download(self, fullpath):
+    def do_download(self, fullpath, transfer=False):
         if fullpath:
             fparts = os.path.split(fullpath)
             dirpath = fparts[0]
@@ -154,53 +163,71 @@ class CapturesConfigHandler(ZynthianBasicHandler):
 
             # If file is a capture log, generate download package with log + video
             fparts = os.path.splitext(filename)
+            if transfer:
+                # Sent by the transfer worker, if running. Not for streaming (no range requests).
+                if fparts[1] == ".log":
+                    transfer_url = transfer_service.get_download_url(
+                        self, [dirpath + "/" + fparts[0] + ".log", dirpath + "/" + fparts[0] + ".mp4"], fparts[0] + ".zip")
+                else:
+                    transfer_url = transfer_service.get_download_url(self, fullpath)
+                if transfer_url:
+                    self.redirect(transfer_url, status=303)
+                    return
+            tmp = None
             if fparts[1] == ".log":
                 filename = fparts[0] + ".zip"
-                fullpath = TMP_DIR + "/" + filename
+                log_fpath = dirpath + "/" + fparts[0] + ".log"
+                video_fpath = dirpath + "/" + fparts[0] + ".mp4"
+                tmp = tmp_storage.file(suffix=".zip", size_hint=get_tree_size(log_fpath) + get_tree_size(video_fpath))
+                fullpath = tmp.path
                 with ZipFile(fullpath, 'w') as tmpzip:
-                    tmpzip.write(dirpath + "/" +
-                                 fparts[0] + ".log", fparts[0] + ".log")
-                    tmpzip.write(dirpath + "/" +
-                                 fparts[0] + ".mp4", fparts[0] + ".mp4")
-
-            with open(fullpath, 'rb') as f:
-                try:
-                    while True:
-                        data = f.read(4096)
-                        if not data:
-                            break
-                        self.write(data)
-
-                    self.set_header(
-                        'Content-Type', self.get_content_type(filename))
-                    self.set_header('Content-Disposition',
-                                    'attachment; filename="%s"' % filename)
-                    self.finish()
-                except Exception as exc:
-                    logging.error(exc)
-                    self.set_header('Content-Type', 'application/json')
-                    self.write(jsonpickle.encode({'data': format(exc)}))
-
-    def do_install_file(self):
+                    tmpzip.write(log_fpath, fparts[0] + ".log")
+                    tmpzip.write(video_fpath, fparts[0] + ".mp4")
+                tmp.settle()
+                fullpath = tmp.path
+
+            try:
+                with open(fullpath, 'rb') as f:
+                    try:
+                        while True:
+                            data = f.read(4096)
+                            if not data:
+                                break
+                            self.write(data)
+
+                        self.set_header(
+                            'Content-Type', self.get_content_type(filename))
+                        self.set_header('Content-Disposition',
+                                        'attachment; filename="%s"' % filename)
+                        self.finish()
+                    except Exception as exc:
+                        logging.error(exc)
+                        self.set_header('Content-Type', 'application/json')
+                        self.write(jsonpickle.encode({'data': format(exc)}))
+            finally:
+                if tmp:
+                    tmp.release()
+
+    async def do_install_file(self):
         result = {}
         try:
             for fpath in self.get_argument('INSTALL_FPATH').split(","):
                 fpath = fpath.strip()
                 if len(fpath) > 0:
-                    self.install_file(fpath)
+                    await self.install_file(fpath)
         except Exception as e:
             logging.error(e)
             result['errors'] = "Can't install file: {}".format(e)
 
         return result
 
-    def do_convert_ogg(self):
+    async def do_convert_ogg(self):
         ogg_file_name = os.path.splitext(self.selected_full_path)[0]+'.ogg'
         cmd = 'oggenc "{}" -o "{}"'.format(
             self.selected_full_path, ogg_file_name)
         try:
             logging.info(cmd)
-            subprocess.check_output(cmd, stderr=subprocess.STDOUT, shell=True)
+            await job_executor.run_command("encode", cmd, stderr=STDOUT)
         except Exception as e:
             return e.output
         return
@@ -295,7 +322,7 @@ class CapturesConfigHandler(ZynthianBasicHandler):
         root_capture['nodes'] = captures
         return root_capture
 
-    def install_file(self, fpath):
+    async def install_file(self, fpath):
         logging.info(fpath)
         fname = os.path.basename(fpath)
         destination = "{}/{}".format(
@@ -305,8 +332,7 @@ class CapturesConfigHandler(ZynthianBasicHandler):
 
         fparts = os.path.splitext(fname)
         if fparts[1] == ".zip":
-            with ZipFile(destination) as fzip:
-                fzip.extractall(CapturesConfigHandler.CAPTURES_DIRECTORY)
+            await job_executor.run("extract", extract_zip, destination, CapturesConfigHandler.CAPTURES_DIRECTORY, process=True)
             os.remove(destination)
 
     def walk_directory(self, directory, icon, file_extension):
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Asynchronous Command Runner
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import os
+import signal
+import asyncio
+import logging
+from subprocess import PIPE, STDOUT, DEVNULL, CalledProcessError, TimeoutExpired
+
+from lib.perf_metrics import current_phase
+
+# ------------------------------------------------------------------------------
+# Shell commands run as asyncio subprocesses, so they don't block the
+# tornado event loop (and every other client & websocket) while running.
+#
+# No timeout by default: system updates & installs may take very long. Pass
+# one for the commands known to be short. Commands run in their own process
+# group, so a timeout kills the whole command, not just the shell.
+# ------------------------------------------------------------------------------
+
+# Timeout for quick queries (git, df, systemctl status ...)
+SHORT_TIMEOUT = 60
+# Max. line length read from the output. Longer lines are passed in pieces.
+STREAM_LIMIT = 1024 * 1024
+# Short commands running at once
+MAX_CONCURRENT_COMMANDS = 4
+
+_semaphore = None
+_background_tasks = set()
+
+
+def get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENT_COMMANDS)
+    return _semaphore
+
+
+async def read_lines(stream, on_line):
+    lines = []
+    while True:
+        try:
+            line = await stream.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            # Last line, without newline
+            line = e.partial
+        except asyncio.LimitOverrunError as e:
+            line = await stream.read(e.consumed)
+        if not line:
+            break
+        lines.append(line)
+        on_line(line.decode('utf-8', 'ignore'))
+    return b"".join(lines)
+
+
+def kill_group(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def run(cmd, stderr=None, timeout=None, on_line=None):
+    """
+    Run a shell command and return (returncode, output).
+
+    stderr may be STDOUT, DEVNULL or None (inherited), like in subprocess.
+    If on_line is given, it's called for each output line as it arrives.
+    On timeout the process group is killed and TimeoutExpired is raised.
+
+    Short commands (with timeout, not streamed) share MAX_CONCURRENT_COMMANDS
+    slots, and the wait for a slot counts in the timeout. Long commands
+    (updates, installs, jobs ...) are not limited, so they can't stall the
+    short queries.
+    """
+    if timeout is None or on_line:
+        return await run_process(cmd, stderr, timeout, on_line)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    semaphore = get_semaphore()
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout)
+    except asyncio.TimeoutError:
+        logging.error("Command timed out after {}s waiting to run: {}".format(timeout, cmd))
+        raise TimeoutExpired(cmd, timeout)
+    try:
+        return await run_process(cmd, stderr, max(0, deadline - loop.time()), on_line)
+    finally:
+        semaphore.release()
+
+
+async def run_process(cmd, stderr, timeout, on_line):
+    with current_phase("cmd"):
+        logging.debug("Running command: {}".format(cmd))
+        proc = await asyncio.create_subprocess_shell(cmd, stdout=PIPE, stderr=stderr,
+                                                     start_new_session=True, limit=STREAM_LIMIT)
+        try:
+            if on_line:
+                output = await asyncio.wait_for(read_lines(proc.stdout, on_line), timeout)
+                await proc.wait()
+            else:
+                output, _ = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            logging.error("Command timed out after {}s: {}".format(timeout, cmd))
+            kill_group(proc)
+            await proc.wait()
+            raise TimeoutExpired(cmd, timeout)
+        return proc.returncode, output
+
+
+async def check_output(cmd, stderr=None, timeout=None, on_line=None):
+    """Asynchronous replacement for subprocess.check_output(cmd, shell=True)."""
+    returncode, output = await run(cmd, stderr=stderr, timeout=timeout, on_line=on_line)
+    if returncode:
+        raise CalledProcessError(returncode, cmd, output)
+    return output
+
+
+def spawn(coro):
+    """Run a coroutine in background, logging its errors."""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+
+    def done(task):
+        _background_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logging.error("Background task failed: {}".format(task.exception()))
+
+    task.add_done_callback(done)
+    return task
+
+# ------------------------------------------------------------------------------
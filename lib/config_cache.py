@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Zynthian Configuration Cache
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import os
+import hashlib
+import logging
+
+import zynconf
+
+# ------------------------------------------------------------------------------
+# File change detection
+# ------------------------------------------------------------------------------
+
+
+def get_file_signature(fpath):
+    """Return a cheap signature (mtime, size) for a file, or None if missing."""
+    try:
+        st = os.stat(fpath)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def get_tree_signature(dpath, files=False):
+    """
+    Return a signature for a directory tree, or None if missing. Adding,
+    removing or renaming entries changes the mtime of their parent directory,
+    so only directories are stat'ed, unless files=True is used for trees whose
+    file contents are part of the data too.
+    """
+    h = hashlib.md5()
+    visited = set()
+
+    def walk(dpath):
+        st = os.stat(dpath)
+        # Symlinked directories may loop
+        if (st.st_dev, st.st_ino) in visited:
+            return
+        visited.add((st.st_dev, st.st_ino))
+        h.update("{}:{}\n".format(dpath, st.st_mtime_ns).encode())
+        with os.scandir(dpath) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    walk(entry.path)
+                elif files:
+                    st = entry.stat()
+                    h.update("{}:{}:{}\n".format(entry.name, st.st_mtime_ns, st.st_size).encode())
+            except OSError:
+                pass
+
+    try:
+        walk(dpath)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+# ------------------------------------------------------------------------------
+# Zynthian Config Cache
+# ------------------------------------------------------------------------------
+
+
+class ZynthianConfigCache:
+    """
+    Keeps the envars & MIDI profile loaded by zynconf in the process
+    environment, re-reading the shell scripts only when they change on disk
+    or when a writer explicitly invalidates the cache.
+    """
+
+    def __init__(self):
+        self.config_fpath = None
+        self.config_signature = None
+        self.midi_config_fpath = None
+        self.midi_config_signature = None
+
+    def invalidate(self):
+        self.config_signature = None
+        self.midi_config_signature = None
+
+    def load(self):
+        """Reload config & MIDI profile if needed. Return True if something was reloaded."""
+        reloaded = False
+
+        fpath = zynconf.get_config_fpath()
+        signature = get_file_signature(fpath)
+        if signature is None or fpath != self.config_fpath or signature != self.config_signature:
+            zynconf.load_config()
+            self.config_fpath = fpath
+            self.config_signature = signature
+            # MIDI profile path depends on the envars
+            self.midi_config_signature = None
+            reloaded = True
+            logging.debug("Reloaded config from '{}'".format(fpath))
+
+        fpath = zynconf.get_midi_config_fpath()
+        signature = get_file_signature(fpath)
+        if signature is None or fpath != self.midi_config_fpath or signature != self.midi_config_signature:
+            zynconf.load_midi_config()
+            self.midi_config_fpath = fpath
+            self.midi_config_signature = signature
+            reloaded = True
+            logging.debug("Reloaded MIDI config from '{}'".format(fpath))
+
+        return reloaded
+
+
+config_cache = ZynthianConfigCache()
+
+# ------------------------------------------------------------------------------
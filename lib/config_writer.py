@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Transactional Config Writer
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# All the envars writes go through config_writer.save_config():
+#
+#  + Inside a transaction (with config_writer.transaction(): ...), the saved
+#    keys are merged & the envars file is written once, when the outermost
+#    transaction ends without error. The process environment is updated at
+#    once, so the code running inside the transaction sees the new values.
+#  + The file is rewritten atomically (temp file + fsync + rename), so a
+#    crash or power loss never leaves a truncated envars file.
+#  + update_sys (system config regeneration, slow) is run once per commit, in
+#    a worker thread. Requests made while it's running are coalesced into a
+#    single re-run. Its progress is reported by get_status(). Anything that
+#    depends on the regenerated config (UI restart) must wait_update_sys().
+#
+# The transaction is held in a context variable, so concurrent requests
+# (tasks) don't join each other's transactions.
+# ------------------------------------------------------------------------------
+
+import os
+import re
+import time
+import asyncio
+import logging
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager
+
+import zynconf
+
+from lib.config_cache import config_cache
+
+UPDATE_SYS_FLAG_FPATH = "/zynthian_update_sys"
+
+envar_line_re = re.compile(r"^\s*export\s+(\w+)=")
+PATHS_SECTION = "# Directory Paths"
+
+current_transaction = contextvars.ContextVar("config_transaction", default=None)
+
+
+def escape_value(value):
+    # As zynconf.save_config
+    return str(value).replace("\n", "\\n").replace("\r", "")
+
+
+def write_envars_atomic(fpath, config):
+    """Replace (or add) the "export NAME="value"" lines of config in fpath, atomically."""
+    src_fpath = fpath
+    if not os.path.isfile(src_fpath):
+        # Start from the default envars, as zynconf does
+        src_fpath = os.environ.get('ZYNTHIAN_SYS_DIR', "/zynthian/zynthian-sys") + "/scripts/zynthian_envars.sh"
+    try:
+        with open(src_fpath, "r") as fh:
+            lines = fh.readlines()
+        mode = os.stat(src_fpath).st_mode & 0o7777
+    except FileNotFoundError:
+        lines = []
+        mode = 0o644
+
+    # New envars are added before the "Directory Paths" section, as zynconf does
+    add_row = None
+    pending = dict(config)
+    for i, line in enumerate(lines):
+        m = envar_line_re.match(line)
+        if m and m.group(1) in pending:
+            name = m.group(1)
+            lines[i] = 'export {}="{}"\n'.format(name, escape_value(pending.pop(name)))
+        elif add_row is None and line.startswith(PATHS_SECTION):
+            add_row = max(i - 1, 0)
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    if add_row is None:
+        add_row = len(lines)
+    lines[add_row:add_row] = ['export {}="{}"\n'.format(name, escape_value(value)) for name, value in pending.items()]
+
+    tmp_fpath = "{}.tmp{}".format(fpath, os.getpid())
+    try:
+        with open(tmp_fpath, "w") as fh:
+            fh.writelines(lines)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.chmod(tmp_fpath, mode)
+        os.replace(tmp_fpath, fpath)
+    except Exception:
+        if os.path.exists(tmp_fpath):
+            os.remove(tmp_fpath)
+        raise
+    # Persist the rename
+    try:
+        dfd = os.open(os.path.dirname(fpath) or ".", os.O_RDONLY)
+        try:
+            os.fsync(dfd)
+        finally:
+            os.close(dfd)
+    except OSError:
+        pass
+
+
+class ConfigTransaction:
+
+    def __init__(self):
+        self.config = {}
+        self.updsys = False
+        self.depth = 0
+
+    def add(self, config, updsys=False):
+        self.config.update(config)
+        self.updsys = self.updsys or updsys
+
+
+class ConfigWriter:
+
+    def __init__(self):
+        self.commits = 0
+        self.last_commit = None
+        # update_sys
+        self.update_task = None
+        self.update_pending = False
+        self.update_state = "idle"
+        self.update_runs = 0
+        self.update_coalesced = 0
+        self.update_started = None
+        self.update_finished = None
+        self.update_duration = None
+        self.update_error = None
+
+    # ---------------------------------------------------------------------------
+    # Transactions
+    # ---------------------------------------------------------------------------
+
+    @contextmanager
+    def transaction(self):
+        """
+        Batch the config saves made inside the block. Nested transactions join
+        the outer one. Nothing is written if the outermost block raises.
+        """
+        trans = current_transaction.get()
+        if trans:
+            trans.depth += 1
+            try:
+                yield trans
+            finally:
+                trans.depth -= 1
+            return
+
+        trans = ConfigTransaction()
+        token = current_transaction.set(trans)
+        try:
+            yield trans
+        except BaseException:
+            current_transaction.reset(token)
+            if trans.config:
+                logging.warning("Config transaction aborted. Not saved: {}".format(", ".join(trans.config)))
+                # Environment must match the config file again
+                config_cache.invalidate()
+            raise
+        current_transaction.reset(token)
+        self.commit(trans.config, trans.updsys)
+
+    def save_config(self, config, updsys=False):
+        """
+        Save envars, like zynconf.save_config. Inside a transaction the write (& update_sys)
+        is deferred until it ends. Returns None, as zynconf does.
+        """
+        config = {k: str(v) for k, v in config.items()}
+        os.environ.update(config)
+        trans = current_transaction.get()
+        if trans:
+            trans.add(config, updsys)
+        else:
+            self.commit(config, updsys)
+
+    def commit(self, config, updsys=False):
+        if config:
+            fpath = zynconf.get_config_fpath()
+            try:
+                write_envars_atomic(fpath, config)
+                self.commits += 1
+                self.last_commit = time.time()
+                logging.info("Saved {} envars to '{}'".format(len(config), fpath))
+            except Exception as e:
+                logging.error("Can't save config to '{}': {}".format(fpath, e))
+                raise
+            finally:
+                config_cache.invalidate()
+        if updsys:
+            self.request_update_sys()
+
+    # ---------------------------------------------------------------------------
+    # Deferred update_sys
+    # ---------------------------------------------------------------------------
+
+    def request_update_sys(self):
+        """Run update_sys in the background. If it's running already, run it once more afterwards."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not serving (scripts)
+            self.run_update_sys()
+            return
+        # If webconf dies before it's done, it's run on next boot
+        try:
+            Path(UPDATE_SYS_FLAG_FPATH).touch()
+        except OSError as e:
+            logging.error("Can't set update_sys flag: {}".format(e))
+        if self.update_task:
+            if self.update_pending:
+                self.update_coalesced += 1
+            self.update_pending = True
+            return
+        self.update_state = "pending"
+        self.update_task = loop.create_task(self.update_sys_task())
+
+    async def update_sys_task(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                self.update_pending = False
+                self.update_state = "running"
+                await loop.run_in_executor(None, self.run_update_sys)
+                if not self.update_pending:
+                    break
+        finally:
+            self.update_task = None
+            self.update_state = "failed" if self.update_error else "done"
+
+    async def wait_update_sys(self):
+        """Wait until the requested update_sys runs (re-runs included) are done."""
+        while self.update_task:
+            await asyncio.shield(self.update_task)
+
+    def run_update_sys(self):
+        self.update_started = time.time()
+        self.update_error = None
+        try:
+            zynconf.update_sys()
+            if os.path.isfile(UPDATE_SYS_FLAG_FPATH):
+                os.remove(UPDATE_SYS_FLAG_FPATH)
+        except Exception as e:
+            # The flag is kept, so it's retried on next boot
+            self.update_error = str(e)
+            logging.error("Updating System Config: {}".format(e))
+        self.update_finished = time.time()
+        self.update_duration = self.update_finished - self.update_started
+        self.update_runs += 1
+
+    def get_status(self):
+        return {
+            'state': self.update_state,
+            'busy': self.update_task is not None,
+            'pending': self.update_pending,
+            'started': self.update_started,
+            'finished': self.update_finished,
+            'duration_ms': None if self.update_duration is None else round(1000 * self.update_duration),
+            'error': self.update_error,
+            'runs': self.update_runs,
+            'coalesced': self.update_coalesced,
+            'commits': self.commits,
+            'last_commit': self.last_commit
+        }
+
+
+config_writer = ConfigWriter()
+
+# ------------------------------------------------------------------------------
@@ -26,10 +26,12 @@ import zynconf
 import os
 import re
 import sys
+import asyncio
 import logging
 import tornado.web
-from distutils import util
-from subprocess import check_output, DEVNULL
+from subprocess import DEVNULL
+from lib import command_runner
+from lib.service_monitor import service_monitor
 from lib.zynthian_config_handler import ZynthianBasicHandler
 
 sys.path.append(os.environ.get('ZYNTHIAN_UI_DIR'))
@@ -42,20 +44,31 @@ sys.path.append(os.environ.get('ZYNTHIAN_UI_DIR'))
 class DashboardHandler(ZynthianBasicHandler):
 
     @tornado.web.authenticated
-    def get(self):
-        # Get git info
-        git_info_zyncoder = self.get_git_info("/zynthian/zyncoder")
-        git_info_ui = self.get_git_info("/zynthian/zynthian-ui")
-        git_info_sys = self.get_git_info("/zynthian/zynthian-sys")
-        git_info_webconf = self.get_git_info("/zynthian/zynthian-webconf")
-        git_info_data = self.get_git_info("/zynthian/zynthian-data")
-
-        # Get Memory & SD Card info
-        ram_info = self.get_ram_info()
-        sd_info = self.get_sd_info()
+    async def get(self):
+        my_data_dir = os.environ.get('ZYNTHIAN_MY_DATA_DIR')
+        zynthian_dir = os.environ.get('ZYNTHIAN_DIR', "/zynthian")
+        # Get git info, Memory & SD Card info, etc. => run commands concurrently
+        (git_info_zyncoder, git_info_ui, git_info_sys, git_info_webconf, git_info_data,
+         ram_info, sd_info, os_info, temperature, ip,
+         num_snapshots, num_presets, num_soundfonts, num_audio_captures, num_midi_captures) = await asyncio.gather(
+            self.get_git_info(zynthian_dir + "/zyncoder"),
+            self.get_git_info(zynthian_dir + "/zynthian-ui"),
+            self.get_git_info(zynthian_dir + "/zynthian-sys"),
+            self.get_git_info(zynthian_dir + "/zynthian-webconf"),
+            self.get_git_info(zynthian_dir + "/zynthian-data"),
+            self.get_ram_info(),
+            self.get_sd_info(),
+            self.get_os_info(),
+            self.get_temperature(),
+            self.get_ip(),
+            self.get_num_of_files(my_data_dir + "/snapshots"),
+            self.get_num_of_presets(my_data_dir + "/presets"),
+            self.get_num_of_files(my_data_dir + "/soundfonts"),
+            self.get_num_of_files(my_data_dir + "/capture", "*.wav"),
+            self.get_num_of_files(my_data_dir + "/capture", "*.mid"))
 
         # get I2C chips info
-        i2c_chips = self.get_i2c_chips()
+        i2c_chips = await self.get_i2c_chips()
         if len(i2c_chips) > 0:
             i2c_info = ", ".join(map(str, i2c_chips))
         else:
@@ -96,7 +109,7 @@ class DashboardHandler(ZynthianBasicHandler):
                 'icon': 'glyphicon glyphicon-tasks',
                         'info': {
                             'OS_INFO': {
-                                'title': "{}".format(self.get_os_info())
+                                'title': "{}".format(os_info)
                             },
                             'BUILD_DATE': {
                                 'title': 'Build Date',
@@ -112,7 +125,7 @@ class DashboardHandler(ZynthianBasicHandler):
                             },
                             'TEMPERATURE': {
                                 'title': 'Temperature',
-                                'value': self.get_temperature()
+                                'value': temperature
                             },
                             'OVERCLOCKING': {
                                 'title': 'Overclock',
@@ -191,27 +204,27 @@ class DashboardHandler(ZynthianBasicHandler):
                 'info': {
                     'SNAPSHOTS': {
                         'title': 'Snapshots',
-                        'value': str(self.get_num_of_files(os.environ.get('ZYNTHIAN_MY_DATA_DIR')+"/snapshots")),
+                        'value': str(num_snapshots),
                         'url': "/lib-snapshot"
                     },
                     'USER_PRESETS': {
                         'title': 'User Presets',
-                        'value': str(self.get_num_of_presets(os.environ.get('ZYNTHIAN_MY_DATA_DIR')+"/presets")),
+                        'value': str(num_presets),
                         'url': "/lib-presets"
                     },
                     'USER_SOUNDFONTS': {
                         'title': 'User Soundfonts',
-                        'value': str(self.get_num_of_files(os.environ.get('ZYNTHIAN_MY_DATA_DIR')+"/soundfonts")),
+                        'value': str(num_soundfonts),
                         'url': "/lib-soundfont"
                     },
                     'AUDIO_CAPTURES': {
                         'title': 'Audio Captures',
-                        'value': str(self.get_num_of_files(os.environ.get('ZYNTHIAN_MY_DATA_DIR')+"/capture", "*.wav")),
+                        'value': str(num_audio_captures),
                         'url': "/lib-captures"
                     },
                     'MIDI_CAPTURES': {
                         'title': 'MIDI Captures',
-                        'value': str(self.get_num_of_files(os.environ.get('ZYNTHIAN_MY_DATA_DIR')+"/capture", "*.mid")),
+                        'value': str(num_midi_captures),
                         'url': "/lib-captures"
                     }
                 }
@@ -231,7 +244,7 @@ class DashboardHandler(ZynthianBasicHandler):
                     },
                     'IP': {
                         'title': 'IP',
-                        'value': self.get_ip(),
+                        'value': ip,
                         # 'url': "/sys-wifi"
                     },
                     'VNC': {
@@ -257,7 +270,7 @@ class DashboardHandler(ZynthianBasicHandler):
         ex_data_basedir = os.environ.get('ZYNTHIAN_EX_DATA_DIR', "/media/root")
         ex_data_dirs = zynconf.get_external_storage_dirs(ex_data_basedir)
         for exdir in ex_data_dirs:
-            media_info = self.get_media_info(exdir)
+            media_info = await self.get_media_info(exdir)
             if media_info:
                 dname = os.path.basename(exdir)
                 config['SYSTEM']['info']['MEDIA_' + dname] = {
@@ -276,14 +289,14 @@ class DashboardHandler(ZynthianBasicHandler):
         super().get("dashboard_block.html", "Dashboard", config, None)
 
     @staticmethod
-    def get_git_info(path, check_updates=False):
-        branch = check_output("cd %s; git branch | grep '*'" %
-                              path, shell=True).decode()[2:-1]
-        gitid = check_output("cd %s; git rev-parse HEAD" %
-                             path, shell=True).decode()[:-1]
+    async def get_git_info(path, check_updates=False):
+        branch = (await command_runner.check_output("cd %s; git branch | grep '*'" %
+                                                    path, timeout=command_runner.SHORT_TIMEOUT)).decode()[2:-1]
+        gitid = (await command_runner.check_output("cd %s; git rev-parse HEAD" %
+                                                   path, timeout=command_runner.SHORT_TIMEOUT)).decode()[:-1]
         if check_updates:
-            update = check_output(
-                "cd %s; git remote update; git status --porcelain -bs | grep behind | wc -l" % path, shell=True).decode()
+            update = (await command_runner.check_output(
+                "cd %s; git remote update; git status --porcelain -bs | grep behind | wc -l" % path, timeout=command_runner.SHORT_TIMEOUT)).decode()
         else:
             update = None
         return {"branch": branch, "gitid": gitid, "update": update}
@@ -295,8 +308,8 @@ class DashboardHandler(ZynthianBasicHandler):
             return hostname
 
     @staticmethod
-    def get_os_info():
-        return check_output("lsb_release -ds", shell=True).decode()
+    async def get_os_info():
+        return (await command_runner.check_output("lsb_release -ds", timeout=command_runner.SHORT_TIMEOUT)).decode()
 
     @staticmethod
     def get_build_info():
@@ -320,33 +333,34 @@ class DashboardHandler(ZynthianBasicHandler):
         return info
 
     @staticmethod
-    def get_ip():
+    async def get_ip():
         # out=check_output("hostname -I | cut -f1 -d' '", shell=True).decode()
         ips = []
-        for ip in check_output("hostname -I", shell=True).decode().split(" "):
+        for ip in (await command_runner.check_output("hostname -I", timeout=command_runner.SHORT_TIMEOUT)).decode().split(" "):
             # Filter ip6 addresses
             if '.' in ip:
                 ips.append(ip)
         return " ".join(ips)
 
     @staticmethod
-    def get_i2c_chips():
+    async def get_i2c_chips():
         res = []
         # zynia 2024-05-21
         # zynia has no i2c, so for now just return
         return res
         #
-        out = check_output("i2cdetect -y 1", shell=True).decode().split("\n")
+        out = (await command_runner.check_output("i2cdetect -y 1",
+                                                 timeout=command_runner.SHORT_TIMEOUT)).decode().split("\n")
         if len(out) > 3:
             for i in range(1, 8):
                 for adr in out[i][4:].split(" "):
                     try:
                         adr = int(adr, 16)
                         if 0x20 <= adr <= 0x27:
-                            out1 = check_output(
-                                "i2cget -y 1 {} 0x01".format(adr), shell=True).decode().strip()
-                            out2 = check_output(
-                                "i2cget -y 1 {} 0x10".format(adr), shell=True).decode().strip()
+                            out1 = (await command_runner.check_output(
+                                "i2cget -y 1 {} 0x01".format(adr), timeout=command_runner.SHORT_TIMEOUT)).decode().strip()
+                            out2 = (await command_runner.check_output(
+                                "i2cget -y 1 {} 0x10".format(adr), timeout=command_runner.SHORT_TIMEOUT)).decode().strip()
                             if out1 == '0x00' and out2 == '0x00':
                                 res.append("MCP23008@0x{:02X}".format(adr))
                             else:
@@ -355,46 +369,46 @@ class DashboardHandler(ZynthianBasicHandler):
                             res.append("ADS1115@0x{:02X}".format(adr))
                         elif 0x61 <= adr <= 0x67:
                             res.append("MCP4728@0x{:02X}".format(adr))
-                    except:
+                    except Exception:
                         pass
         return res
 
     @staticmethod
-    def get_ram_info():
-        out = check_output("free -m | grep 'Mem'", shell=True).decode()
+    async def get_ram_info():
+        out = (await command_runner.check_output("free -m | grep 'Mem'", timeout=command_runner.SHORT_TIMEOUT)).decode()
         parts = re.split('\s+', out)
         return {'total': parts[1]+"M", 'used': parts[2]+"M", 'free': parts[3]+"M", 'usage': "{}%".format(int(100*float(parts[2])/float(parts[1])))}
 
     @staticmethod
-    def get_temperature():
+    async def get_temperature():
         try:
-            return check_output("vcgencmd measure_temp", shell=True).decode()[5:-3] + "ºC"
+            return (await command_runner.check_output("vcgencmd measure_temp", timeout=command_runner.SHORT_TIMEOUT)).decode()[5:-3] + "ºC"
         except:
             return "???"
 
     @staticmethod
-    def get_volume_info(volume=None):
+    async def get_volume_info(volume=None):
         if volume is None:
             volume = "/dev/mmcblk0p2\|/dev/root"
         try:
-            out = check_output(
-                "df -h | grep '{}'".format(volume), shell=True).decode()
+            out = (await command_runner.check_output(
+                "df -h | grep '{}'".format(volume), timeout=command_runner.SHORT_TIMEOUT)).decode()
             parts = re.split('\s+', out)
             return {'total': parts[1], 'used': parts[2], 'free': parts[3], 'usage': parts[4]}
         except:
             return {'total': 'NA', 'used': 'NA', 'free': 'NA', 'usage': 'NA'}
 
     @staticmethod
-    def get_sd_info():
-        return DashboardHandler.get_volume_info("/dev/mmcblk0p2\|/dev/root")
+    async def get_sd_info():
+        return await DashboardHandler.get_volume_info("/dev/mmcblk0p2\|/dev/root")
 
     @staticmethod
-    def get_media_info(mpath="/media/usb0"):
+    async def get_media_info(mpath="/media/usb0"):
         try:
-            out = check_output("mountpoint '{}'".format(
-                mpath), shell=True).decode()
+            out = (await command_runner.check_output("mountpoint '{}'".format(
+                mpath), timeout=command_runner.SHORT_TIMEOUT)).decode()
             if out.startswith("{} is a mountpoint".format(mpath)):
-                return DashboardHandler.get_volume_info(mpath)
+                return await DashboardHandler.get_volume_info(mpath)
             else:
                 return None
         except Exception as e:
@@ -402,14 +416,14 @@ class DashboardHandler(ZynthianBasicHandler):
             pass
 
     @staticmethod
-    def get_num_of_files(path, pattern=None):
+    async def get_num_of_files(path, pattern=None):
         if pattern:
             pattern = "-name \"{}\"".format(pattern)
         else:
             pattern = ""
         try:
-            n = int(check_output("find {} -type f -follow {} | wc -l".format(path,
-                    pattern), shell=True, stderr=DEVNULL).decode())
+            n = int((await command_runner.check_output("find {} -type f -follow {} | wc -l".format(path,
+                    pattern), stderr=DEVNULL, timeout=command_runner.SHORT_TIMEOUT)).decode())
         except Exception as e:
             logging.error(
                 "Can't get num of files for '{}' => {}".format(path, e))
@@ -417,22 +431,22 @@ class DashboardHandler(ZynthianBasicHandler):
         return n
 
     @staticmethod
-    def get_num_of_presets(path):
+    async def get_num_of_presets(path):
         # LV2 presets
-        n1 = int(check_output(
-            "find {}/lv2 -type f -prune -name manifest.ttl | wc -l".format(path), shell=True).decode())
+        n1 = int((await command_runner.check_output(
+            "find {}/lv2 -type f -prune -name manifest.ttl | wc -l".format(path), timeout=command_runner.SHORT_TIMEOUT)).decode())
         logging.debug("LV2 presets => {}".format(n1))
         # Pianoteq presets
-        n2 = int(check_output(
-            "find {}/pianoteq -type f -prune | wc -l".format(path), shell=True).decode())
+        n2 = int((await command_runner.check_output(
+            "find {}/pianoteq -type f -prune | wc -l".format(path), timeout=command_runner.SHORT_TIMEOUT)).decode())
         logging.debug("Pianoteq presets => {}".format(n2))
         # Puredata presets
-        n3 = int(check_output("find {}/puredata/*/* -type d -prune | wc -l".format(path),
-                 shell=True, stderr=DEVNULL).decode())
+        n3 = int((await command_runner.check_output("find {}/puredata/*/* -type d -prune | wc -l".format(path),
+                 stderr=DEVNULL, timeout=command_runner.SHORT_TIMEOUT)).decode())
         logging.debug("Puredata presets => {}".format(n3))
         # ZynAddSubFX presets
-        n4 = int(check_output(
-            "find {}/zynaddsubfx -type f -name *.xiz | wc -l".format(path), shell=True).decode())
+        n4 = int((await command_runner.check_output(
+            "find {}/zynaddsubfx -type f -name *.xiz | wc -l".format(path), timeout=command_runner.SHORT_TIMEOUT)).decode())
         logging.debug("ZynAddSubFX presets => {}".format(n4))
         return n1 + n2 + n3 + n4
 
@@ -457,20 +471,12 @@ class DashboardHandler(ZynthianBasicHandler):
 
     @staticmethod
     def is_service_active(service):
-        cmd = "systemctl is-active %s" % service
-        try:
-            result = check_output(cmd, shell=True).decode('utf-8', 'ignore')
-        except Exception as e:
-            result = "ERROR: %s" % e
-        # print("Is service "+str(service)+" active? => "+str(result))
-        if result.strip() == 'active':
-            return True
-        else:
-            return False
+        return service_monitor.is_active(service)
 
     @staticmethod
     def bool2onoff(b):
-        if (isinstance(b, str) and util.strtobool(b)) or (isinstance(b, bool) and b):
+        # Same true values as distutils' strtobool, without importing distutils (slow & deprecated)
+        if (isinstance(b, str) and b.lower() in ("y", "yes", "t", "true", "on", "1")) or (isinstance(b, bool) and b):
             return "On"
         else:
             return "Off"
@@ -25,8 +25,8 @@
 import os
 import logging
 import tornado.web
-from subprocess import check_output
 
+from lib import command_runner
 from lib.zynthian_config_handler import ZynthianConfigHandler
 
 # ------------------------------------------------------------------------------
@@ -501,18 +501,18 @@ class DisplayConfigHandler(ZynthianConfigHandler):
         super().get("Display", config, errors)
 
     @tornado.web.authenticated
-    def post(self):
+    async def post(self):
         errors = self.update_config(
             tornado.escape.recursive_unicode(self.request.arguments))
-        self.delete_fb_splash()  # New splash-screens will be generated on next boot
+        await self.delete_fb_splash()  # New splash-screens will be generated on next boot
         self.reboot_flag = True
         self.get(errors)
 
     @classmethod
-    def delete_fb_splash(cls):
+    async def delete_fb_splash(cls):
         try:
             cmd = "rm -rf %s/img" % os.environ.get('ZYNTHIAN_CONFIG_DIR')
-            check_output(cmd, shell=True)
+            await command_runner.check_output(cmd, timeout=command_runner.SHORT_TIMEOUT)
         except Exception as e:
             logging.error("Deleting FrameBuffer Splash Screens: %s" % e)
 
@@ -25,13 +25,17 @@
 import os
 import sys
 import glob
+import inspect
 import shutil
 import logging
 import pexpect
 import tornado.web
-from subprocess import check_output, STDOUT
+from subprocess import STDOUT
 
 import zynconf
+from lib import command_runner
+from lib.job_executor import job_executor
+from lib.engine_registry import engine_registry
 from lib.zynthian_config_handler import ZynthianBasicHandler
 import zyngine.zynthian_lv2 as zynthian_lv2
 
@@ -60,7 +64,7 @@ class dsp56300Handler(ZynthianBasicHandler):
         super().get("dsp56300.html", "DSP56300", config, errors)
 
     @tornado.web.authenticated
-    def post(self):
+    async def post(self):
         errors = None
         try:
             action = self.get_argument('ZYNTHIAN_DSP56300_ACTION')
@@ -73,11 +77,13 @@ class dsp56300Handler(ZynthianBasicHandler):
                     'INSTALL_OSIRUS_ROMFILE': lambda: self.do_install_romfile("Osirus"),
                     'INSTALL_OSTIRUS_ROMFILE': lambda: self.do_install_romfile("OsTIrus"),
                 }[action]()
+                if inspect.isawaitable(errors):
+                    errors = await errors
             except Exception as err:
                 logging.error(err)
         self.get(errors)
 
-    def do_install_romfile(self, gear_name):
+    async def do_install_romfile(self, gear_name):
         plugin_bundle_dpath = self.plugins_dpath + "/" + gear_name + ".lv2"
         if not os.path.isdir(plugin_bundle_dpath):
             errors = f"Can't find a LV2 bundle dir for device '{gear_name}'"
@@ -97,14 +103,14 @@ class dsp56300Handler(ZynthianBasicHandler):
             try:
                 # Remove existing ROM files
                 logging.info(f"Remove existing ROM files from {plugin_bundle_dpath} ...")
-                res = check_output(f"cd {plugin_bundle_dpath}; rm -f *.bin; rm -f *.BIN",
-                                   shell=True, stderr=STDOUT).decode("utf-8")
+                res = (await command_runner.check_output(f"cd {plugin_bundle_dpath}; rm -f *.bin; rm -f *.BIN",
+                                                         stderr=STDOUT)).decode("utf-8")
                 # Copy uploaded file
                 fname = os.path.basename(fpath)
                 logging.info(f"Moving {fname} to {plugin_bundle_dpath} ...")
                 shutil.move(fpath, plugin_bundle_dpath + "/" + fname)
                 # Generate presets
-                errors = self.generate_presets(plugin_uri)
+                errors = await self.generate_presets(plugin_uri)
             except Exception as e:
                 errors = f"ROM file install failed: {e}"
                 logging.error(errors)
@@ -127,7 +133,7 @@ class dsp56300Handler(ZynthianBasicHandler):
                 logging.warning(f"No ROM file found for {gname} ({dpath}).")
         return config
 
-    def generate_presets(self, plugin_uri):
+    async def generate_presets(self, plugin_uri):
         errors = None
         command = f"jalv -n dsp53600_webconf \"{plugin_uri}\""
         try:
@@ -135,7 +141,8 @@ class dsp56300Handler(ZynthianBasicHandler):
             proc.delaybeforesend = 0
             proc.expect("\n> ")
             proc.terminate(True)
-            res = check_output(f"regenerate_lv2_presets.sh {plugin_uri}", shell=True, stderr=STDOUT).decode("utf-8")
+            res = (await job_executor.run_command("lv2_cache", f"regenerate_lv2_presets.sh {plugin_uri}", stderr=STDOUT)).decode("utf-8")
+            engine_registry.bump()
         except Exception as e:
             errors = f"Can't generate presets for '{plugin_uri}': {e}"
             logging.error(errors)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# LV2 Engine Registry
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import logging
+
+import zyngine.zynthian_lv2 as zynthian_lv2
+
+from lib.config_cache import get_file_signature
+
+# ------------------------------------------------------------------------------
+# Engine Registry
+# ------------------------------------------------------------------------------
+
+
+class EngineRegistry:
+    """
+    Process-wide holder of the zynthian_lv2 engine database.
+
+    Engines are parsed once and kept in zynthian_lv2.engines. They are only
+    re-read when the engines file changes on disk behind our back. Changes made
+    by webconf itself must go through save() or update(), so the in-memory
+    copy stays authoritative.
+    """
+
+    def __init__(self):
+        self.signature = None
+        self.version = 0
+        self.menu_flags = None
+
+    def get_signature(self):
+        return get_file_signature(zynthian_lv2.engines_fpath)
+
+    def load(self):
+        zynthian_lv2.load_engines()
+        self.update()
+        logging.debug("Loaded engine registry (version {})".format(self.version))
+
+    def refresh(self):
+        if self.signature is None or self.get_signature() != self.signature:
+            self.load()
+
+    def invalidate(self):
+        self.signature = None
+
+    def update(self):
+        """Register a change made to zynthian_lv2.engines by this process."""
+        self.signature = self.get_signature()
+        self.version += 1
+        self.menu_flags = None
+
+    def bump(self):
+        """Register a change in the engines' presets cache, which is not in the engines file."""
+        self.version += 1
+
+    def save(self):
+        zynthian_lv2.save_engines()
+        self.update()
+
+    def is_enabled(self, eng_code):
+        try:
+            return bool(zynthian_lv2.engines[eng_code]["ENABLED"])
+        except:
+            return False
+
+    def get_menu_flags(self):
+        if self.menu_flags is None:
+            self.menu_flags = {
+                "sw-dsp56300": self.is_enabled("JV/Osirus") or self.is_enabled("JV/OsTIrus"),
+                "sw-pianoteq": self.is_enabled("PT")
+            }
+        return self.menu_flags
+
+
+engine_registry = EngineRegistry()
+
+# ------------------------------------------------------------------------------
@@ -27,6 +27,8 @@ import json
 import logging
 import tornado.web
 
+from lib.job_executor import job_executor
+from lib.engine_registry import engine_registry
 from lib.zynthian_config_handler import ZynthianBasicHandler
 import zyngine.zynthian_lv2 as zynthian_lv2
 
@@ -80,15 +82,15 @@ class EnginesHandler(ZynthianBasicHandler):
             super().get("engines.html", "Engines", config, errors)
 
     @tornado.web.authenticated
-    def post(self):
+    async def post(self):
         action = self.get_argument('ZYNTHIAN_ENGINES_ACTION')
         logging.debug(f"Executing {action} ...")
         errors = None
         try:
             if action == "REGENERATE_ENGINES":
-                self.do_regenerate_engines()
+                await self.do_regenerate_engines()
             elif action == "REGENERATE_LV2_PRESETS_CACHE":
-                self.do_regenerate_lv2_presets_cache()
+                await self.do_regenerate_lv2_presets_cache()
         except Exception as e:
             errors = e
         self.get(errors)
@@ -131,7 +133,7 @@ class EnginesHandler(ZynthianBasicHandler):
             if edit > zynthian_lv2.engines[eng_code]['EDIT']:
                 zynthian_lv2.engines[eng_code]['EDIT'] = edit
             # logging.debug(f"Saving engine info => {zynthian_lv2.engines[eng_code]}")
-            zynthian_lv2.save_engines()
+            engine_registry.save()
 
     @tornado.web.authenticated
     def patch(self):
@@ -142,20 +144,29 @@ class EnginesHandler(ZynthianBasicHandler):
         if zynthian_lv2.engines[eng_code]['EDIT'] == 0:
             zynthian_lv2.engines[eng_code]['EDIT'] = 1
         logging.debug(f"Engine '{eng_code}' => ENABLED={eng_enabled}")
-        zynthian_lv2.save_engines()
+        engine_registry.save()
 
-    def do_regenerate_engines(self):
+    async def do_regenerate_engines(self):
         prev_engines = zynthian_lv2.engines.keys()
         # Regenerate engine info file, searching for LV2 plugins
         # zynthian_lv2.generate_engines_config_file(refresh=True, reset_rankings=None)
         zynthian_lv2.update_engine_defaults(refresh=True)
         zynthian_lv2.get_engines_by_type()
+        engine_registry.update()
         # Detect new LV2 plugins and generate presets cache for them
         for key, info in zynthian_lv2.engines.items():
             if key not in prev_engines and 'URL' in info and info['URL']:
-                zynthian_lv2.generate_plugin_presets_cache(info['URL'], False)
+                await job_executor.run("lv2_cache", zynthian_lv2.generate_plugin_presets_cache, info['URL'], False)
+                engine_registry.bump()
 
-    def do_regenerate_lv2_presets_cache(self):
+    async def do_regenerate_lv2_presets_cache(self):
+        try:
+            await job_executor.run("lv2_cache", self.regenerate_lv2_presets_cache)
+        finally:
+            engine_registry.bump()
+
+    @staticmethod
+    def regenerate_lv2_presets_cache():
         zynthian_lv2.generate_presets_cache_workaround()
         zynthian_lv2.generate_all_presets_cache(refresh=False)
         # TODO => send CUIA to reload preset info on running JALV processors
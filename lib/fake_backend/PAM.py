@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake PAM (python-pam) module
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import os
+
+# ------------------------------------------------------------------------------
+# PAM authentication against a fixed password
+# (ZYNTHIAN_WEBCONF_FAKE_PASSWORD, "opensynth" by default)
+# ------------------------------------------------------------------------------
+
+PAM_SERVICE = 1
+PAM_USER = 2
+PAM_CONV = 5
+
+PAM_PROMPT_ECHO_OFF = 1
+PAM_PROMPT_ECHO_ON = 2
+PAM_PROMPT_ERROR_MSG = 3
+PAM_PROMPT_TEXT_INFO = 4
+
+PAM_AUTH_ERR = 7
+
+
+class error(Exception):
+    pass
+
+
+def get_password():
+    return os.environ.get('ZYNTHIAN_WEBCONF_FAKE_PASSWORD', "opensynth")
+
+
+class pam:
+
+    def __init__(self):
+        self.items = {}
+
+    def start(self, service):
+        self.items[PAM_SERVICE] = service
+
+    def set_item(self, item, value):
+        self.items[item] = value
+
+    def ask_password(self, prompt):
+        resp = self.items[PAM_CONV](self, [(prompt, PAM_PROMPT_ECHO_OFF)], None)
+        if not resp:
+            raise error("Conversation error", PAM_AUTH_ERR)
+        return resp[0][0]
+
+    def authenticate(self):
+        if self.ask_password("Password: ") != get_password():
+            raise error("Authentication failure", PAM_AUTH_ERR)
+
+    def acct_mgmt(self):
+        pass
+
+    def chauthtok(self):
+        os.environ['ZYNTHIAN_WEBCONF_FAKE_PASSWORD'] = self.ask_password("New password: ")
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Offline Fake Backend
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# In-process stand-ins for the device-only modules webconf depends on
+# (zynconf, zyncoder, zyngine, zyngui, jack, liblo & PAM), so the whole app
+# can boot on a plain Linux box for development, load tests & profiling.
+#
+# Enable it with ZYNTHIAN_WEBCONF_FAKE_BACKEND=1. It must be installed before
+# any handler module is imported, because those read envars & import the
+# real modules at import time.
+# ------------------------------------------------------------------------------
+
+import os
+import sys
+import types
+import logging
+import importlib
+
+DEFAULT_ROOT = "/tmp/zynthian-fake"
+
+# Module name => fake implementation (relative to this package)
+FAKE_MODULES = {
+    "zynconf": ".zynconf",
+    "zyncoder.zyncore": ".zyncore",
+    "zyngine.zynthian_lv2": ".zynthian_lv2",
+    "zyngine.zynthian_chain_manager": ".zynthian_chain_manager",
+    "zyngine.zynthian_engine_alsa_mixer": ".zynthian_engine_alsa_mixer",
+    "zyngine.zynthian_engine_pianoteq": ".zynthian_engine_pianoteq",
+    "zyngine.zynthian_legacy_snapshot": ".zynthian_legacy_snapshot",
+    "zyngine.zynthian_midi_filter": ".zynthian_midi_filter",
+    "zyngui.zynthian_gui": ".zynthian_gui",
+    "zyngui.zynthian_gui_keybinding": ".zynthian_gui_keybinding",
+    "zyngui.zynthian_gui_engine": ".zynthian_gui_engine",
+    "jack": ".jack",
+    "liblo": ".liblo",
+    "PAM": ".PAM"
+}
+
+installed = False
+
+
+def is_enabled():
+    return os.environ.get('ZYNTHIAN_WEBCONF_FAKE_BACKEND', '0') not in ('', '0')
+
+
+def setup_environ(root):
+    """Point all the zynthian directory envars to the fake tree."""
+    envars = {
+        'ZYNTHIAN_DIR': root,
+        'ZYNTHIAN_CONFIG_DIR': root + "/config",
+        'ZYNTHIAN_MY_DATA_DIR': root + "/zynthian-my-data",
+        'ZYNTHIAN_DATA_DIR': root + "/zynthian-data",
+        'ZYNTHIAN_SYS_DIR': root + "/zynthian-sys",
+        'ZYNTHIAN_UI_DIR': root + "/zynthian-ui",
+        'ZYNTHIAN_RECIPE_DIR': root + "/zynthian-sys/scripts/recipes",
+        'ZYNTHIAN_EX_DATA_DIR': root + "/media"
+    }
+    for k, v in envars.items():
+        os.environ.setdefault(k, v)
+
+
+def register_module(name, module):
+    # Create the parent packages, so "import a.b" & "from a import b" work
+    parts = name.split(".")
+    for i in range(1, len(parts)):
+        pname = ".".join(parts[:i])
+        if pname not in sys.modules:
+            package = types.ModuleType(pname)
+            package.__path__ = []
+            sys.modules[pname] = package
+    sys.modules[name] = module
+    if len(parts) > 1:
+        setattr(sys.modules[".".join(parts[:-1])], parts[-1], module)
+
+
+def install(root=None, scale=None):
+    """
+    Install the fake modules into sys.modules and generate the fake
+    zynthian tree (config & my-data), if it doesn't exist yet.
+    """
+    global installed
+    if installed:
+        return
+    if root is None:
+        root = os.environ.get('ZYNTHIAN_WEBCONF_FAKE_ROOT', DEFAULT_ROOT)
+    setup_environ(root)
+
+    from lib.fake_backend import mydata
+    if scale is None:
+        scale = int(os.environ.get('ZYNTHIAN_WEBCONF_FAKE_SCALE', 1))
+    mydata.generate(root, scale=scale)
+
+    for name, fake_name in FAKE_MODULES.items():
+        register_module(name, importlib.import_module(fake_name, __name__))
+
+    # Answer service state queries from memory instead of systemctl
+    from lib.service_monitor import service_monitor, FakeServiceQuery
+    service_monitor.set_query(FakeServiceQuery({"zynthian": True}))
+
+    installed = True
+    logging.warning("Using fake backend on '{}'".format(root))
+
+# ------------------------------------------------------------------------------
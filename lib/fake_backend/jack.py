@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake jack (JACK-Client) module
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import re
+
+# ------------------------------------------------------------------------------
+# JACK client with a static graph of MIDI ports
+# ------------------------------------------------------------------------------
+
+
+class Port:
+
+    def __init__(self, name, is_input, is_physical=True, aliases=()):
+        self.name = name
+        self.shortname = name.split(":", 1)[1]
+        self.aliases = list(aliases)
+        self.is_input = is_input
+        self.is_output = not is_input
+        self.is_physical = is_physical
+        self.is_midi = True
+        self.is_audio = False
+
+
+ports = [
+    Port("ttymidi:MIDI_in", False),
+    Port("ttymidi:MIDI_out", True),
+    Port("a2j:Midi Through [14] (capture): Midi Through Port-0", False),
+    Port("a2j:Midi Through [14] (playback): Midi Through Port-0", True),
+    Port("a2j:Fake Keyboard [20] (capture): Fake Keyboard MIDI 1", False, aliases=("alsa_pcm:Fake-Keyboard/midi_capture_1", "Fake Keyboard")),
+    Port("a2j:Fake Keyboard [20] (playback): Fake Keyboard MIDI 1", True, aliases=("alsa_pcm:Fake-Keyboard/midi_playback_1", "Fake Keyboard")),
+    Port("jacknetumpd:netump_out", False, False),
+    Port("jacknetumpd:netump_in", True, False),
+    Port("QmidiNet:in_1", True, False),
+    Port("QmidiNet:out_1", False, False)
+]
+
+
+class Client:
+
+    def __init__(self, name, *args, **kwargs):
+        self.name = name
+
+    def get_ports(self, name_pattern='', is_audio=False, is_midi=False, is_input=False, is_output=False,
+                  is_physical=False, is_terminal=False):
+        res = []
+        for port in ports:
+            if name_pattern and not re.search(name_pattern, port.name):
+                continue
+            if (is_audio and not port.is_audio) or (is_midi and not port.is_midi):
+                continue
+            if (is_input and not port.is_input) or (is_output and not port.is_output):
+                continue
+            if is_physical and not port.is_physical:
+                continue
+            res.append(port)
+        return res
+
+    def activate(self):
+        pass
+
+    def deactivate(self):
+        pass
+
+    def close(self):
+        pass
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake liblo (pyliblo) module
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import socket
+import logging
+from collections import deque
+
+# ------------------------------------------------------------------------------
+# OSC messages are delivered in-process: to the fake Servers by port, or to a
+# stand-in of zynthian-ui's OSC server (port 1370). They are kept for
+# inspection too. The stand-in replies to the paths registered with
+# set_ui_reply(), so the request/reply code can be exercised offline.
+# ------------------------------------------------------------------------------
+
+UDP = 1
+TCP = 4
+
+UI_PORT = 1370
+FIRST_SERVER_PORT = 20000
+
+sent_messages = deque(maxlen=1000)
+# Fake servers by port
+servers = {}
+# path => function(args) returning (reply_path, reply_args), or None for no reply
+ui_replies = {}
+
+
+def set_ui_reply(path, reply):
+    ui_replies[path] = reply
+
+
+class AddressError(Exception):
+    pass
+
+
+class Address:
+
+    def __init__(self, host, port=None, proto=UDP):
+        self.hostname = host
+        self.port = port
+        self.protocol = proto
+
+    def get_url(self):
+        return "osc.{}://{}:{}/".format("tcp" if self.protocol == TCP else "udp", self.hostname, self.port)
+
+    url = property(get_url)
+
+
+def get_arg_values(args):
+    # Typed arguments are given as (type, value) tuples
+    return [arg[1] if isinstance(arg, tuple) else arg for arg in args]
+
+
+def deliver(target, path, args, src):
+    logging.debug("Fake OSC => {} {}".format(path, args))
+    sent_messages.append((path, args))
+    port = int(target.port)
+    if port in servers:
+        servers[port].post(path, get_arg_values(args), src)
+    elif port == UI_PORT and path in ui_replies and src is not None and int(src.port) in servers:
+        reply = ui_replies[path](get_arg_values(args))
+        if reply:
+            servers[int(src.port)].post(reply[0], get_arg_values(reply[1]), Address("localhost", UI_PORT))
+
+
+def send(target, path, *args):
+    deliver(target, path, args, None)
+
+
+class Server:
+
+    def __init__(self, port=None, proto=UDP, reg_methods=True):
+        if port is None:
+            port = FIRST_SERVER_PORT
+            while port in servers or port == UI_PORT:
+                port += 1
+        self.port = int(port)
+        self.protocol = proto
+        self.methods = []
+        self.queue = deque()
+        # Readable while there are queued messages, so it can be polled
+        self.rsock, self.wsock = socket.socketpair()
+        self.rsock.setblocking(False)
+        servers[self.port] = self
+
+    def get_url(self):
+        return "osc.udp://localhost:{}/".format(self.port)
+
+    url = property(get_url)
+
+    def fileno(self):
+        return self.rsock.fileno()
+
+    def add_method(self, path, typespec, func, user_data=None):
+        self.methods.append((path, func))
+
+    def post(self, path, args, src):
+        self.queue.append((path, args, src))
+        self.wsock.send(b"x")
+
+    def recv(self, timeout=None):
+        if not self.queue:
+            return False
+        try:
+            self.rsock.recv(1)
+        except BlockingIOError:
+            pass
+        path, args, src = self.queue.popleft()
+        for mpath, func in self.methods:
+            if mpath is None or mpath == path:
+                func(path, args, "", src)
+                break
+        return True
+
+    def send(self, target, path, *args):
+        deliver(target, path, args, Address("localhost", self.port))
+
+    def free(self):
+        servers.pop(self.port, None)
+        self.rsock.close()
+        self.wsock.close()
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake zynthian tree & synthetic my-data generator
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import os
+import json
+import wave
+import random
+import logging
+from subprocess import run, DEVNULL
+
+# ------------------------------------------------------------------------------
+# Synthetic data. Sizes are multiplied by "scale", so load tests can check how
+# the pages behave with bigger libraries. Content is deterministic (seeded).
+# ------------------------------------------------------------------------------
+
+NUM_SNAPSHOT_BANKS = 4
+NUM_SNAPSHOTS_PER_BANK = 16
+NUM_PRESET_BANKS = 6
+NUM_PRESETS_PER_BANK = 24
+NUM_CAPTURES = 8
+NUM_LV2_ENGINES = 60
+
+ENVARS = {
+    'RBPI_VERSION': "Raspberry Pi 5 Model B Rev 1.0",
+    'RBPI_VERSION_NUMBER': "5",
+    'ZYNTHIAN_KIT_VERSION': "V5",
+    'SOUNDCARD_NAME': "V5 ADAC",
+    'SOUNDCARD_CONFIG': "dtoverlay=hifiberry-dacplusadcpro",
+    'SOUNDCARD_MIXER': "Digital_0,Digital_1,ADC_0,ADC_1",
+    'JACKD_OPTIONS': "-P 70 -s -d alsa -d hw:sndrpihifiberry -r 48000 -p 256 -n 2 -X raw",
+    'DISPLAY_NAME': "Z2 Display",
+    'DISPLAY_WIDTH': "800",
+    'DISPLAY_HEIGHT': "480",
+    'ZYNTHIAN_WIRING_LAYOUT': "V5",
+    'ZYNTHIAN_WIRING_LAYOUT_CUSTOM_PROFILE': "",
+    'ZYNTHIAN_UI_FONT_SIZE': "16",
+    'ZYNTHIAN_UI_COLOR_BG': "#000000",
+    'ZYNTHIAN_UI_COLOR_TX': "#ffffff",
+    'ZYNTHIAN_UI_COLOR_ON': "#ff0000",
+    'ZYNTHIAN_UI_COLOR_PANEL_BG': "#3a424d",
+    'ZYNTHIAN_VNCSERVER_ENABLED': "0",
+    'ZYNTHIAN_OVERCLOCKING': "None",
+    'ZYNTHIAN_PIANOTEQ_VOICE_LIMIT': "32"
+}
+
+MIDI_PROFILE = {
+    'ZYNTHIAN_MIDI_PORTS': "DISABLED_IN=\\nENABLED_OUT=ttymidi:MIDI_out\\nENABLED_FB=",
+    'ZYNTHIAN_MIDI_FILTER_RULES': "",
+    'ZYNTHIAN_MIDI_PROG_CHANGE_ZS3': "1",
+    'ZYNTHIAN_MIDI_BANK_CHANGE': "0",
+    'ZYNTHIAN_MIDI_FINE_TUNING': "440",
+    'ZYNTHIAN_MIDI_MASTER_CHANNEL': "0",
+    'ZYNTHIAN_MIDI_MASTER_NOTE_CUIA': ""
+}
+
+GIT_REPOS = ["zynthian-ui", "zynthian-webconf", "zyncoder", "zynthian-sys", "zynthian-data"]
+GIT_BRANCH = "oram"
+
+ENGINE_NAMES = ["Dexed", "Helm", "Surge", "OB-Xd", "Vitalium", "Odin2", "Noize Mak3r", "Raffo",
+                "Calf Reverb", "Dragonfly Hall", "TAP Chorus", "x42 EQ", "Guitarix", "Zam Delay",
+                "Fabla", "Setbfree", "Sfizz", "Drumkv1", "Synthv1", "Padthv1"]
+
+
+def write_envars(fpath, envars):
+    with open(fpath, "w") as fh:
+        for k, v in envars.items():
+            fh.write("export {}=\"{}\"\n".format(k, v))
+
+
+def write_wav(fpath, seconds=0.25, rate=8000):
+    with wave.open(fpath, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(b"\x00\x00" * int(seconds * rate))
+
+
+def write_smf(fpath):
+    # Format 0, 1 track, a single note on/off
+    track = bytes([0x00, 0x90, 0x3C, 0x64, 0x60, 0x80, 0x3C, 0x00, 0x00, 0xFF, 0x2F, 0x00])
+    with open(fpath, "wb") as fh:
+        fh.write(b"MThd" + (6).to_bytes(4, "big") + (0).to_bytes(2, "big") +
+                 (1).to_bytes(2, "big") + (96).to_bytes(2, "big"))
+        fh.write(b"MTrk" + len(track).to_bytes(4, "big") + track)
+
+
+def generate_engines(rnd, n):
+    types = [("MIDI Synth", "Synth"), ("Audio Effect", "Reverb"), ("MIDI Tool", "Arpeggiator")]
+    engines = {
+        "JV/Osirus": {"NAME": "Osirus", "TITLE": "Osirus", "TYPE": "MIDI Synth", "CAT": "Synth",
+                      "URL": "http://theusualsuspects.lv2.Osirus", "ENABLED": False},
+        "PT": {"NAME": "Pianoteq", "TITLE": "Pianoteq", "TYPE": "MIDI Synth", "CAT": "Piano",
+               "URL": "", "ENABLED": False}
+    }
+    for i in range(n):
+        name = "{} {}".format(ENGINE_NAMES[i % len(ENGINE_NAMES)], i // len(ENGINE_NAMES) + 1)
+        eng_type, cat = types[i % len(types)]
+        engines["JV/" + name] = {
+            "NAME": name,
+            "TITLE": name,
+            "TYPE": eng_type,
+            "CAT": cat,
+            "URL": "http://fake.zynthian.org/lv2/{}".format(i),
+            "ENABLED": rnd.random() < 0.5
+        }
+    for i, info in enumerate(engines.values()):
+        info.update({
+            "ID": i,
+            "DESCR": "Fake {} plugin".format(info["TYPE"].lower()),
+            "QUALITY": rnd.randint(0, 5),
+            "COMPLEX": rnd.randint(0, 5),
+            "EDIT": 0
+        })
+    return engines
+
+
+def generate_git_repo(root, name):
+    """Create a repo with a local "origin", so branch & tag queries work."""
+    origin = "{}/git/{}.git".format(root, name)
+    repo_dpath = "{}/{}".format(root, name)
+    env = dict(os.environ, GIT_AUTHOR_NAME="zynthian", GIT_AUTHOR_EMAIL="fake@zynthian.org",
+               GIT_COMMITTER_NAME="zynthian", GIT_COMMITTER_EMAIL="fake@zynthian.org")
+    cmds = [
+        ["git", "init", "-q", "--bare", "-b", GIT_BRANCH, origin],
+        ["git", "init", "-q", "-b", GIT_BRANCH, repo_dpath],
+        ["git", "-C", repo_dpath, "commit", "-q", "--allow-empty", "-m", "Fake commit"],
+        ["git", "-C", repo_dpath, "tag", GIT_BRANCH + "-2409"],
+        ["git", "-C", repo_dpath, "remote", "add", "origin", origin],
+        ["git", "-C", repo_dpath, "push", "-q", "origin", GIT_BRANCH, "--tags"]
+    ]
+    for cmd in cmds:
+        if run(cmd, env=env, stdout=DEVNULL, stderr=DEVNULL).returncode:
+            logging.error("Can't generate fake git repo '{}'".format(name))
+            return
+
+
+def generate_snapshot(rnd, name):
+    chains = {}
+    for i in range(rnd.randint(1, 4)):
+        chains[str(i + 1)] = {
+            "midi_chan": i,
+            "title": "{} {}".format(name, i + 1),
+            "slots": [{"engine": rnd.choice(["ZY", "FS", "JV/Dexed 1"]), "bank": "Default", "preset": "Preset {}".format(i)}]
+        }
+    return {"format_version": 1, "chains": chains, "zs3": {}, "midi_profile_state": {}}
+
+
+def generate(root, scale=1, force=False):
+    """Generate the fake zynthian tree under root, unless it already exists."""
+    marker = root + "/.fake_backend"
+    if os.path.isfile(marker) and not force:
+        return
+    logging.warning("Generating fake zynthian tree on '{}' (scale={}) ...".format(root, scale))
+    rnd = random.Random(scale)
+
+    config_dir = os.environ.get('ZYNTHIAN_CONFIG_DIR', root + "/config")
+    my_data_dir = os.environ.get('ZYNTHIAN_MY_DATA_DIR', root + "/zynthian-my-data")
+    sys_dir = os.environ.get('ZYNTHIAN_SYS_DIR', root + "/zynthian-sys")
+    for dpath in (config_dir + "/midi-profiles", config_dir + "/wiring-profiles",
+                  sys_dir + "/config", sys_dir + "/scripts/recipes",
+                  os.environ.get('ZYNTHIAN_UI_DIR', root + "/zynthian-ui"),
+                  os.environ.get('ZYNTHIAN_DATA_DIR', root + "/zynthian-data"),
+                  os.environ.get('ZYNTHIAN_EX_DATA_DIR', root + "/media"),
+                  root + "/zynthian-webconf", my_data_dir + "/capture", my_data_dir + "/soundfonts/sf2"):
+        os.makedirs(dpath, exist_ok=True)
+
+    # Config
+    midi_profile_fpath = config_dir + "/midi-profiles/default.sh"
+    envars = dict(ENVARS)
+    envars['ZYNTHIAN_SCRIPT_MIDI_PROFILE'] = midi_profile_fpath
+    write_envars(config_dir + "/zynthian_envars.sh", envars)
+    write_envars(midi_profile_fpath, MIDI_PROFILE)
+    write_envars(sys_dir + "/config/default_midi_profile.sh", MIDI_PROFILE)
+    with open(config_dir + "/engines.json", "w") as fh:
+        json.dump(generate_engines(rnd, NUM_LV2_ENGINES * scale), fh, indent=2)
+
+    # Repositories
+    for name in GIT_REPOS:
+        generate_git_repo(root, name)
+
+    # Snapshots
+    for b in range(NUM_SNAPSHOT_BANKS * scale):
+        bank_dpath = "{}/snapshots/{:03d}-Bank {}".format(my_data_dir, b, b)
+        os.makedirs(bank_dpath, exist_ok=True)
+        for p in range(NUM_SNAPSHOTS_PER_BANK):
+            name = "Snapshot {}".format(p)
+            with open("{}/{:03d}-{}.zss".format(bank_dpath, p, name), "w") as fh:
+                json.dump(generate_snapshot(rnd, name), fh)
+
+    # Presets
+    for dname, fext in (("zynaddsubfx", "xiz"), ("sf2", "sf2"), ("lscp", "lscp"), ("lv2", "ttl")):
+        for b in range(NUM_PRESET_BANKS * scale):
+            bank_dpath = "{}/presets/{}/Bank {}".format(my_data_dir, dname, b)
+            os.makedirs(bank_dpath, exist_ok=True)
+            for p in range(NUM_PRESETS_PER_BANK):
+                with open("{}/{:04d}-Preset {}.{}".format(bank_dpath, p, p, fext), "wb") as fh:
+                    fh.write(os.urandom(rnd.randint(256, 4096)))
+
+    # Soundfonts
+    for i in range(NUM_PRESET_BANKS * scale):
+        with open("{}/soundfonts/sf2/Soundfont {}.sf2".format(my_data_dir, i), "wb") as fh:
+            fh.write(os.urandom(4096))
+
+    # Captures
+    for i in range(NUM_CAPTURES * scale):
+        write_wav("{}/capture/audio-{:03d}.wav".format(my_data_dir, i), seconds=0.25 + i * 0.25)
+        write_smf("{}/capture/midi-{:03d}.mid".format(my_data_dir, i))
+
+    with open(marker, "w") as fh:
+        fh.write(str(scale))
+
+# ------------------------------------------------------------------------------
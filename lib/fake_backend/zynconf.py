@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake zynconf module
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import os
+import re
+import shutil
+import logging
+
+# ------------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------------
+
+CustomSwitchActionType = [
+    "NONE",
+    "UI_ACTION",
+    "MIDI_CC",
+    "MIDI_CC_SWITCH",
+    "MIDI_NOTE",
+    "MIDI_PROG_CHANGE",
+    "MIDI_CLOCK",
+    "MIDI_TRANSPORT_START",
+    "MIDI_TRANSPORT_CONTINUE",
+    "MIDI_TRANSPORT_STOP",
+    "CVGATE_IN",
+    "CVGATE_OUT",
+    "GATE_OUT"
+]
+
+ZynSensorActionType = [
+    "NONE",
+    "MIDI_CC",
+    "MIDI_PITCH_BEND",
+    "MIDI_CHAN_PRESS"
+]
+
+NoteCuiaDefault = {
+    "0": "POWER_OFF",
+    "1": "REBOOT",
+    "2": "RESTART_UI",
+    "3": "RELOAD_MIDI_CONFIG",
+    "4": "RELOAD_KEY_BINDING",
+    "5": "LAST_STATE_ACTION",
+    "10": "ALL_NOTES_OFF",
+    "11": "ALL_SOUNDS_OFF",
+    "12": "ALL_OFF"
+}
+
+envar_re = re.compile(r"^\s*export\s+(\w+)=\"?(.*?)\"?\s*$")
+
+# ------------------------------------------------------------------------------
+# Envars files: "export NAME="value"" lines, like the real shell scripts
+# ------------------------------------------------------------------------------
+
+
+def read_envars(fpath):
+    envars = {}
+    with open(fpath, "r") as fh:
+        for line in fh:
+            m = envar_re.match(line)
+            if m:
+                envars[m.group(1)] = m.group(2)
+    return envars
+
+
+def write_envars(fpath, config):
+    try:
+        with open(fpath, "r") as fh:
+            lines = fh.readlines()
+    except FileNotFoundError:
+        lines = []
+    pending = dict(config)
+    for i, line in enumerate(lines):
+        m = envar_re.match(line)
+        if m and m.group(1) in pending:
+            lines[i] = "export {}=\"{}\"\n".format(m.group(1), pending.pop(m.group(1)))
+    for k, v in pending.items():
+        lines.append("export {}=\"{}\"\n".format(k, v))
+    with open(fpath + ".tmp", "w") as fh:
+        fh.writelines(lines)
+    os.replace(fpath + ".tmp", fpath)
+
+# ------------------------------------------------------------------------------
+# Config API
+# ------------------------------------------------------------------------------
+
+
+def get_config_fpath():
+    return os.environ.get('ZYNTHIAN_CONFIG_DIR') + "/zynthian_envars.sh"
+
+
+def load_config(set_env=True, fpath=None):
+    if not fpath:
+        fpath = get_config_fpath()
+    envars = read_envars(fpath)
+    if set_env:
+        os.environ.update(envars)
+    return envars
+
+
+def save_config(config, updsys=False, fpath=None):
+    if not fpath:
+        fpath = get_config_fpath()
+    config = {k: v.replace("\n", "\\n") for k, v in config.items()}
+    write_envars(fpath, config)
+    os.environ.update(config)
+    if updsys:
+        update_sys()
+
+
+def update_sys():
+    logging.info("Fake update_sys")
+
+
+def get_midi_config_fpath(fpath=None):
+    if not fpath:
+        fpath = os.environ.get('ZYNTHIAN_SCRIPT_MIDI_PROFILE',
+                               os.environ.get('ZYNTHIAN_CONFIG_DIR') + "/midi-profiles/default.sh")
+    if not os.path.isfile(fpath):
+        default_fpath = os.environ.get('ZYNTHIAN_SYS_DIR') + "/config/default_midi_profile.sh"
+        shutil.copyfile(default_fpath, fpath)
+    return fpath
+
+
+def load_midi_config(set_env=True, fpath=None):
+    envars = read_envars(get_midi_config_fpath(fpath))
+    if set_env:
+        os.environ.update(envars)
+    return envars
+
+
+def update_midi_profile(params, fpath=None):
+    if not fpath:
+        fpath = get_midi_config_fpath()
+    config = {}
+    for k, v in params.items():
+        if k.startswith('ZYNTHIAN_MIDI_'):
+            config[k] = v[0].replace("\n", "\\n").replace("\r", "")
+    write_envars(fpath, config)
+
+# ------------------------------------------------------------------------------
+# Network
+# ------------------------------------------------------------------------------
+
+
+def get_nwdev_status_code(nwdev):
+    return 0
+
+
+def get_nwdev_status_string(nwdev):
+    return "<span class='wifi-off'>off</span>"
+
+
+def get_wifi_list():
+    # ssid, signal, description, configured, enabled
+    return [
+        ("zynthian-fake", -40, "Fake network", True, True),
+        ("neighbours", -80, "Fake network", False, False)
+    ]
+
+
+def get_external_storage_dirs(exdpath):
+    try:
+        return [os.path.join(exdpath, d) for d in sorted(os.listdir(exdpath))]
+    except OSError:
+        return []
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake zyngine.zynthian_chain_manager module
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+from lib.fake_backend import zynthian_lv2
+from lib.fake_backend.zynthian_engines import *
+
+# ------------------------------------------------------------------------------
+# Chain Manager: only the engine info is needed by webconf
+# ------------------------------------------------------------------------------
+
+
+class zynthian_chain_manager:
+
+    builtin_engines = {
+        "ZY": ("ZynAddSubFX", "Synth", zynthian_engine_zynaddsubfx),
+        "FS": ("FluidSynth", "Sampler", zynthian_engine_fluidsynth),
+        "LS": ("LinuxSampler", "Sampler", zynthian_engine_linuxsampler)
+    }
+
+    @classmethod
+    def get_engine_info(cls):
+        engine_info = {}
+        for code, (title, cat, engine_cls) in cls.builtin_engines.items():
+            engine_info[code] = {
+                'NAME': title,
+                'TITLE': title,
+                'TYPE': zynthian_lv2.EngineType.MIDI_SYNTH.value,
+                'CAT': cat,
+                'ENABLED': True,
+                'ENGINE': engine_cls
+            }
+        for code, info in zynthian_lv2.engines.items():
+            info = dict(info)
+            info['ENGINE'] = zynthian_engine_jalv
+            engine_info[code] = info
+        return engine_info
+
+# ------------------------------------------------------------------------------
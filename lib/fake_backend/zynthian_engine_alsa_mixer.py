@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake zyngine.zynthian_engine_alsa_mixer module
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+from collections import OrderedDict
+
+# ------------------------------------------------------------------------------
+# ALSA mixer with a few in-memory controllers
+# ------------------------------------------------------------------------------
+
+
+class zynthian_controller:
+
+    def __init__(self, symbol, name, value=0, value_min=0, value_max=100, labels=None, is_toggle=False):
+        self.symbol = symbol
+        self.name = name
+        self.value = value
+        self.value_min = value_min
+        self.value_max = value_max
+        self.labels = labels
+        self.is_toggle = is_toggle
+        self.is_integer = not is_toggle and not labels
+
+    def get_value(self):
+        return self.value
+
+    def get_value2label(self):
+        if self.labels:
+            return self.labels[self.value]
+        return str(self.value)
+
+    def set_value(self, value):
+        if self.labels and value in self.labels:
+            self.value = self.labels.index(value)
+        elif self.is_toggle:
+            self.value = 1 if value in (1, "1", "on", True) else 0
+        else:
+            self.value = max(self.value_min, min(self.value_max, int(value)))
+
+
+class zynthian_engine_alsa_mixer:
+
+    zctrls = None
+
+    @classmethod
+    def init_zynapi_instance(cls):
+        if cls.zctrls is None:
+            cls.zctrls = OrderedDict()
+            for zctrl in (zynthian_controller("Digital_0", "Digital Left", 80),
+                          zynthian_controller("Digital_1", "Digital Right", 80),
+                          zynthian_controller("ADC_0", "ADC Left", 60),
+                          zynthian_controller("ADC_1", "ADC Right", 60),
+                          zynthian_controller("Mute", "Mute", 0, 0, 1, is_toggle=True),
+                          zynthian_controller("Mode", "Input Mode", 0, 0, 1, labels=["Line", "Mic"])):
+                cls.zctrls[zctrl.symbol] = zctrl
+
+    @classmethod
+    def zynapi_get_device_name(cls):
+        return "Fake"
+
+    @classmethod
+    def zynapi_get_rbpi_device_name(cls):
+        return None
+
+    @classmethod
+    def zynapi_get_controllers(cls, ctrl_filter="*"):
+        return cls.zctrls
+
+# ------------------------------------------------------------------------------
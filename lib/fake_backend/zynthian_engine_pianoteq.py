@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake zyngine.zynthian_engine_pianoteq module
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import os
+
+# ------------------------------------------------------------------------------
+# Pianoteq: not installed
+# ------------------------------------------------------------------------------
+
+PIANOTEQ_DIR = os.environ.get('ZYNTHIAN_DIR') + "/pianoteq"
+PIANOTEQ_BINARY = PIANOTEQ_DIR + "/Pianoteq"
+PIANOTEQ_ADDON_DIR = os.environ.get('ZYNTHIAN_MY_DATA_DIR') + "/pianoteq/Addons"
+PIANOTEQ_CONFIG_FILE = PIANOTEQ_DIR + "/Pianoteq.prefs"
+
+
+def get_pianoteq_binary_info():
+    return {
+        'version': (8, 0, 0),
+        'version_str': "8.0.0",
+        'product': "STAGE",
+        'trial': True
+    }
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake engine classes, with the zynapi preset management interface
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import os
+import shutil
+
+# ------------------------------------------------------------------------------
+# Engine with banks as directories & presets as files, under my-data/presets
+# ------------------------------------------------------------------------------
+
+
+class zynthian_engine:
+
+    presets_dname = None
+    preset_fexts = ()
+    upload_formats = ""
+
+    @classmethod
+    def init_zynapi_instance(cls, eng_code=None):
+        pass
+
+    @classmethod
+    def get_zynapi_methods(cls):
+        return [f for f in dir(cls) if f.startswith('zynapi_')]
+
+    @classmethod
+    def get_bank_dpath(cls):
+        return os.environ.get('ZYNTHIAN_MY_DATA_DIR') + "/presets/" + cls.presets_dname
+
+    @classmethod
+    def zynapi_get_formats(cls):
+        return cls.upload_formats
+
+    @classmethod
+    def zynapi_martifact_formats(cls):
+        return cls.upload_formats
+
+    @classmethod
+    def zynapi_get_banks(cls):
+        banks = []
+        dpath = cls.get_bank_dpath()
+        for f in sorted(os.listdir(dpath)):
+            fullpath = os.path.join(dpath, f)
+            if os.path.isdir(fullpath):
+                banks.append({
+                    'text': f,
+                    'name': f,
+                    'fullpath': fullpath,
+                    'readonly': False
+                })
+        return banks
+
+    @classmethod
+    def zynapi_get_presets(cls, bank):
+        presets = []
+        for f in sorted(os.listdir(bank['fullpath'])):
+            name, fext = os.path.splitext(f)
+            if fext[1:].lower() in cls.preset_fexts:
+                presets.append({
+                    'text': f,
+                    'name': name,
+                    'fullpath': os.path.join(bank['fullpath'], f),
+                    'readonly': False
+                })
+        return presets
+
+    @classmethod
+    def zynapi_new_bank(cls, bank_name):
+        os.mkdir(cls.get_bank_dpath() + "/" + bank_name)
+
+    @classmethod
+    def zynapi_rename_bank(cls, bank_path, new_bank_name):
+        os.rename(bank_path, os.path.join(os.path.dirname(bank_path), new_bank_name))
+
+    @classmethod
+    def zynapi_remove_bank(cls, bank_path):
+        shutil.rmtree(bank_path)
+
+    @classmethod
+    def zynapi_rename_preset(cls, preset_path, new_preset_name):
+        fext = os.path.splitext(preset_path)[1]
+        os.rename(preset_path, os.path.join(os.path.dirname(preset_path), new_preset_name + fext))
+
+    @classmethod
+    def zynapi_remove_preset(cls, preset_path):
+        os.remove(preset_path)
+
+    @classmethod
+    def zynapi_download(cls, fullpath):
+        return fullpath
+
+    @classmethod
+    def zynapi_install(cls, dpath, bank_path):
+        if not bank_path:
+            bank_path = cls.get_bank_dpath() + "/" + os.path.basename(dpath)
+            shutil.copytree(dpath, bank_path, dirs_exist_ok=True)
+        elif os.path.isdir(dpath):
+            shutil.copytree(dpath, bank_path, dirs_exist_ok=True)
+        else:
+            shutil.copy(dpath, bank_path)
+
+
+class zynthian_engine_zynaddsubfx(zynthian_engine):
+    presets_dname = "zynaddsubfx"
+    preset_fexts = ("xiz",)
+    upload_formats = "xiz,zip,tgz,tar.gz,tar.bz2"
+
+
+class zynthian_engine_fluidsynth(zynthian_engine):
+    presets_dname = "sf2"
+    preset_fexts = ("sf2",)
+    upload_formats = "sf2,zip,tgz,tar.gz,tar.bz2"
+
+
+class zynthian_engine_linuxsampler(zynthian_engine):
+    presets_dname = "lscp"
+    preset_fexts = ("lscp", "gig")
+    upload_formats = "gig,zip,tgz,tar.gz,tar.bz2"
+
+
+class zynthian_engine_jalv(zynthian_engine):
+    presets_dname = "lv2"
+    preset_fexts = ("ttl",)
+    upload_formats = "zip,tgz,tar.gz,tar.bz2"
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake zyngui.zynthian_gui module
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# GUI: only the CUIA list is needed by webconf
+# ------------------------------------------------------------------------------
+
+
+class zynthian_gui:
+
+    cuia_list = [
+        "POWER_OFF", "REBOOT", "RESTART_UI", "EXIT_UI", "RELOAD_MIDI_CONFIG",
+        "RELOAD_WIRING_LAYOUT", "RELOAD_KEY_BINDING", "LAST_STATE_ACTION",
+        "ALL_NOTES_OFF", "ALL_SOUNDS_OFF", "ALL_OFF", "START_AUDIO_RECORD",
+        "STOP_AUDIO_RECORD", "TOGGLE_AUDIO_RECORD", "START_AUDIO_PLAY",
+        "STOP_AUDIO_PLAY", "TOGGLE_AUDIO_PLAY", "START_MIDI_RECORD",
+        "STOP_MIDI_RECORD", "TOGGLE_MIDI_RECORD", "START_MIDI_PLAY",
+        "STOP_MIDI_PLAY", "TOGGLE_MIDI_PLAY", "ARROW_UP", "ARROW_DOWN",
+        "ARROW_LEFT", "ARROW_RIGHT", "BACK", "SELECT", "ZYNSWITCH", "NOP"
+    ]
+
+    @classmethod
+    def get_cuia_list(cls):
+        return list(cls.cuia_list)
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake zyngui.zynthian_gui_keybinding module
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import os
+import json
+import logging
+
+# ------------------------------------------------------------------------------
+# Keyboard binding, stored as JSON in the fake config dir
+# ------------------------------------------------------------------------------
+
+# HTML key name => tkinter keycode
+html2tk = {"Key" + chr(c): 38 + c - ord("A") for c in range(ord("A"), ord("Z") + 1)}
+html2tk.update({"Digit{}".format(n): 10 + n for n in range(10)})
+html2tk.update({"Space": 65, "Enter": 36, "Escape": 9, "Backspace": 22})
+
+default_map = {
+    "Space": "TOGGLE_AUDIO_PLAY",
+    "Enter": "SELECT",
+    "Escape": "BACK",
+    "Backspace": "BACK",
+    "KeyR": "TOGGLE_AUDIO_RECORD",
+    "KeyM": "TOGGLE_MIDI_RECORD"
+}
+
+html_map = dict(default_map)
+
+
+def get_fpath():
+    return os.environ.get('ZYNTHIAN_CONFIG_DIR') + "/keybinding.json"
+
+
+def load():
+    global html_map
+    try:
+        with open(get_fpath(), "r") as fh:
+            html_map = json.load(fh)
+    except FileNotFoundError:
+        html_map = dict(default_map)
+
+
+def save():
+    try:
+        with open(get_fpath(), "w") as fh:
+            json.dump(html_map, fh)
+        return True
+    except Exception as e:
+        logging.error("Can't save keybinding: {}".format(e))
+        return False
+
+
+def reset(save_config=False):
+    global html_map
+    html_map = dict(default_map)
+    if save_config:
+        save()
+
+
+def get_html_map():
+    return html_map
+
+
+def set_html_map(map):
+    global html_map
+    html_map = dict(map)
+
+
+load()
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake zyngine.zynthian_lv2 module
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import os
+import json
+import logging
+from enum import Enum
+from collections import OrderedDict
+
+# ------------------------------------------------------------------------------
+# Engine database, stored as JSON in the fake config dir
+# ------------------------------------------------------------------------------
+
+
+class EngineType(Enum):
+    MIDI_SYNTH = "MIDI Synth"
+    AUDIO_EFFECT = "Audio Effect"
+    MIDI_TOOL = "MIDI Tool"
+    AUDIO_GENERATOR = "Audio Generator"
+    SPECIAL = "Special"
+
+
+engine_type_title = {
+    EngineType.MIDI_SYNTH.value: "Instruments",
+    EngineType.AUDIO_EFFECT.value: "Audio Effects",
+    EngineType.MIDI_TOOL.value: "MIDI Tools",
+    EngineType.AUDIO_GENERATOR.value: "Audio Generators",
+    EngineType.SPECIAL.value: "Special"
+}
+
+engine_categories = {
+    EngineType.MIDI_SYNTH.value: ["Synth", "Sampler", "Piano", "Organ", "Other"],
+    EngineType.AUDIO_EFFECT.value: ["Delay", "Reverb", "Filter", "Dynamics", "Other"],
+    EngineType.MIDI_TOOL.value: ["Arpeggiator", "Sequencer", "Other"],
+    EngineType.AUDIO_GENERATOR.value: ["Other"],
+    EngineType.SPECIAL.value: ["Other"]
+}
+
+engines_fpath = os.environ.get('ZYNTHIAN_CONFIG_DIR') + "/engines.json"
+
+engines = {}
+engines_by_type = {}
+
+
+def load_engines():
+    global engines
+    try:
+        with open(engines_fpath, "r") as fh:
+            engines = json.load(fh)
+    except Exception as e:
+        logging.error("Can't load engines from '{}': {}".format(engines_fpath, e))
+        engines = {}
+    get_engines_by_type()
+    return engines
+
+
+def save_engines():
+    with open(engines_fpath + ".tmp", "w") as fh:
+        json.dump(engines, fh, indent=2)
+    os.replace(engines_fpath + ".tmp", engines_fpath)
+
+
+def get_engines_by_type():
+    global engines_by_type
+    engines_by_type = OrderedDict((t.value, OrderedDict()) for t in EngineType)
+    for code, info in sorted(engines.items(), key=lambda item: item[1]['TITLE']):
+        try:
+            engines_by_type[info['TYPE']][code] = info
+        except KeyError:
+            pass
+    return engines_by_type
+
+
+def update_engine_defaults(refresh=True):
+    get_engines_by_type()
+
+
+def generate_engines_config_file(refresh=True, reset_rankings=None):
+    save_engines()
+
+
+def generate_plugin_presets_cache(plugin_url, refresh=True):
+    pass
+
+
+def generate_presets_cache_workaround():
+    pass
+
+
+def generate_all_presets_cache(refresh=True):
+    pass
+
+# ------------------------------------------------------------------------------
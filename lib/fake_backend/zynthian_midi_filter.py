@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Fake zyngine.zynthian_midi_filter module
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import re
+
+# ------------------------------------------------------------------------------
+# MIDI filter rules: only syntax validation is needed by webconf
+# ------------------------------------------------------------------------------
+
+
+class MidiFilterScript:
+
+    rule_re = re.compile(r"^\s*(IGNORE|MAP|CLEAN)\s+\S+.*$", re.IGNORECASE)
+
+    def __init__(self, script, set_rules=True):
+        for line in script.split("\n"):
+            line = line.strip()
+            if line and not line.startswith("#") and not self.rule_re.match(line):
+                raise ValueError("Invalid rule '{}'".format(line))
+
+# ------------------------------------------------------------------------------
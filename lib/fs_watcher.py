@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Filesystem Watch Service
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Knows when the data directories (snapshots, captures, presets ...) change,
+# so their caches are only rebuilt when needed:
+#
+#  + fs_watcher.get_version(path) returns the version of a directory tree,
+#    changed by any change in it (files added, removed, renamed, written ...).
+#    The tree is watched from its first lookup. Use it as a cache key.
+#  + fs_watcher.subscribe(path, callback) calls callback(path, version) when
+#    the tree changes. Events are debounced: a burst of changes (an archive
+#    extraction, a copy ...) is reported once.
+#  + Trees are watched with inotify (through libc, no extra dependency), on
+#    every directory of the tree. Pending events are read before returning
+#    a version, so changes made by the request itself are always seen.
+#  + Without inotify (or if the watch limit is hit, or with
+#    ZYNTHIAN_WEBCONF_FS_WATCH=polling) trees are polled: get_version checks
+#    the tree signature (stat walk) & subscribers are notified by a
+#    background poll every POLL_INTERVAL.
+#
+# Versions include the watcher start time, so they don't repeat across
+# restarts (they are used in ETags).
+# ------------------------------------------------------------------------------
+
+import os
+import time
+import errno
+import ctypes
+import struct
+import asyncio
+import logging
+
+from lib.config_cache import get_tree_signature
+
+DEBOUNCE = 0.2
+# A continuous flow of events is reported at least this often
+MAX_DEBOUNCE = 1.0
+POLL_INTERVAL = 2.0
+
+# inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+class Inotify:
+    """Minimal inotify binding, through libc."""
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """Return the pending events as (wd, mask, name) tuples, without blocking."""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                wd, mask, cookie, size = EVENT_HEADER.unpack_from(data, pos)
+                pos += EVENT_HEADER.size
+                name = os.fsdecode(data[pos:pos + size].rstrip(b"\0"))
+                pos += size
+                events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WatchedTree:
+
+    def __init__(self, path):
+        self.path = path
+        self.backend = None
+        self.version = 0
+        # Changed since the version was last bumped
+        self.changed = False
+        # Changed since subscribers were last notified
+        self.pending = False
+        # Root directory to be (re)watched, if it exists
+        self.rewatch = True
+        # First look done: later appearances are changes
+        self.scanned = False
+        self.signature = None
+        self.wds = set()
+        self.subscribers = []
+        self.events = 0
+
+    def set_changed(self):
+        self.changed = True
+        self.pending = True
+        self.events += 1
+
+
+class FsWatcher:
+
+    def __init__(self, mode=None):
+        self.mode = mode or os.environ.get('ZYNTHIAN_WEBCONF_FS_WATCH', "inotify")
+        self.epoch = int(time.time())
+        self.trees = {}
+        self.inotify = None
+        # wd => directory path & trees watching it (the same directory may be in nested trees)
+        self.wd_paths = {}
+        self.wd_trees = {}
+        self.loop = None
+        self.flush_handle = None
+        self.flush_first_ts = None
+        self.poll_task = None
+        if self.mode == "inotify":
+            try:
+                self.inotify = Inotify()
+            except Exception as e:
+                logging.warning("inotify not available => polling watched directories: {}".format(e))
+
+    # ---------------------------------------------------------------------------
+    # API
+    # ---------------------------------------------------------------------------
+
+    def watch(self, path):
+        path = os.path.normpath(path)
+        tree = self.trees.get(path)
+        if tree is None:
+            tree = WatchedTree(path)
+            tree.backend = "inotify" if self.inotify else "polling"
+            self.trees[path] = tree
+            self.update_tree(tree)
+        return tree
+
+    def get_version(self, path):
+        """Version of the directory tree at path. Changes when anything in the tree changes."""
+        tree = self.watch(path)
+        self.process_events()
+        self.update_tree(tree)
+        if tree.changed:
+            tree.changed = False
+            tree.version += 1
+        return (self.epoch, tree.version)
+
+    def subscribe(self, path, callback):
+        """Call callback(path, version) when the tree at path changes (debounced)."""
+        tree = self.watch(path)
+        tree.subscribers.append(callback)
+        return tree
+
+    def unsubscribe(self, path, callback):
+        tree = self.trees.get(os.path.normpath(path))
+        if tree and callback in tree.subscribers:
+            tree.subscribers.remove(callback)
+
+    def start(self):
+        """Process the events in the running loop (notifying the subscribers)."""
+        self.loop = asyncio.get_running_loop()
+        if self.inotify:
+            self.loop.add_reader(self.inotify.fd, self.on_readable)
+        self.poll_task = self.loop.create_task(self.poll_loop())
+
+    def stop(self):
+        if self.loop and self.inotify:
+            self.loop.remove_reader(self.inotify.fd)
+        if self.poll_task:
+            self.poll_task.cancel()
+            self.poll_task = None
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        self.loop = None
+
+    # ---------------------------------------------------------------------------
+    # Watches
+    # ---------------------------------------------------------------------------
+
+    def update_tree(self, tree):
+        if tree.backend == "polling":
+            signature = get_tree_signature(tree.path, files=True)
+            if signature != tree.signature:
+                if tree.scanned:
+                    tree.set_changed()
+                tree.signature = signature
+        elif tree.rewatch and os.path.isdir(tree.path):
+            tree.rewatch = False
+            # Appeared or re-created
+            if tree.scanned:
+                tree.set_changed()
+            self.add_watches(tree, tree.path)
+        tree.scanned = True
+
+    def add_watches(self, tree, dpath):
+        """Watch dpath and all its subdirectories for tree."""
+        visited = set()
+        for dirname, subdirs, files in os.walk(dpath, followlinks=True):
+            try:
+                st = os.stat(dirname)
+            except OSError:
+                continue
+            # Symlinked directories may loop
+            if (st.st_dev, st.st_ino) in visited:
+                subdirs[:] = []
+                continue
+            visited.add((st.st_dev, st.st_ino))
+            try:
+                wd = self.inotify.add_watch(dirname)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    logging.warning("inotify watch limit reached => polling '{}'".format(tree.path))
+                    self.set_polling(tree)
+                    return
+                # Removed meanwhile
+                continue
+            self.wd_paths[wd] = dirname
+            self.wd_trees.setdefault(wd, set()).add(tree)
+            tree.wds.add(wd)
+
+    def set_polling(self, tree):
+        for wd in list(tree.wds):
+            self.drop_watch(tree, wd)
+        tree.backend = "polling"
+        tree.signature = get_tree_signature(tree.path, files=True)
+        tree.set_changed()
+
+    def drop_watches(self, tree, dpath):
+        """Stop watching dpath and its subdirectories for tree."""
+        prefix = dpath + "/"
+        for wd in list(tree.wds):
+            wpath = self.wd_paths.get(wd)
+            if wpath == dpath or (wpath and wpath.startswith(prefix)):
+                self.drop_watch(tree, wd)
+
+    def drop_watch(self, tree, wd):
+        tree.wds.discard(wd)
+        trees = self.wd_trees.get(wd)
+        if trees is not None:
+            trees.discard(tree)
+            if not trees:
+                del self.wd_trees[wd]
+                del self.wd_paths[wd]
+                self.inotify.rm_watch(wd)
+
+    # ---------------------------------------------------------------------------
+    # Events
+    # ---------------------------------------------------------------------------
+
+    def process_events(self):
+        if not self.inotify:
+            return
+        changed = False
+        for wd, mask, name in self.inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost => everything may have changed, new directories may be unwatched
+                logging.warning("inotify queue overflow => rewatching all the directories")
+                for tree in self.trees.values():
+                    if tree.backend == "inotify":
+                        for twd in list(tree.wds):
+                            self.drop_watch(tree, twd)
+                        tree.rewatch = True
+                        tree.set_changed()
+                        self.update_tree(tree)
+                changed = True
+                continue
+            trees = self.wd_trees.get(wd)
+            if not trees:
+                continue
+            dpath = self.wd_paths[wd]
+            if mask & IN_IGNORED:
+                # Directory removed (or unwatched)
+                for tree in list(trees):
+                    tree.wds.discard(wd)
+                    if dpath == tree.path:
+                        tree.rewatch = True
+                    tree.set_changed()
+                self.wd_trees.pop(wd, None)
+                self.wd_paths.pop(wd, None)
+                changed = True
+                continue
+            for tree in list(trees):
+                tree.set_changed()
+                if mask & IN_ISDIR:
+                    if mask & IN_MOVED_FROM:
+                        # Watched again with its new path, if moved inside the tree
+                        self.drop_watches(tree, os.path.join(dpath, name))
+                    elif mask & (IN_CREATE | IN_MOVED_TO):
+                        self.add_watches(tree, os.path.join(dpath, name))
+            changed = True
+        if changed:
+            self.schedule_flush()
+
+    def on_readable(self):
+        try:
+            self.process_events()
+        except Exception as e:
+            logging.error("Processing filesystem events: {}".format(e))
+
+    def schedule_flush(self):
+        if not self.loop:
+            return
+        now = time.monotonic()
+        if self.flush_handle:
+            # Keep waiting for the burst to end, but not forever
+            if now - self.flush_first_ts >= MAX_DEBOUNCE:
+                return
+            self.flush_handle.cancel()
+        else:
+            self.flush_first_ts = now
+        self.flush_handle = self.loop.call_later(DEBOUNCE, self.flush)
+
+    def flush(self):
+        self.flush_handle = None
+        for tree in list(self.trees.values()):
+            if not tree.pending:
+                continue
+            tree.pending = False
+            if tree.changed:
+                tree.changed = False
+                tree.version += 1
+            for callback in list(tree.subscribers):
+                try:
+                    callback(tree.path, (self.epoch, tree.version))
+                except Exception as e:
+                    logging.error("Filesystem change callback for '{}': {}".format(tree.path, e))
+
+    async def poll_loop(self):
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            try:
+                for tree in list(self.trees.values()):
+                    # Not existing yet or polled
+                    if tree.backend == "polling" or tree.rewatch:
+                        self.update_tree(tree)
+                if any(tree.pending for tree in self.trees.values()):
+                    self.schedule_flush()
+            except Exception as e:
+                logging.error("Polling watched directories: {}".format(e))
+
+    # ---------------------------------------------------------------------------
+    # Status
+    # ---------------------------------------------------------------------------
+
+    def get_status(self):
+        return [{
+            'path': tree.path,
+            'backend': tree.backend,
+            'version': tree.version,
+            'directories': len(tree.wds),
+            'events': tree.events,
+            'subscribers': len(tree.subscribers)
+        } for tree in self.trees.values()]
+
+    def render(self):
+        """Return the watch counters in Prometheus text exposition format."""
+        lines = [
+            "# HELP webconf_fs_watch_directories Directories watched, by tree & backend.",
+            "# TYPE webconf_fs_watch_directories gauge"
+        ]
+        for tree in self.trees.values():
+            lines.append('webconf_fs_watch_directories{{tree="{}",backend="{}"}} {}'.format(
+                tree.path, tree.backend, len(tree.wds)))
+        lines += [
+            "# HELP webconf_fs_watch_events_total Filesystem changes seen, by tree.",
+            "# TYPE webconf_fs_watch_events_total counter"
+        ]
+        for tree in self.trees.values():
+            lines.append('webconf_fs_watch_events_total{{tree="{}"}} {}'.format(tree.path, tree.events))
+        return "\n".join(lines) + "\n"
+
+
+fs_watcher = FsWatcher()
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Graceful Restart (listening socket handoff)
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Restart without closing the listening sockets:
+#
+#  1. Stop accepting. New connections wait in the kernel's listen backlog.
+#  2. Drain: wait for the requests in flight (up to DRAIN_TIMEOUT).
+#  3. Run the shutdown callbacks: websockets are closed with code 1001
+#     ("going away"), so the clients reconnect, and the terminal is closed.
+#     Then the idle keep-alive connections are closed.
+#  4. Re-exec webconf in the same process (same PID, so systemd doesn't see a
+#     restart), passing the listening sockets' fds in ZYNTHIAN_WEBCONF_LISTEN_FDS.
+#
+# The sockets can also come from systemd socket activation (LISTEN_FDS, named
+# "http" & "https" with FileDescriptorName=). It's triggered by SIGHUP
+# (ExecReload=/bin/kill -HUP $MAINPID) or by restart_webconf().
+# ------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import signal
+import socket
+import asyncio
+import inspect
+import logging
+import tornado.netutil
+import tornado.httputil
+import tornado.httpserver
+
+from lib.access_log import count_response_bytes
+
+LISTEN_FDS_ENV = "ZYNTHIAN_WEBCONF_LISTEN_FDS"
+SD_LISTEN_FDS_START = 3
+SD_ENV = ("LISTEN_PID", "LISTEN_FDS", "LISTEN_FDNAMES")
+SOCKET_NAMES = ("http", "https")
+
+DRAIN_TIMEOUT = 10.0
+DRAIN_POLL_INTERVAL = 0.05
+# Time for the websocket close frames to go out
+CLOSE_DELAY = 0.2
+
+
+def get_inherited_fds():
+    """Listening socket fds passed by systemd or by the previous webconf process, as {name: [fd, ...]}"""
+    res = {}
+    if os.environ.get("LISTEN_PID") == str(os.getpid()):
+        try:
+            names = os.environ.get("LISTEN_FDNAMES", "").split(":")
+            for i in range(int(os.environ.get("LISTEN_FDS", "0"))):
+                name = names[i] if i < len(names) and names[i] in SOCKET_NAMES else "http"
+                res.setdefault(name, []).append(SD_LISTEN_FDS_START + i)
+        except Exception as e:
+            logging.error("Bad systemd socket activation environment: {}".format(e))
+    # Don't pass them down to the child processes
+    for var in SD_ENV:
+        os.environ.pop(var, None)
+
+    for item in os.environ.pop(LISTEN_FDS_ENV, "").split(","):
+        try:
+            if item:
+                name, fd = item.split(":")
+                res.setdefault(name, []).append(int(fd))
+        except Exception as e:
+            logging.error("Bad {} item '{}': {}".format(LISTEN_FDS_ENV, item, e))
+    return res
+
+
+class RequestCountingDelegate(tornado.httputil.HTTPMessageDelegate):
+    """
+    Counts the requests in flight. A keep-alive connection starts a request
+    delegate before the next request comes (if ever), so a request is counted
+    when its headers are received. It's done when its response is finished,
+    its connection is detached (websocket) or closed, or it fails to start.
+    Whatever happens first, it's uncounted once.
+    """
+
+    def __init__(self, delegate, request_conn):
+        self.delegate = delegate
+        self.counted = False
+        # The response is finished (or the connection taken) through the request connection
+        for name in ("finish", "detach"):
+            setattr(request_conn, name, self.wrap_done(getattr(request_conn, name)))
+
+    def wrap_done(self, method):
+        def wrapper(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.done()
+        return wrapper
+
+    def done(self):
+        if self.counted:
+            self.counted = False
+            graceful_restart.request_finished()
+
+    def headers_received(self, start_line, headers):
+        self.counted = True
+        graceful_restart.request_started()
+        try:
+            return self.delegate.headers_received(start_line, headers)
+        except BaseException:
+            self.done()
+            raise
+
+    def data_received(self, chunk):
+        return self.delegate.data_received(chunk)
+
+    def finish(self):
+        return self.delegate.finish()
+
+    def on_connection_close(self):
+        try:
+            return self.delegate.on_connection_close()
+        finally:
+            self.done()
+
+
+class DrainingHTTPServer(tornado.httpserver.HTTPServer):
+    """HTTPServer that can stop accepting connections without closing its listening sockets."""
+
+    def start_request(self, server_conn, request_conn):
+        count_response_bytes(request_conn)
+        return RequestCountingDelegate(super().start_request(server_conn, request_conn), request_conn)
+
+    def stop_accepting(self):
+        # TCPServer.stop() would close the sockets too
+        for remove_handler in self._handlers.values():
+            remove_handler()
+        self._handlers.clear()
+
+
+class GracefulRestart:
+
+    def __init__(self):
+        # Re-executed by a graceful restart (the fds env var is popped when listening)
+        self.reexec = LISTEN_FDS_ENV in os.environ
+        self.inherited_fds = None
+        # Listening sockets by name, to be passed to the next process
+        self.sockets = {}
+        self.servers = []
+        self.shutdown_callbacks = []
+        self.requests = 0
+        self.restarting = False
+
+    def bind_sockets(self, name, port):
+        if self.inherited_fds is None:
+            self.inherited_fds = get_inherited_fds()
+        fds = self.inherited_fds.pop(name, None)
+        if fds:
+            sockets = [socket.socket(fileno=fd) for fd in fds]
+            for sock in sockets:
+                os.set_inheritable(sock.fileno(), False)
+                sock.setblocking(False)
+            logging.info("Using inherited {} socket(s) {}".format(name, fds))
+        else:
+            sockets = tornado.netutil.bind_sockets(int(port))
+        self.sockets[name] = sockets
+        return sockets
+
+    def listen(self, app, name, port, **kwargs):
+        """Start an HTTP server for app on the inherited "name" sockets, or on new ones bound to port."""
+        server = DrainingHTTPServer(app, **kwargs)
+        server.add_sockets(self.bind_sockets(name, port))
+        self.servers.append(server)
+        return server
+
+    def is_serving(self):
+        return bool(self.servers)
+
+    def add_shutdown_callback(self, callback):
+        """Callable (or coroutine function) to run before re-executing."""
+        self.shutdown_callbacks.append(callback)
+
+    def install_signal_handler(self):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self.on_sighup)
+
+    def on_sighup(self):
+        from lib import command_runner
+        command_runner.spawn(self.restart())
+
+    # ---------------------------------------------------------------------------
+    # In-flight requests
+    # ---------------------------------------------------------------------------
+
+    def request_started(self):
+        self.requests += 1
+
+    def request_finished(self):
+        self.requests = max(0, self.requests - 1)
+
+    # ---------------------------------------------------------------------------
+    # Restart
+    # ---------------------------------------------------------------------------
+
+    async def drain(self, timeout=DRAIN_TIMEOUT):
+        for server in self.servers:
+            server.stop_accepting()
+        deadline = time.monotonic() + timeout
+        while self.requests > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(DRAIN_POLL_INTERVAL)
+        if self.requests > 0:
+            logging.warning("Restarting with {} requests in flight".format(self.requests))
+
+    async def restart(self):
+        if self.restarting:
+            return
+        self.restarting = True
+        ts = time.monotonic()
+        logging.warning("Restarting webconf ...")
+        await self.drain()
+        for callback in self.shutdown_callbacks:
+            try:
+                res = callback()
+                if inspect.isawaitable(res):
+                    await res
+            except Exception as e:
+                logging.error("Shutdown callback failed: {}".format(e))
+        await asyncio.sleep(CLOSE_DELAY)
+        for server in self.servers:
+            await server.close_all_connections()
+
+        fds = []
+        for name, sockets in self.sockets.items():
+            for sock in sockets:
+                os.set_inheritable(sock.fileno(), True)
+                fds.append("{}:{}".format(name, sock.fileno()))
+        os.environ[LISTEN_FDS_ENV] = ",".join(fds)
+        logging.warning("Drained in {:.0f} ms. Re-executing with sockets {}".format(
+            1000 * (time.monotonic() - ts), os.environ[LISTEN_FDS_ENV]))
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        try:
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+        except Exception as e:
+            # Let the service manager restart it
+            logging.error("Can't re-execute webconf: {}".format(e))
+            os._exit(1)
+
+
+graceful_restart = GracefulRestart()
+
+# ------------------------------------------------------------------------------
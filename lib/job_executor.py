@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Prioritized Background Job Executor
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Heavy maintenance work (archive extraction, zip building, audio encoding,
+# LV2 presets cache ...) runs here, so it doesn't compete with jackd & the
+# synth engines:
+#
+#  + Every job kind has a priority (CPU niceness & IO class) and a limit of
+#    concurrent jobs. Jobs over the limit wait in the loop, not in a pool.
+#  + run() runs a function in a thread pool (one per priority, the worker
+#    threads are niced when started) or, with process=True, in a worker
+#    process (for CPU bound work, that would hold the GIL). Worker processes
+#    are fresh interpreters running job_workers.py: forking webconf (threads,
+#    sockets ...) is not safe and multiprocessing would re-import webconf's
+#    main module, initializing zyncore again.
+#  + run_command() runs a shell command with the kind's priority. Commands &
+#    worker processes get it through a "nice ionice [taskset]" prefix: a
+#    preexec_fn is not safe in a threaded process (the child may deadlock on
+#    a lock held by another thread when forking).
+#  + Jobs can be pinned to the CPUs in ZYNTHIAN_WEBCONF_JOB_CPUS (e.g. "0" or
+#    "0,1" or "0-1"), away from the cores used by the audio threads.
+# ------------------------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import shlex
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from lib import command_runner
+from lib import job_workers
+from lib.job_workers import lower_priority
+from lib.graceful_restart import graceful_restart
+
+# IO class => ionice -c
+IONICE_CLASSES = {
+    'best-effort': 2,
+    'idle': 3
+}
+
+# name => (nice, IO class, IO level)
+PRIORITIES = {
+    'low': (10, "best-effort", 7),
+    'idle': (19, "idle", 0)
+}
+
+# name => (max. concurrent jobs, priority)
+JOB_KINDS = {
+    'extract': (1, "low"),
+    'install': (1, "low"),
+    'archive': (1, "low"),
+    'encode': (1, "idle"),
+    'lv2_cache': (1, "low"),
+    'default': (2, "low")
+}
+
+THREAD_WORKERS = 2
+
+# Parent of the "lib" package
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_cpu_list(value):
+    """Parse a CPU list like "0,2-3" into a set of ints. Returns None if empty."""
+    cpus = set()
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if "-" in item:
+            first, last = item.split("-")
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(item))
+    return cpus or None
+
+
+def get_env_cpus():
+    try:
+        return parse_cpu_list(os.environ.get('ZYNTHIAN_WEBCONF_JOB_CPUS', ""))
+    except ValueError:
+        logging.error("Bad ZYNTHIAN_WEBCONF_JOB_CPUS => not pinning jobs")
+        return None
+
+
+class JobExecutor:
+
+    def __init__(self, cpus=None):
+        self.cpus = cpus
+        self.thread_pools = {}
+        self.semaphores = {}
+        self.stats = {}
+
+    # ---------------------------------------------------------------------------
+    # Pools
+    # ---------------------------------------------------------------------------
+
+    def get_priority_args(self, priority):
+        return PRIORITIES[priority] + (self.cpus,)
+
+    def get_priority_prefix(self, priority):
+        """Command prefix running a command (and its children) with the given priority."""
+        nice, ioclass, iolevel, cpus = self.get_priority_args(priority)
+        prefix = ["nice", "-n", str(nice), "ionice", "-c", str(IONICE_CLASSES[ioclass])]
+        if ioclass != "idle":
+            prefix += ["-n", str(iolevel)]
+        if cpus:
+            prefix += ["taskset", "-c", ",".join(str(cpu) for cpu in sorted(cpus))]
+        return prefix
+
+    def prioritize_command(self, priority, cmd):
+        return shlex.join(self.get_priority_prefix(priority) + ["sh", "-c", cmd])
+
+    def get_thread_pool(self, priority):
+        pool = self.thread_pools.get(priority)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=THREAD_WORKERS,
+                                      thread_name_prefix="webconf-job-{}".format(priority),
+                                      initializer=lower_priority,
+                                      initargs=self.get_priority_args(priority))
+            self.thread_pools[priority] = pool
+        return pool
+
+    def shutdown(self):
+        for pool in self.thread_pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        self.thread_pools = {}
+
+    # ---------------------------------------------------------------------------
+    # Jobs
+    # ---------------------------------------------------------------------------
+
+    def get_semaphore(self, kind):
+        if kind not in self.semaphores:
+            self.semaphores[kind] = asyncio.Semaphore(JOB_KINDS[kind][0])
+        return self.semaphores[kind]
+
+    def get_kind_stats(self, kind):
+        if kind not in self.stats:
+            self.stats[kind] = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0, 'seconds': 0.0}
+        return self.stats[kind]
+
+    async def run_job(self, kind, job):
+        if kind not in JOB_KINDS:
+            raise ValueError("Unknown job kind '{}'".format(kind))
+        stats = self.get_kind_stats(kind)
+        stats['queued'] += 1
+        started = False
+        try:
+            async with self.get_semaphore(kind):
+                stats['queued'] -= 1
+                started = True
+                stats['running'] += 1
+                ts = time.monotonic()
+                try:
+                    res = await job()
+                    stats['done'] += 1
+                    return res
+                except Exception:
+                    stats['failed'] += 1
+                    raise
+                finally:
+                    stats['running'] -= 1
+                    stats['seconds'] += time.monotonic() - ts
+        finally:
+            # Cancelled while waiting
+            if not started:
+                stats['queued'] -= 1
+
+    async def run(self, kind, fn, *args, process=False):
+        """
+        Run fn(*args) as a "kind" job in a worker thread and return its result.
+        With process=True it's run in a worker process: fn must be a job_workers
+        function, and args & result must be JSON serializable.
+        """
+        if process:
+            return await self.run_job(kind, lambda: self.run_worker_process(kind, fn, args))
+        loop = asyncio.get_running_loop()
+        pool = self.get_thread_pool(JOB_KINDS[kind][1])
+        return await self.run_job(kind, lambda: loop.run_in_executor(pool, functools.partial(fn, *args)))
+
+    async def run_worker_process(self, kind, fn, args):
+        if getattr(job_workers, fn.__name__, None) is not fn:
+            raise ValueError("'{}' is not a job worker function".format(fn.__name__))
+        cmd = "cd {}; {}".format(shlex.quote(ROOT_DIR),
+                                 shlex.join(self.get_priority_prefix(JOB_KINDS[kind][1]) +
+                                            [sys.executable, "-m", "lib.job_workers", fn.__name__, json.dumps(args)]))
+        # Big backups may take long => no timeout
+        output = await command_runner.check_output(cmd, timeout=None)
+        return json.loads(output)
+
+    async def run_command(self, kind, cmd, **kwargs):
+        """Like command_runner.check_output, but as a "kind" job with lowered priority."""
+        cmd = self.prioritize_command(JOB_KINDS[kind][1], cmd)
+        return await self.run_job(kind, lambda: command_runner.check_output(cmd, **kwargs))
+
+    def render(self):
+        """Return the job counters in Prometheus text exposition format."""
+        lines = [
+            "# HELP webconf_jobs Background jobs queued & running, by kind.",
+            "# TYPE webconf_jobs gauge"
+        ]
+        for kind, stats in self.stats.items():
+            for state in ('queued', 'running'):
+                lines.append('webconf_jobs{{kind="{}",state="{}"}} {}'.format(kind, state, stats[state]))
+        lines += [
+            "# HELP webconf_jobs_total Finished background jobs, by kind & outcome.",
+            "# TYPE webconf_jobs_total counter"
+        ]
+        for kind, stats in self.stats.items():
+            for outcome in ('done', 'failed'):
+                lines.append('webconf_jobs_total{{kind="{}",outcome="{}"}} {}'.format(kind, outcome, stats[outcome]))
+        lines += [
+            "# HELP webconf_job_seconds_total Time spent running background jobs, by kind.",
+            "# TYPE webconf_job_seconds_total counter"
+        ]
+        for kind, stats in self.stats.items():
+            lines.append('webconf_job_seconds_total{{kind="{}"}} {:.3f}'.format(kind, stats['seconds']))
+        return "\n".join(lines) + "\n"
+
+
+job_executor = JobExecutor(get_env_cpus())
+graceful_restart.add_shutdown_callback(job_executor.shutdown)
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Background Job Workers
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Functions run by the job executor's worker processes (see job_executor.py):
+#
+#   python3 -m lib.job_workers <function> <JSON args>
+#
+# The function result is written to stdout as JSON. The worker processes
+# import this module only, so keep it free of webconf & zynthian imports.
+# ------------------------------------------------------------------------------
+
+import os
+import sys
+import json
+import glob
+import shutil
+import logging
+import zipfile
+import tarfile
+import threading
+from pathlib import Path
+
+import psutil
+
+IOPRIO_CLASSES = {
+    'best-effort': psutil.IOPRIO_CLASS_BE,
+    'idle': psutil.IOPRIO_CLASS_IDLE
+}
+
+# ------------------------------------------------------------------------------
+# Priority
+# ------------------------------------------------------------------------------
+
+
+def lower_priority(nice=10, ioclass="best-effort", iolevel=7, cpus=None):
+    """
+    Lower the CPU & IO priority of the calling thread (or process), and pin it
+    to cpus if given. On Linux, niceness, IO priority & affinity are per thread.
+    """
+    tid = threading.get_native_id()
+    try:
+        # Never raise it
+        if os.getpriority(os.PRIO_PROCESS, tid) < nice:
+            os.setpriority(os.PRIO_PROCESS, tid, nice)
+    except OSError as e:
+        logging.warning("Can't set job niceness: {}".format(e))
+    try:
+        if ioclass == "idle":
+            psutil.Process(tid).ionice(IOPRIO_CLASSES[ioclass])
+        else:
+            psutil.Process(tid).ionice(IOPRIO_CLASSES[ioclass], iolevel)
+    except Exception as e:
+        logging.warning("Can't set job IO priority: {}".format(e))
+    if cpus:
+        try:
+            # 0 => calling thread
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logging.warning("Can't set job CPU affinity {}: {}".format(cpus, e))
+
+# ------------------------------------------------------------------------------
+# Archives
+# ------------------------------------------------------------------------------
+
+
+ARCHIVE_FORMATS = (
+    ('.tar.bz2', "r:bz2"),
+    ('.tar.gz', "r:gz"),
+    ('.tar.xz', "r:xz"),
+    ('.tgz', "r:gz"),
+    ('.zip', None)
+)
+
+
+def unpack_archive(fpath):
+    """
+    Extract a (tar or zip) archive into a directory named like it, without
+    the extension. A single nested directory with the same name is unrolled.
+    Returns the directory path, or fpath if it's not an archive.
+    """
+    dpath = fpath
+    for ext, mode in ARCHIVE_FORMATS:
+        if fpath.endswith(ext):
+            dpath = fpath[:-len(ext)]
+            if mode:
+                with tarfile.open(fpath, mode) as tar:
+                    tar.extractall(dpath)
+            else:
+                with zipfile.ZipFile(fpath, 'r') as zf:
+                    zf.extractall(dpath)
+            break
+
+    if os.path.isdir(dpath):
+        # Unroll nested dir
+        head, tail = os.path.split(dpath)
+        ddpath = f"{dpath}/{tail}"
+        if os.path.isdir(ddpath):
+            # Rename subdir to avoid existing filename issues when moving up
+            tmp_subdir = dpath + "/zyn_tmp_subdir"
+            os.rename(ddpath, tmp_subdir)
+            # Move up nested dir content
+            for f in glob.glob(tmp_subdir + "/*"):
+                shutil.move(f, dpath)
+            # Remove empty nested dir
+            shutil.rmtree(tmp_subdir, ignore_errors=True)
+        # Remove thrash ...
+        shutil.rmtree(dpath + "/__MACOSX", ignore_errors=True)
+    return dpath
+
+
+def extract_zip(fpath, dpath):
+    with zipfile.ZipFile(fpath) as zf:
+        zf.extractall(dpath)
+
+
+def zip_tree(zfpath, bdirs, xpats):
+    """
+    Write a zip file with the directory trees bdirs, skipping the directories
+    matching any of the xpats patterns. Returns the number of files.
+    """
+    nfiles = 0
+    with zipfile.ZipFile(zfpath, "w") as zf:
+        for bdir in bdirs:
+            for dirname, subdirs, files in os.walk(bdir):
+                if any(Path(dirname).match(xpat) for xpat in xpats):
+                    continue
+                if dirname != '/':
+                    zf.write(dirname)
+                for filename in files:
+                    zf.write(os.path.join(dirname, filename))
+                    nfiles += 1
+    return nfiles
+
+# ------------------------------------------------------------------------------
+# Worker process entry point
+# ------------------------------------------------------------------------------
+
+
+def main(argv):
+    fn = globals()[argv[1]]
+    args = json.loads(argv[2]) if len(argv) > 2 else []
+    json.dump(fn(*args), sys.stdout)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
+
+# ------------------------------------------------------------------------------
@@ -25,6 +25,7 @@
 import os
 import tornado.web
 
+from lib.config_writer import config_writer
 from lib.zynthian_config_handler import ZynthianConfigHandler
 from lib.audio_config_handler import soundcard_presets
 from lib.display_config_handler import DisplayConfigHandler
@@ -66,13 +67,19 @@ class KitConfigHandler(ZynthianConfigHandler):
         super().get("Kit", config, errors)
 
     @tornado.web.authenticated
-    def post(self):
+    async def post(self):
         postedConfig = tornado.escape.recursive_unicode(self.request.arguments)
         current_kit_version = os.environ.get('ZYNTHIAN_KIT_VERSION')
 
         errors = {}
         if postedConfig['ZYNTHIAN_KIT_VERSION'][0] != current_kit_version:
-            errors = self.configure_kit(postedConfig)
+            # Soundcard, display, wiring ... saved at once, with a single update_sys
+            await WiringConfigHandler.detect_i2c_chips()
+            with config_writer.transaction():
+                errors = self.configure_kit(postedConfig)
+            # The envars file is committed => rebuild with the new wiring
+            await DisplayConfigHandler.delete_fb_splash()
+            await WiringConfigHandler.rebuild_zyncoder()
             self.reboot_flag = True
 
         self.get(errors)
@@ -171,8 +178,4 @@ class KitConfigHandler(ZynthianConfigHandler):
             pconfig['ZYNTHIAN_UI_FONT_SIZE'] = [ui_font_size]
             pconfig['ZYNTHIAN_OVERCLOCKING'] = [overclocking]
 
-        errors = self.update_config(pconfig)
-        DisplayConfigHandler.delete_fb_splash()
-        WiringConfigHandler.rebuild_zyncoder()
-
-        return errors
+        return self.update_config(pconfig)
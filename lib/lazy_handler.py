@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Lazy Handler Loading
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import time
+import logging
+import tornado.web
+import tornado.routing
+from tornado.util import import_object
+
+from lib.body_limit import BodyLimitApplication
+
+# ------------------------------------------------------------------------------
+# Route targets given as "module.Class" strings are imported on the first
+# request to the route, so webconf doesn't pay for importing all the handler
+# modules (zyngui, jack, mido, mutagen, requests ...) before it can listen.
+# ------------------------------------------------------------------------------
+
+
+class LazyHandler(tornado.routing.Router):
+
+    def __init__(self, application, name):
+        self.application = application
+        self.name = name
+        self.handler_class = None
+        self.error = None
+
+    def load(self):
+        if self.handler_class is None and self.error is None:
+            ts = time.perf_counter()
+            try:
+                self.handler_class = import_object(self.name)
+                logging.info("Loaded handler '{}' in {:.1f} ms".format(self.name, 1000 * (time.perf_counter() - ts)))
+            except Exception as e:
+                # Don't retry on every request: a broken module keeps failing
+                self.error = e
+                logging.exception("Can't load handler '{}': {}".format(self.name, e))
+        return self.handler_class
+
+    def find_handler(self, request, target_kwargs=None, path_args=None, path_kwargs=None):
+        handler_class = self.load()
+        if handler_class is None:
+            return self.application.get_handler_delegate(request, tornado.web.ErrorHandler, {'status_code': 500})
+        return self.application.get_handler_delegate(request, handler_class, target_kwargs, path_args, path_kwargs)
+
+
+class LazyApplication(BodyLimitApplication):
+    """
+    Application accepting "module.Class" strings as route targets, that are
+    imported when the route is first requested.
+    """
+
+    def __init__(self, handlers, **settings):
+        self.lazy_handlers = {}
+        rules = []
+        for rule in handlers:
+            if isinstance(rule, (tuple, list)) and isinstance(rule[1], str):
+                # Routes to the same class share the loader
+                if rule[1] not in self.lazy_handlers:
+                    self.lazy_handlers[rule[1]] = LazyHandler(self, rule[1])
+                rule = (rule[0], self.lazy_handlers[rule[1]]) + tuple(rule[2:])
+            rules.append(rule)
+        super().__init__(rules, **settings)
+
+    def load_all(self):
+        """Import every lazy handler now. Returns the ones that failed."""
+        return [name for name, handler in self.lazy_handlers.items() if handler.load() is None]
+
+# ------------------------------------------------------------------------------
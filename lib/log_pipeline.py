@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Logging Pipeline
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Logging without blocking the event loop (or the worker threads):
+#
+#  + The root logger only has a QueueHandler. Records are formatted into
+#    their message by the caller and queued. A background thread (the
+#    QueueListener) writes them to stderr / journald.
+#  + The queue is bounded (QUEUE_SIZE). If the writer can't keep up, new
+#    records are dropped & counted, instead of blocking the caller.
+#  + Each call site (file & line) may log up to RATE_LIMIT records per
+#    RATE_INTERVAL seconds (ZYNTHIAN_WEBCONF_LOG_RATE, 0 = no limit). The
+#    rest are suppressed & counted; the next record let through reports how
+#    many were suppressed. Errors are never rate limited.
+#  + Logger levels can be changed at runtime from the "Logging" page
+#    (/sys-logging). They are reset to ZYNTHIAN_WEBCONF_LOG_LEVEL on restart.
+# ------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+
+LOG_FORMAT = '%(levelname)s:%(module)s: %(message)s'
+QUEUE_SIZE = 10000
+RATE_INTERVAL = 1.0
+DEFAULT_RATE_LIMIT = 20
+# Call sites kept in the stats
+MAX_SITES = 1000
+TOP_SITES = 20
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+# Loggers shown in the logging page, besides the root logger
+LOGGERS = ("tornado.access", "tornado.application", "tornado.general", "asyncio", "zynconf")
+
+
+def get_env_rate_limit():
+    try:
+        return int(os.environ.get('ZYNTHIAN_WEBCONF_LOG_RATE', DEFAULT_RATE_LIMIT))
+    except ValueError:
+        logging.error("Bad ZYNTHIAN_WEBCONF_LOG_RATE => using {}".format(DEFAULT_RATE_LIMIT))
+        return DEFAULT_RATE_LIMIT
+
+
+def parse_level(level):
+    if isinstance(level, str) and not level.isdigit():
+        level = level.upper()
+        if level not in LEVELS:
+            raise ValueError("Bad log level '{}'".format(level))
+        return logging.getLevelName(level)
+    return int(level)
+
+
+class CallSite:
+
+    __slots__ = ("window_ts", "count", "pending", "suppressed", "level", "msg")
+
+    def __init__(self, record):
+        self.window_ts = record.created
+        self.count = 0
+        # Suppressed since the last record let through
+        self.pending = 0
+        self.suppressed = 0
+        self.level = record.levelname
+        self.msg = str(record.msg)[:200]
+
+
+class RateLimitFilter(logging.Filter):
+    """Limit the records logged by each call site (file & line) in every RATE_INTERVAL."""
+
+    def __init__(self, rate_limit=DEFAULT_RATE_LIMIT, interval=RATE_INTERVAL):
+        super().__init__()
+        self.rate_limit = rate_limit
+        self.interval = interval
+        self.sites = {}
+        self.suppressed = 0
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if self.rate_limit <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.pathname, record.lineno)
+        with self.lock:
+            site = self.sites.get(key)
+            if site is None:
+                if len(self.sites) >= MAX_SITES:
+                    self.purge(record.created)
+                site = self.sites[key] = CallSite(record)
+            elif record.created - site.window_ts >= self.interval:
+                site.window_ts = record.created
+                site.count = 0
+            site.count += 1
+            if site.count > self.rate_limit:
+                site.pending += 1
+                site.suppressed += 1
+                self.suppressed += 1
+                return False
+            if site.pending:
+                record.suppressed = site.pending
+                site.pending = 0
+        return True
+
+    def purge(self, now):
+        """Forget the quiet call sites. Keeps the ones with suppressed records (for the stats)."""
+        for key, site in list(self.sites.items()):
+            if not site.suppressed and now - site.window_ts >= self.interval:
+                del self.sites[key]
+        # Still full => start over
+        if len(self.sites) >= MAX_SITES:
+            self.sites.clear()
+
+    def get_top_sites(self, limit=TOP_SITES):
+        with self.lock:
+            sites = [(key, site) for key, site in self.sites.items() if site.suppressed]
+        sites.sort(key=lambda item: -item[1].suppressed)
+        return [{
+            'site': "{}:{}".format(key[0], key[1]),
+            'level': site.level,
+            'message': site.msg,
+            'suppressed': site.suppressed
+        } for key, site in sites[:limit]]
+
+    def reset(self):
+        with self.lock:
+            self.sites.clear()
+            self.suppressed = 0
+
+
+class PipelineQueueHandler(logging.handlers.QueueHandler):
+
+    def __init__(self, log_queue, pipeline):
+        super().__init__(log_queue)
+        self.pipeline = pipeline
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            record.msg = "{} [{} similar messages suppressed]".format(record.msg, suppressed)
+            record.message = record.msg
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.pipeline.dropped += 1
+
+    def flush(self):
+        self.pipeline.drain()
+
+
+class PipelineQueueListener(logging.handlers.QueueListener):
+
+    def enqueue_sentinel(self):
+        # Wait for room in a full queue, the writer is still running
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+
+    def __init__(self):
+        self.queue = None
+        self.handler = None
+        self.writer = None
+        self.listener = None
+        self.rate_filter = RateLimitFilter()
+        self.dropped = 0
+        self.initial_level = None
+
+    def setup(self, level, fmt=LOG_FORMAT, stream=sys.stderr):
+        """Replace the root logger handlers by the queued pipeline."""
+        self.initial_level = level
+        self.rate_filter.rate_limit = get_env_rate_limit()
+        self.writer = logging.StreamHandler(stream)
+        self.writer.setFormatter(logging.Formatter(fmt))
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.handler = PipelineQueueHandler(self.queue, self)
+        self.handler.addFilter(self.rate_filter)
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(level)
+        self.listener = PipelineQueueListener(self.queue, self.writer)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Write the queued records & stop the writer thread."""
+        if self.listener:
+            listener = self.listener
+            self.listener = None
+            listener.stop()
+            self.writer.flush()
+
+    def drain(self, timeout=1.0):
+        """Wait (a bit) for the queued records to be written."""
+        if not self.listener:
+            return
+        deadline = time.monotonic() + timeout
+        while not self.queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.writer.flush()
+
+    # ---------------------------------------------------------------------------
+    # Runtime control
+    # ---------------------------------------------------------------------------
+
+    def set_level(self, name, level):
+        level = parse_level(level)
+        logger = logging.getLogger(name or None)
+        logger.setLevel(level)
+        # Logged at warning level, so it's seen when quieting things down
+        logging.warning("Log level of '{}' set to {}".format(name or "root", logging.getLevelName(level)))
+
+    def set_rate_limit(self, rate_limit):
+        self.rate_filter.rate_limit = max(0, int(rate_limit))
+        logging.warning("Log rate limit set to {} records/s per call site".format(self.rate_filter.rate_limit))
+
+    def reset(self):
+        self.rate_filter.reset()
+        self.dropped = 0
+
+    def get_levels(self):
+        res = []
+        for name in ("",) + LOGGERS:
+            logger = logging.getLogger(name or None)
+            res.append({
+                'name': name,
+                'level': logging.getLevelName(logger.level) if logger.level else "NOTSET",
+                'effective': logging.getLevelName(logger.getEffectiveLevel())
+            })
+        return res
+
+    def get_stats(self):
+        return {
+            'running': self.listener is not None,
+            'queued': self.queue.qsize() if self.queue else 0,
+            'queue_size': QUEUE_SIZE,
+            'dropped': self.dropped,
+            'rate_limit': self.rate_filter.rate_limit,
+            'rate_interval': self.rate_filter.interval,
+            'suppressed': self.rate_filter.suppressed,
+            'initial_level': logging.getLevelName(self.initial_level) if self.initial_level else None
+        }
+
+    def render(self):
+        """Return the pipeline counters in Prometheus text exposition format."""
+        stats = self.get_stats()
+        lines = [
+            "# HELP webconf_log_queued_records Log records waiting to be written.",
+            "# TYPE webconf_log_queued_records gauge",
+            "webconf_log_queued_records {}".format(stats['queued']),
+            "# HELP webconf_log_dropped_total Log records dropped because the queue was full.",
+            "# TYPE webconf_log_dropped_total counter",
+            "webconf_log_dropped_total {}".format(stats['dropped']),
+            "# HELP webconf_log_suppressed_total Log records suppressed by the per call site rate limit.",
+            "# TYPE webconf_log_suppressed_total counter",
+            "webconf_log_suppressed_total {}".format(stats['suppressed'])
+        ]
+        return "\n".join(lines) + "\n"
+
+
+log_pipeline = LogPipeline()
+
+# ------------------------------------------------------------------------------
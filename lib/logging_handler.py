@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Logging Control Handler
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import logging
+import tornado.web
+from collections import OrderedDict
+
+from lib.log_pipeline import log_pipeline, LEVELS
+from lib.zynthian_config_handler import ZynthianBasicHandler
+
+# ------------------------------------------------------------------------------
+# Logging Control Handler
+# ------------------------------------------------------------------------------
+
+
+class LoggingHandler(ZynthianBasicHandler):
+
+    @tornado.web.authenticated
+    def get(self, errors=None):
+        config = OrderedDict([
+            ['STATS', log_pipeline.get_stats()],
+            ['LOGGERS', log_pipeline.get_levels()],
+            ['SITES', log_pipeline.rate_filter.get_top_sites()],
+            ['LEVELS', LEVELS]
+        ])
+        super().get("logging.html", "Logging", config, errors)
+
+    @tornado.web.authenticated
+    def post(self):
+        errors = None
+        action = self.get_argument('_command', '')
+        try:
+            if action == "SET_LEVEL":
+                log_pipeline.set_level(self.get_argument('LOGGER', ''), self.get_argument('LEVEL'))
+            elif action == "SET_RATE":
+                log_pipeline.set_rate_limit(self.get_argument('RATE_LIMIT'))
+            elif action == "CLEAR":
+                log_pipeline.reset()
+        except Exception as e:
+            logging.error("Logging action {}: {}".format(action, e))
+            errors = str(e)
+        self.get(errors)
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Memory Introspection Handler
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import logging
+import tornado.web
+from collections import OrderedDict
+
+from lib.memory_monitor import memory_monitor, DEFAULT_FRAMES, KEY_TYPES
+from lib.zynthian_config_handler import ZynthianBasicHandler
+
+# ------------------------------------------------------------------------------
+# Memory Introspection Handler
+# ------------------------------------------------------------------------------
+
+
+class MemoryHandler(ZynthianBasicHandler):
+
+    # Profiling allocates a lot, it would show up in the traces
+    profiling_allowed = False
+
+    @tornado.web.authenticated
+    def get(self, errors=None, result=None):
+        config = OrderedDict([
+            ['STATS', memory_monitor.get_stats()],
+            ['SNAPSHOTS', memory_monitor.get_snapshots()],
+            ['OBJECT_COUNTS', memory_monitor.object_counts],
+            ['OBJECT_COUNTS_TIME', memory_monitor.object_counts_time],
+            ['KEY_TYPES', KEY_TYPES],
+            ['DEFAULT_FRAMES', DEFAULT_FRAMES],
+            ['RESULT', result]
+        ])
+        super().get("memory.html", "Memory", config, errors)
+
+    @tornado.web.authenticated
+    def post(self):
+        errors = None
+        result = None
+        action = self.get_argument('_command', '')
+        key_type = self.get_argument('KEY_TYPE', "lineno")
+        try:
+            if action == "START":
+                memory_monitor.start(self.get_argument('FRAMES', DEFAULT_FRAMES))
+            elif action == "STOP":
+                memory_monitor.stop()
+            elif action == "SNAPSHOT":
+                memory_monitor.take_snapshot()
+            elif action == "TOP":
+                snapshot_id = self.get_argument('NEW_ID')
+                result = {
+                    'title': "Top allocation sites in snapshot {} (by {})".format(snapshot_id, key_type),
+                    'stats': memory_monitor.get_top(snapshot_id, key_type)
+                }
+            elif action == "COMPARE":
+                old_id = self.get_argument('OLD_ID')
+                new_id = self.get_argument('NEW_ID')
+                result = {
+                    'title': "Growth from snapshot {} to {} (by {})".format(old_id, new_id, key_type),
+                    'stats': memory_monitor.compare(old_id, new_id, key_type)
+                }
+            elif action == "COUNT_OBJECTS":
+                memory_monitor.count_objects(self.application)
+            elif action == "COLLECT":
+                result = {'title': "Full GC: {} unreachable objects found".format(memory_monitor.collect())}
+        except Exception as e:
+            logging.error("Memory action {}: {}".format(action, e))
+            errors = str(e)
+        self.get(errors, result)
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Memory Introspection
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Finding leaks in the running webconf, from the /sys-memory page:
+#
+#  + Process memory (RSS), garbage collector counters & tracemalloc usage are
+#    always reported (cheap). RSS & GC counters are exported on /metrics too.
+#  + tracemalloc can be started & stopped at runtime. It slows down every
+#    allocation & uses memory for the traces, so it's off by default (or set
+#    ZYNTHIAN_WEBCONF_TRACEMALLOC=<frames> to start it at boot).
+#  + While tracing, snapshots can be taken (the last MAX_SNAPSHOTS are kept)
+#    and diffed by allocation site: what grew between them, and where.
+#  + Live objects of the request & websocket handler classes are counted on
+#    demand (it walks the whole GC heap, so it's not done on every page view),
+#    with the size of the registries that keep them alive.
+# ------------------------------------------------------------------------------
+
+import gc
+import os
+import sys
+import time
+import logging
+import tracemalloc
+from collections import OrderedDict
+
+import psutil
+import tornado.web
+import tornado.websocket
+
+DEFAULT_FRAMES = 10
+MAX_SNAPSHOTS = 4
+TOP_STATS = 30
+KEY_TYPES = ("lineno", "filename", "traceback")
+
+# Allocations made by the tracing itself
+TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>")
+)
+
+
+def get_env_frames():
+    try:
+        return int(os.environ.get('ZYNTHIAN_WEBCONF_TRACEMALLOC', "0") or 0)
+    except ValueError:
+        logging.error("Bad ZYNTHIAN_WEBCONF_TRACEMALLOC => not tracing memory")
+        return 0
+
+
+def format_stat(stat, key_type):
+    frames = stat.traceback.format() if key_type == "traceback" else None
+    frame = stat.traceback[0]
+    site = frame.filename if key_type == "filename" else "{}:{}".format(frame.filename, frame.lineno)
+    res = {
+        'site': site,
+        'size': stat.size,
+        'count': stat.count
+    }
+    if hasattr(stat, "size_diff"):
+        res['size_diff'] = stat.size_diff
+        res['count_diff'] = stat.count_diff
+    if frames:
+        res['traceback'] = frames
+    return res
+
+
+class MemoryMonitor:
+
+    def __init__(self):
+        self.snapshots = OrderedDict()
+        self.snapshot_seq = 0
+        self.object_counts = None
+        self.object_counts_time = None
+
+    # ---------------------------------------------------------------------------
+    # tracemalloc
+    # ---------------------------------------------------------------------------
+
+    def start(self, nframes=DEFAULT_FRAMES):
+        nframes = max(1, min(int(nframes), 100))
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.snapshots.clear()
+        tracemalloc.start(nframes)
+        logging.info("Memory tracing started ({} frames)".format(nframes))
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logging.info("Memory tracing stopped")
+        # Snapshots hold all the traces => free them too
+        self.snapshots.clear()
+
+    def take_snapshot(self):
+        """Take a snapshot of the traced allocations and return its id."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("Memory tracing is not running")
+        snapshot = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+        self.snapshot_seq += 1
+        self.snapshots[self.snapshot_seq] = (time.time(), snapshot)
+        while len(self.snapshots) > MAX_SNAPSHOTS:
+            self.snapshots.popitem(last=False)
+        return self.snapshot_seq
+
+    def get_snapshot(self, snapshot_id):
+        try:
+            return self.snapshots[int(snapshot_id)][1]
+        except (KeyError, ValueError):
+            raise ValueError("No snapshot {}".format(snapshot_id))
+
+    def get_snapshots(self):
+        res = []
+        for snapshot_id, (ts, snapshot) in self.snapshots.items():
+            res.append({
+                'id': snapshot_id,
+                'time': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)),
+                'size': sum(trace.size for trace in snapshot.traces),
+                'count': len(snapshot.traces)
+            })
+        return res
+
+    def get_top(self, snapshot_id, key_type="lineno", limit=TOP_STATS):
+        """Biggest allocation sites of a snapshot."""
+        if key_type not in KEY_TYPES:
+            raise ValueError("Bad key type '{}'".format(key_type))
+        stats = self.get_snapshot(snapshot_id).statistics(key_type)
+        return [format_stat(stat, key_type) for stat in stats[:limit]]
+
+    def compare(self, old_id, new_id, key_type="lineno", limit=TOP_STATS):
+        """Allocation sites that grew the most from snapshot old_id to new_id."""
+        if key_type not in KEY_TYPES:
+            raise ValueError("Bad key type '{}'".format(key_type))
+        stats = self.get_snapshot(new_id).compare_to(self.get_snapshot(old_id), key_type)
+        return [format_stat(stat, key_type) for stat in stats[:limit]]
+
+    # ---------------------------------------------------------------------------
+    # Process & GC
+    # ---------------------------------------------------------------------------
+
+    def get_stats(self):
+        mem = psutil.Process().memory_info()
+        stats = {
+            'rss': mem.rss,
+            'vms': mem.vms,
+            'gc_counts': gc.get_count(),
+            'gc_thresholds': gc.get_threshold(),
+            'gc_generations': gc.get_stats(),
+            'gc_garbage': len(gc.garbage),
+            'tracing': tracemalloc.is_tracing(),
+            'frames': tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else None,
+            'traced': None,
+            'traced_peak': None,
+            'tracing_overhead': None
+        }
+        if tracemalloc.is_tracing():
+            stats['traced'], stats['traced_peak'] = tracemalloc.get_traced_memory()
+            stats['tracing_overhead'] = tracemalloc.get_tracemalloc_memory()
+        return stats
+
+    def count_objects(self, app=None):
+        """Count the live handler objects, by class, and the registries holding handlers."""
+        from lib.zynthian_websocket_handler import ZynthianWebSocketHandler, ZynthianWebSocketMessageHandler
+        counts = {}
+        for obj in gc.get_objects():
+            if isinstance(obj, (tornado.web.RequestHandler, ZynthianWebSocketMessageHandler)):
+                name = type(obj).__name__
+                counts[name] = counts.get(name, 0) + 1
+        registries = {
+            'ZynthianWebSocketHandler.connections': len(ZynthianWebSocketHandler.connections)
+        }
+        # Only if loaded
+        audio_mixer = sys.modules.get("lib.audio_mixer_handler")
+        if audio_mixer:
+            registries['AudioMixerHandler.websocket_message_handler_list'] = \
+                len(audio_mixer.AudioMixerHandler.websocket_message_handler_list)
+        if app:
+            registries['settings.upload_progress_handler'] = len(app.settings['upload_progress_handler'])
+        self.object_counts = {
+            'handlers': sorted(counts.items(), key=lambda item: -item[1]),
+            'registries': registries,
+            'objects': len(gc.get_objects())
+        }
+        self.object_counts_time = time.strftime("%Y-%m-%d %H:%M:%S")
+        return self.object_counts
+
+    def collect(self):
+        """Run a full GC. Returns the number of unreachable objects found."""
+        return gc.collect()
+
+    def render(self):
+        """Return the process memory & GC counters in Prometheus text exposition format."""
+        stats = self.get_stats()
+        lines = [
+            "# HELP webconf_memory_rss_bytes Resident memory of the webconf process.",
+            "# TYPE webconf_memory_rss_bytes gauge",
+            "webconf_memory_rss_bytes {}".format(stats['rss']),
+            "# HELP webconf_gc_collections_total Garbage collections, by generation.",
+            "# TYPE webconf_gc_collections_total counter"
+        ]
+        for generation, gen_stats in enumerate(stats['gc_generations']):
+            lines.append('webconf_gc_collections_total{{generation="{}"}} {}'.format(generation, gen_stats['collections']))
+        lines += [
+            "# HELP webconf_gc_uncollectable_total Objects found uncollectable by the garbage collector.",
+            "# TYPE webconf_gc_uncollectable_total counter",
+            "webconf_gc_uncollectable_total {}".format(sum(s['uncollectable'] for s in stats['gc_generations']))
+        ]
+        if stats['tracing']:
+            lines += [
+                "# HELP webconf_memory_traced_bytes Memory traced by tracemalloc.",
+                "# TYPE webconf_memory_traced_bytes gauge",
+                "webconf_memory_traced_bytes {}".format(stats['traced'])
+            ]
+        return "\n".join(lines) + "\n"
+
+
+memory_monitor = MemoryMonitor()
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Cached Navigation Menu
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# The navigation menu depends on the enabled engines (Pianoteq, DSP56300), on
+# the state of some services (MOD-UI & VNC links), on the host name used by
+# the browser (links to the other services) and on the page URI (active
+# item). The menu info & the rendered menu fragment (menu.html) are cached,
+# and dropped when the engine registry or the service states change version.
+# ------------------------------------------------------------------------------
+
+from collections import OrderedDict
+
+from lib.engine_registry import engine_registry
+from lib.service_monitor import service_monitor
+
+# Fragments, by (host, URI). Hosts are client controlled => bounded too.
+MAX_FRAGMENTS = 64
+MAX_HOSTS = 8
+
+SERVICE_URIS = (
+    ("mod-ui", "modui_uri", "http://{}:8888"),
+    ("novnc0", "novnc0_uri", "http://{}:6080/vnc.html"),
+    ("novnc1", "novnc1_uri", "http://{}:6081/vnc.html")
+)
+
+
+class MenuContext:
+
+    def __init__(self):
+        self.version = None
+        self.infos = {}
+        self.fragments = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        self.version = None
+
+    def check_version(self):
+        version = (engine_registry.version, service_monitor.refresh())
+        if version != self.version:
+            self.version = version
+            self.infos.clear()
+            self.fragments.clear()
+
+    def get_info(self, host):
+        """Menu info: engine menu flags & URIs of the active services."""
+        self.check_version()
+        info = self.infos.get(host)
+        if info is None:
+            info = dict(engine_registry.get_menu_flags())
+            for service, key, uri in SERVICE_URIS:
+                if service_monitor.is_active(service):
+                    info[key] = uri.format(host)
+            if len(self.infos) >= MAX_HOSTS:
+                self.infos.clear()
+            self.infos[host] = info
+        return info
+
+    def get_fragment(self, handler, info):
+        """Rendered menu for the handler's request."""
+        key = (handler.request.host, handler.request.uri)
+        html = self.fragments.get(key)
+        if html is None:
+            self.misses += 1
+            html = handler.render_string("menu.html", info=info, uri=handler.request.uri)
+            self.fragments[key] = html
+            if len(self.fragments) > MAX_FRAGMENTS:
+                self.fragments.popitem(last=False)
+        else:
+            self.hits += 1
+            self.fragments.move_to_end(key)
+        return html
+
+
+menu_context = MenuContext()
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Metrics Handler
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import os
+import hmac
+import tornado.web
+
+from lib.perf_metrics import perf_metrics
+from lib.osc_bridge import osc_bridge
+from lib.stall_monitor import stall_monitor
+from lib.job_executor import job_executor
+from lib.memory_monitor import memory_monitor
+from lib.fs_watcher import fs_watcher
+from lib.log_pipeline import log_pipeline
+from lib.tmp_storage import tmp_storage
+
+# ------------------------------------------------------------------------------
+# Metrics Handler
+# ------------------------------------------------------------------------------
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """
+    Prometheus text exposition of the request timing metrics.
+
+    Browsers authenticate with the session cookie. Scrapers can't log in, so
+    they may send "Authorization: Bearer <token>" matching the
+    ZYNTHIAN_WEBCONF_METRICS_TOKEN envar, when it's set.
+    """
+
+    def get_current_user(self):
+        user = self.get_secure_cookie("user", max_age_days=5200)
+        if user:
+            return user
+        token = os.environ.get('ZYNTHIAN_WEBCONF_METRICS_TOKEN')
+        auth = self.request.headers.get("Authorization", "")
+        if token and auth.startswith("Bearer ") and hmac.compare_digest(auth[7:].strip(), token):
+            return "metrics"
+
+    def get_login_url(self):
+        # Scrapers must get a plain 403, not a redirect to the login page
+        if not self.request.headers.get("Authorization"):
+            return super().get_login_url()
+        raise tornado.web.HTTPError(403)
+
+    @tornado.web.authenticated
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.set_header("Cache-Control", "no-store")
+        self.write(perf_metrics.render())
+        self.write(stall_monitor.render())
+        self.write(osc_bridge.render())
+        self.write(job_executor.render())
+        self.write(memory_monitor.render())
+        self.write(fs_watcher.render())
+        self.write(log_pipeline.render())
+        self.write(tmp_storage.render())
@@ -29,6 +29,7 @@ import logging
 import tornado.web
 from shutil import copyfile
 
+from lib.config_writer import config_writer
 from lib.zynthian_config_handler import ZynthianConfigHandler
 
 import zynconf
@@ -595,7 +596,7 @@ class MidiConfigHandler(ZynthianConfigHandler):
                     mode = os.stat(self.current_midi_profile_script).st_mode
                     mode |= (mode & 0o444) >> 2	 # copy R bits to X
                     os.chmod(self.current_midi_profile_script, mode)
-                    errors = zynconf.save_config(
+                    errors = config_writer.save_config(
                         {'ZYNTHIAN_SCRIPT_MIDI_PROFILE': self.current_midi_profile_script})
                     self.load_midi_profile_directories()
                 except:
@@ -607,7 +608,7 @@ class MidiConfigHandler(ZynthianConfigHandler):
                     os.remove(self.current_midi_profile_script)
                     self.current_midi_profile_script = "{}/default.sh".format(
                         self.PROFILES_DIRECTORY)
-                    errors = zynconf.save_config(
+                    errors = config_writer.save_config(
                         {'ZYNTHIAN_SCRIPT_MIDI_PROFILE': self.current_midi_profile_script})
                     self.load_midi_profile_directories()
                 else:
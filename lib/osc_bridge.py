@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# OSC Bridge to zynthian-ui
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# A single liblo server, polled by the asyncio loop (no thread), sends all the
+# OSC messages to zynthian-ui. As messages go out from the server's port, the
+# UI replies reach it too:
+#
+#  + cuia(): CUIAs are coalesced. The same CUIA (& args) requested again
+#    before it's sent (CUIA_DELAY) is sent only once, so a burst of reload
+#    requests makes a single reload.
+#  + wake_up(): the wake-up NOP is sent at most once per NOP_INTERVAL.
+#  + request(): sends a message & awaits the UI reply on a given path.
+#  + send(): immediate, for the CUIAs that can't wait (power off, reboot).
+# ------------------------------------------------------------------------------
+
+import time
+import asyncio
+import logging
+from collections import deque
+
+import liblo
+
+from lib.graceful_restart import graceful_restart
+
+UI_OSC_HOST = "localhost"
+UI_OSC_PORT = 1370
+
+# Seconds
+CUIA_DELAY = 0.1
+NOP_INTERVAL = 2.0
+REPLY_TIMEOUT = 1.0
+
+
+class OscBridge:
+
+    def __init__(self, host=UI_OSC_HOST, port=UI_OSC_PORT):
+        self.target = liblo.Address(host, port, liblo.UDP)
+        self.server = None
+        self.loop = None
+        # (path, args) => TimerHandle of the pending CUIAs
+        self.pending_cuias = {}
+        # Reply path => futures waiting for it, oldest first
+        self.waiters = {}
+        self.last_nop = None
+        self.stats = {
+            'sent': 0,
+            'coalesced': 0,
+            'nop_skipped': 0,
+            'replies': 0,
+            'timeouts': 0,
+            'unsolicited': 0
+        }
+
+    def start(self):
+        """Open the server on a free port & poll it from the running loop."""
+        if self.loop:
+            return
+        self.loop = asyncio.get_running_loop()
+        try:
+            self.server = liblo.Server()
+            self.server.add_method(None, None, self.on_message)
+            self.loop.add_reader(self.server.fileno(), self.recv)
+            logging.debug("OSC bridge listening on {}".format(self.server.url))
+        except Exception as e:
+            # Messages are still sent (from a random port) but replies can't be received
+            logging.error("Can't start OSC bridge server: {}".format(e))
+            self.server = None
+
+    def stop(self):
+        # The pending CUIAs are not lost
+        for key, handle in list(self.pending_cuias.items()):
+            handle.cancel()
+            self.send_pending_cuia(key)
+        if self.server:
+            self.loop.remove_reader(self.server.fileno())
+            self.server.free()
+            self.server = None
+        self.loop = None
+
+    def recv(self):
+        # Dispatch all the queued messages, without blocking
+        while self.server and self.server.recv(0):
+            pass
+
+    # ---------------------------------------------------------------------------
+    # Sending
+    # ---------------------------------------------------------------------------
+
+    def send(self, path, *args):
+        """Send a message now."""
+        if self.loop is None:
+            try:
+                self.start()
+            except RuntimeError:
+                # No running loop => sent from a random port
+                pass
+        try:
+            if self.server:
+                self.server.send(self.target, path, *args)
+            else:
+                liblo.send(self.target, path, *args)
+            self.stats['sent'] += 1
+        except Exception as e:
+            logging.error("Can't send OSC message '{}': {}".format(path, e))
+
+    def cuia(self, name, *args):
+        """Send a CUIA after CUIA_DELAY, unless the same one is already waiting."""
+        path = "/CUIA/" + name
+        key = (path, args)
+        if key in self.pending_cuias:
+            self.stats['coalesced'] += 1
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.send(path, *args)
+            return
+        self.pending_cuias[key] = loop.call_later(CUIA_DELAY, self.send_pending_cuia, key)
+
+    def send_pending_cuia(self, key):
+        del self.pending_cuias[key]
+        self.send(key[0], *key[1])
+
+    def wake_up(self):
+        """Send the wake-up NOP CUIA, unless it was sent less than NOP_INTERVAL ago."""
+        now = time.monotonic()
+        if self.last_nop is not None and now - self.last_nop < NOP_INTERVAL:
+            self.stats['nop_skipped'] += 1
+            return
+        self.last_nop = now
+        self.send("/CUIA/NOP")
+
+    # ---------------------------------------------------------------------------
+    # Request / Reply
+    # ---------------------------------------------------------------------------
+
+    async def request(self, path, *args, reply_path=None, timeout=REPLY_TIMEOUT):
+        """
+        Send a message and return the arguments of the UI reply on reply_path
+        (the same path by default). Raises asyncio.TimeoutError if there is no
+        reply in time.
+        """
+        self.start()
+        if self.server is None:
+            raise ConnectionError("OSC bridge server is not running")
+        reply_path = reply_path or path
+        future = self.loop.create_future()
+        self.waiters.setdefault(reply_path, deque()).append(future)
+        try:
+            self.send(path, *args)
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise
+        finally:
+            waiters = self.waiters.get(reply_path)
+            if waiters and future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self.waiters.pop(reply_path, None)
+
+    def on_message(self, path, args, types, src):
+        waiters = self.waiters.get(path)
+        while waiters:
+            future = waiters.popleft()
+            if not future.done():
+                self.stats['replies'] += 1
+                future.set_result(args)
+                return
+        self.stats['unsolicited'] += 1
+        logging.debug("Unsolicited OSC message from {}: {} {}".format(src.url, path, args))
+
+    def render(self):
+        """Return the bridge counters in Prometheus text exposition format."""
+        lines = [
+            "# HELP webconf_osc_messages_total OSC bridge messages, by outcome.",
+            "# TYPE webconf_osc_messages_total counter"
+        ]
+        for name, n in self.stats.items():
+            lines.append('webconf_osc_messages_total{{outcome="{}"}} {}'.format(name, n))
+        return "\n".join(lines) + "\n"
+
+
+osc_bridge = OscBridge()
+graceful_restart.add_shutdown_callback(osc_bridge.stop)
+
+# ------------------------------------------------------------------------------
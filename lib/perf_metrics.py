@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Request Timing & Performance Metrics
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import time
+from threading import Lock
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import OrderedDict
+
+# ------------------------------------------------------------------------------
+# Histograms
+# ------------------------------------------------------------------------------
+
+# Seconds. Wide range on purpose: a page on a Pi 3 can take several seconds.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, le in enumerate(self.buckets):
+            if value <= le:
+                self.counts[i] += 1
+                break
+
+    def cumulative_counts(self):
+        res = []
+        acc = 0
+        for n in self.counts:
+            acc += n
+            res.append(acc)
+        return res
+
+# ------------------------------------------------------------------------------
+# Metrics registry
+# ------------------------------------------------------------------------------
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class PerfMetrics:
+    """
+    In-memory per-route phase histograms & request counters.
+
+    Routes are labelled by handler name, so cardinality is bounded by the
+    route table and not by the URLs requested.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.lock = Lock()
+        self.start_ts = time.time()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.requests = {}
+
+    def observe(self, route, phase, seconds):
+        with self.lock:
+            key = (route, phase)
+            try:
+                hist = self.histograms[key]
+            except KeyError:
+                hist = self.histograms[key] = Histogram(self.buckets)
+            hist.observe(seconds)
+
+    def count_request(self, route, method, status):
+        with self.lock:
+            key = (route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def render(self):
+        """Return all the metrics in Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            lines.append("# HELP webconf_phase_seconds Time spent per request phase.")
+            lines.append("# TYPE webconf_phase_seconds histogram")
+            for (route, phase), hist in sorted(self.histograms.items()):
+                labels = 'route="{}",phase="{}"'.format(escape_label(route), escape_label(phase))
+                for le, n in zip(hist.buckets, hist.cumulative_counts()):
+                    lines.append('webconf_phase_seconds_bucket{{{},le="{}"}} {}'.format(labels, le, n))
+                lines.append('webconf_phase_seconds_bucket{{{},le="+Inf"}} {}'.format(labels, hist.count))
+                lines.append('webconf_phase_seconds_sum{{{}}} {:.6f}'.format(labels, hist.sum))
+                lines.append('webconf_phase_seconds_count{{{}}} {}'.format(labels, hist.count))
+
+            lines.append("# HELP webconf_requests_total Finished requests.")
+            lines.append("# TYPE webconf_requests_total counter")
+            for (route, method, status), n in sorted(self.requests.items()):
+                lines.append('webconf_requests_total{{route="{}",method="{}",status="{}"}} {}'.format(
+                    escape_label(route), escape_label(method), status, n))
+
+        lines.append("# HELP webconf_start_time_seconds Process start time.")
+        lines.append("# TYPE webconf_start_time_seconds gauge")
+        lines.append("webconf_start_time_seconds {:.3f}".format(self.start_ts))
+        return "\n".join(lines) + "\n"
+
+
+perf_metrics = PerfMetrics()
+
+# ------------------------------------------------------------------------------
+# Request timer
+# ------------------------------------------------------------------------------
+
+# Timer of the request being served in the current asyncio context, so deep
+# helpers (i.e. command_runner) can account their time without plumbing.
+current_timer = ContextVar("current_timer", default=None)
+
+
+class RequestTimer:
+
+    def __init__(self, route):
+        self.route = route
+        self.start = time.perf_counter()
+        self.phases = OrderedDict()
+        self.header_sent = False
+        self.active = {}
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def begin(self, phase):
+        # Overlapping spans (i.e. concurrent commands) count wall-clock time once
+        n, ts = self.active.get(phase, (0, None))
+        if n == 0:
+            ts = time.perf_counter()
+        self.active[phase] = (n + 1, ts)
+
+    def end(self, phase):
+        n, ts = self.active[phase]
+        if n == 1:
+            del self.active[phase]
+            self.add(phase, time.perf_counter() - ts)
+        else:
+            self.active[phase] = (n - 1, ts)
+
+    @contextmanager
+    def phase(self, phase):
+        ts = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - ts)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self):
+        """Return a Server-Timing header value. Durations are in milliseconds."""
+        items = ["{};dur={:.1f}".format(phase, 1000 * dt) for phase, dt in self.phases.items()]
+        items.append("total;dur={:.1f}".format(1000 * self.elapsed()))
+        return ", ".join(items)
+
+    def observe(self, metrics=perf_metrics):
+        for phase, dt in self.phases.items():
+            metrics.observe(self.route, phase, dt)
+        metrics.observe(self.route, "total", self.elapsed())
+
+
+@contextmanager
+def current_phase(phase):
+    """Account a block of code to a phase of the current request, if any."""
+    timer = current_timer.get()
+    if timer:
+        timer.begin(phase)
+    try:
+        yield
+    finally:
+        if timer:
+            timer.end(phase)
+
+# ------------------------------------------------------------------------------
@@ -24,15 +24,17 @@
 
 import os
 import sys
+import inspect
 import psutil
 import shutil
 import logging
 import tornado.web
 from xml.etree import ElementTree
-from subprocess import check_output, STDOUT
+from subprocess import STDOUT
 
-import zynconf
 from zyngine.zynthian_engine_pianoteq import *
+from lib import command_runner
+from lib.config_writer import config_writer
 from lib.zynthian_config_handler import ZynthianBasicHandler
 
 # sys.path.append(os.environ.get('ZYNTHIAN_UI_DIR'))
@@ -64,7 +66,7 @@ class PianoteqHandler(ZynthianBasicHandler):
         super().get("pianoteq.html", "Pianoteq", config, errors)
 
     @tornado.web.authenticated
-    def post(self):
+    async def post(self):
         errors = None
         try:
             action = self.get_argument('ZYNTHIAN_PIANOTEQ_ACTION')
@@ -74,17 +76,20 @@ class PianoteqHandler(ZynthianBasicHandler):
 
         if action:
             try:
-                errors = {
-                    'INSTALL_PIANOTEQ': lambda: self.do_install_pianoteq(),
-                    'ACTIVATE_LICENSE': lambda: self.do_activate_license(),
-                    'SAVE_CONFIG': lambda: self.do_save_config()
-                }[action]()
+                with config_writer.transaction():
+                    errors = {
+                        'INSTALL_PIANOTEQ': lambda: self.do_install_pianoteq(),
+                        'ACTIVATE_LICENSE': lambda: self.do_activate_license(),
+                        'SAVE_CONFIG': lambda: self.do_save_config()
+                    }[action]()
+                    if inspect.isawaitable(errors):
+                        errors = await errors
             except Exception as err:
                 logging.error(err)
 
         self.get(errors)
 
-    def do_install_pianoteq(self):
+    async def do_install_pianoteq(self):
         errors = None
         filename = self.get_argument('ZYNTHIAN_PIANOTEQ_FILENAME')
         if filename:
@@ -94,7 +99,7 @@ class PianoteqHandler(ZynthianBasicHandler):
             filename_parts = os.path.splitext(filename)
             # Pianoteq binaries
             if filename_parts[1].lower() == '.7z':
-                errors = self.do_install_pianoteq_binary(filename)
+                errors = await self.do_install_pianoteq_binary(filename)
             # Pianoteq instruments
             elif filename_parts[1].lower() == '.ptq':
                 errors = self.do_install_pianoteq_ptq(filename)
@@ -107,10 +112,10 @@ class PianoteqHandler(ZynthianBasicHandler):
 
         return errors
 
-    def do_install_pianoteq_binary(self, filename):
+    async def do_install_pianoteq_binary(self, filename):
         # Install new binary package
         command = self.recipes_dir + "/install_pianoteq_binary.sh {}; exit 0".format(filename)
-        result = check_output(command, shell=True, stderr=STDOUT).decode("utf-8")
+        result = (await command_runner.check_output(command, stderr=STDOUT)).decode("utf-8")
         # TODO! if result is OK, return None!
         return result
 
@@ -126,14 +131,14 @@ class PianoteqHandler(ZynthianBasicHandler):
             logging.error("PTQ install failed: {}".format(e))
             return "PTQ install failed: {}".format(e)
 
-    def do_activate_license(self):
+    async def do_activate_license(self):
         license_serial = self.get_argument('ZYNTHIAN_PIANOTEQ_LICENSE')
         logging.info("Configuring Pianoteq License Key: {}".format(license_serial))
 
         # Activate the License Key by calling Pianoteq binary
         command = "{} --prefs {} --activate {}; exit 0".format(PIANOTEQ_BINARY, PIANOTEQ_CONFIG_FILE, license_serial)
         try:
-            result = check_output(command, shell=True, stderr=STDOUT).decode("utf-8")
+            result = (await command_runner.check_output(command, stderr=STDOUT)).decode("utf-8")
         except Exception as e:
             logging.error(format(e))
             result = format(e)
@@ -161,7 +166,7 @@ class PianoteqHandler(ZynthianBasicHandler):
             "ZYNTHIAN_PIANOTEQ_VOICE_LIMIT": self.get_argument('ZYNTHIAN_PIANOTEQ_VOICE_LIMIT'),
             "ZYNTHIAN_PIANOTEQ_CPU_OVERLOAD_DETECTION": self.get_argument('ZYNTHIAN_PIANOTEQ_CPU_OVERLOAD_DETECTION')
         }
-        errors = zynconf.save_config(config, updsys=True)
+        errors = config_writer.save_config(config, updsys=True)
 
         # Restarts UI if pianoteq engine is running
         for process in psutil.process_iter():
@@ -186,6 +191,6 @@ class PianoteqHandler(ZynthianBasicHandler):
             if "cpu_overload_detection" in info:
                 config["ZYNTHIAN_PIANOTEQ_CPU_OVERLOAD_DETECTION"] = info["cpu_overload_detection"]
 
-            zynconf.save_config(config, updsys=True)
+            config_writer.save_config(config, updsys=True)
 
 # *****************************************************************************
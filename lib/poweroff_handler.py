@@ -41,11 +41,11 @@ class PoweroffHandler(ZynthianBasicHandler):
         super().get("poweroff_confirm_block.html", "Power Off", None, None)
 
     @tornado.web.authenticated
-    def post(self):
+    async def post(self):
         if self.genjson:
             self.write("POWEROFF")
         else:
             self.reboot_flag = False
             self.render("config.html", body="poweroff_block.html",
                         config=None, title="Power Off", errors=None)
-        self.power_off()
+        await self.power_off()
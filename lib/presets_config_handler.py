@@ -24,29 +24,43 @@
 
 import os
 import copy
-import glob
+import time
 import shutil
+import inspect
 import logging
-import zipfile
-import tarfile
 import requests
 import tornado.web
 
 from zyngui.zynthian_gui_engine import *
 from zyngine.zynthian_chain_manager import zynthian_chain_manager
 
-from lib.upload_handler import TMP_DIR
+from lib.tmp_storage import tmp_storage, get_tree_size
+from lib.fs_watcher import fs_watcher
+from lib.engine_registry import engine_registry
+from lib.job_executor import job_executor
+from lib.job_workers import unpack_archive
+from lib.transfer_service import transfer_service
 from lib.zynthian_config_handler import ZynthianBasicHandler
 
 # ------------------------------------------------------------------------------
 # Soundfont Configuration
 # ------------------------------------------------------------------------------
 
+MY_DATA_DIR = os.environ.get('ZYNTHIAN_MY_DATA_DIR', "/zynthian/zynthian-my-data")
+START_TIME = time.time()
+
 
 class PresetsConfigHandler(ZynthianBasicHandler):
 
     @tornado.web.authenticated
-    def get(self):
+    def get(self, action=None):
+        # The tree can be fetched with GET too, so browsers can revalidate it
+        if action == "get_tree":
+            self.init_engine()
+            if not self.check_data_version(self.get_presets_version()):
+                self.write_json(self.do_get_tree())
+            return
+
         config = {
             'engines': self.get_engine_info(),
             'engine': self.get_argument('ENGINE', 'ZY'),
@@ -57,16 +71,8 @@ class PresetsConfigHandler(ZynthianBasicHandler):
         super().get("presets.html", "Presets & Soundfonts", config, None)
 
     @tornado.web.authenticated
-    def post(self, action):
-        try:
-            self.eng_code = self.get_argument('ENGINE', 'ZY')
-            self.eng_info = self.get_engine_info()[self.eng_code]
-            self.engine_cls = self.eng_info['ENGINE']
-            if self.engine_cls == zynthian_engine_jalv:
-                self.engine_cls.init_zynapi_instance(self.eng_code)
-        except Exception as e:
-            logging.error("Can't initialize engine '{}': {}\n{}".format(
-                self.eng_code, e, self.eng_info))
+    async def post(self, action):
+        self.init_engine()
 
         try:
             result = {
@@ -81,12 +87,36 @@ class PresetsConfigHandler(ZynthianBasicHandler):
                 'install': lambda: self.do_install_url(),
                 'upload': lambda: self.do_install_file()
             }[action]()
+            if inspect.isawaitable(result):
+                result = await result
 
         except:
             result = {}
         # JSON Ouput
         if result:
-            self.write(result)
+            self.write_json(result)
+
+    def init_engine(self):
+        self.eng_info = None
+        try:
+            self.eng_code = self.get_argument('ENGINE', 'ZY')
+            self.eng_info = self.get_engine_info()[self.eng_code]
+            self.engine_cls = self.eng_info['ENGINE']
+            if self.engine_cls == zynthian_engine_jalv:
+                self.engine_cls.init_zynapi_instance(self.eng_code)
+        except Exception as e:
+            logging.error("Can't initialize engine '{}': {}\n{}".format(
+                self.eng_code, e, self.eng_info))
+
+    def get_presets_version(self):
+        """
+        Version of the preset tree data: the engine database & the user's
+        preset dirs. The system's preset data only changes with updates,
+        that restart webconf (START_TIME).
+        """
+        return (self.eng_code, engine_registry.version, START_TIME,
+                fs_watcher.get_version(MY_DATA_DIR + "/presets"),
+                fs_watcher.get_version(MY_DATA_DIR + "/soundfonts"))
 
     def do_get_tree(self):
         result = {}
@@ -156,23 +186,28 @@ class PresetsConfigHandler(ZynthianBasicHandler):
         result.update(self.do_get_tree())
         return result
 
-    def do_download(self):
+    async def do_download(self):
         result = None
         fpath = None
-        delete = False
+        tmp = None
         try:
             fpath = self.engine_cls.zynapi_download(
                 self.get_argument('SEL_FULLPATH'))
+            # Sent by the transfer worker, if running
+            transfer_url = transfer_service.get_download_url(self, fpath)
+            if transfer_url:
+                self.redirect(transfer_url, status=303)
+                return None
             dname, fname = os.path.split(fpath)
             if os.path.isdir(fpath):
-                zfpath = TMP_DIR + "/" + fname
-                shutil.make_archive(zfpath, 'zip', fpath)
-                fpath = zfpath + ".zip"
+                # Zipped size <= tree size
+                tmp = tmp_storage.file(suffix=".zip", size_hint=get_tree_size(fpath))
+                await job_executor.run("archive", shutil.make_archive, tmp.path[:-4], 'zip', fpath)
+                tmp.settle()
+                fpath = tmp.path
                 fname += ".zip"
-                delete = True
                 mime_type = "application/zip"
             else:
-                delete = False
                 mime_type = "application/octet-stream"
 
             self.set_header('Content-Type', mime_type)
@@ -192,8 +227,8 @@ class PresetsConfigHandler(ZynthianBasicHandler):
                 "errors": "Can't download file: {}".format(e)
             }
         finally:
-            if fpath and delete:
-                os.remove(fpath)
+            if tmp:
+                tmp.release()
         return result
 
     def do_search(self):
@@ -207,23 +242,23 @@ class PresetsConfigHandler(ZynthianBasicHandler):
             result['errors'] = "Can't search Musical Artifacts: {}".format(e)
         return result
 
-    def do_install_file(self):
+    async def do_install_file(self):
         result = {}
         try:
             for fpath in self.get_argument('INSTALL_FPATH').split(","):
                 fpath = fpath.strip()
                 if len(fpath) > 0:
-                    self.install_file(fpath)
+                    await self.install_file(fpath)
         except Exception as e:
             logging.error(e)
             result['errors'] = "Can't install file: {}".format(e)
         result.update(self.do_get_tree())
         return result
 
-    def do_install_url(self):
+    async def do_install_url(self):
         result = {}
         try:
-            self.install_url(self.get_argument('INSTALL_URL'))
+            await self.install_url(self.get_argument('INSTALL_URL'))
         except Exception as e:
             logging.error(e)
             result['errors'] = "Can't install URL: {}".format(e)
@@ -253,52 +288,16 @@ class PresetsConfigHandler(ZynthianBasicHandler):
 
         return result
 
-    def install_file(self, fpath):
+    async def install_file(self, fpath):
         logging.info("Unpacking '{}' ...".format(fpath))
         dpath = fpath
         try:
-            if fpath.endswith('.tar.bz2'):
-                dpath = fpath[:-8]
-                tar = tarfile.open(fpath, "r:bz2")
-                tar.extractall(dpath)
-            elif fpath.endswith('.tar.gz'):
-                dpath = fpath[:-7]
-                tar = tarfile.open(fpath, "r:gz")
-                tar.extractall(dpath)
-            elif fpath.endswith('.tar.xz'):
-                dpath = fpath[:-7]
-                tar = tarfile.open(fpath, "r:xz")
-                tar.extractall(dpath)
-            elif fpath.endswith('.tgz'):
-                dpath = fpath[:-4]
-                tar = tarfile.open(fpath, "r:gz")
-                tar.extractall(dpath)
-            elif fpath.endswith('.zip'):
-                dpath = fpath[:-4]
-                with zipfile.ZipFile(fpath, 'r') as soundfontZip:
-                    soundfontZip.extractall(dpath)
-
-            if os.path.isdir(dpath):
-                # Unroll nested dir
-                head, tail = os.path.split(dpath)
-                ddpath = f"{dpath}/{tail}"
-                if os.path.isdir(ddpath):
-                    # Rename subdir to avoid existing filename issues when moving up
-                    tmp_subdir = dpath + "/zyn_tmp_subdir"
-                    os.rename(ddpath, tmp_subdir)
-                    # Move up nested dir content
-                    for f in glob.glob(tmp_subdir + "/*"):
-                        shutil.move(f, dpath)
-                    # Remove empty nested dir
-                    shutil.rmtree(tmp_subdir, ignore_errors=True)
-                # Remove thrash ...
-                shutil.rmtree(dpath + "/__MACOSX", ignore_errors=True)
-
+            dpath = await job_executor.run("extract", unpack_archive, fpath, process=True)
             bank_fullpath = self.get_argument('SEL_BANK_FULLPATH')
             logging.info("Installing '{}' => '{}' ...".format(
                 dpath, bank_fullpath))
 
-            self.engine_cls.zynapi_install(dpath, bank_fullpath)
+            await job_executor.run("install", self.engine_cls.zynapi_install, dpath, bank_fullpath)
 
         # Always clean temporal files & dirs
         finally:
@@ -309,15 +308,32 @@ class PresetsConfigHandler(ZynthianBasicHandler):
             shutil.rmtree(dpath, ignore_errors=True)
             pass
 
-    def install_url(self, url):
+    async def install_url(self, url):
         logging.info("Downloading '{}' ...".format(url))
-        res = requests.get(url, verify=False)
-        head, tail = os.path.split(url)
-        fpath = TMP_DIR + "/" + tail
-        with open(fpath, "wb") as df:
-            df.write(res.content)
-            df.close()
-            self.install_file(fpath)
+        # Downloaded by a job thread
+        tmp = await job_executor.run("default", self.download_url, url)
+        with tmp:
+            await self.install_file(tmp.path + "/" + os.path.basename(url))
+
+    @staticmethod
+    def download_url(url):
+        """
+        Download url into a new temp dir handle (holding the unpacked files too) and return it.
+        The file keeps its name, engines may use it. Blocking, so it's run as a job.
+        """
+        with requests.get(url, verify=False, stream=True) as res:
+            res.raise_for_status()
+            size = res.headers.get("Content-Length")
+            tmp = tmp_storage.dir(size_hint=2 * int(size) if size else None)
+            try:
+                # Content-Length may be missing or wrong => the handle grows as written
+                with tmp.open(tmp.path + "/" + os.path.basename(url)) as df:
+                    for data in res.iter_content(64 * 1024):
+                        df.write(data)
+            except BaseException:
+                tmp.release()
+                raise
+        return tmp
 
     def get_engine_info(self):
         engine_info = copy.copy(zynthian_chain_manager.get_engine_info())
@@ -41,16 +41,16 @@ class RebootHandler(ZynthianBasicHandler):
         super().get("reboot_confirm_block.html", "Reboot", None, None)
 
     @tornado.web.authenticated
-    def post(self):
+    async def post(self):
         self.reboot_flag = False
         super().get("reboot_block.html", "Reboot", None, None)
-        self.reboot()
+        await self.reboot()
 
 
 class RebootConfirmedHandler(ZynthianBasicHandler):
 
     @tornado.web.authenticated
-    def get(self):
+    async def get(self):
         self.reboot_flag = False
         super().get("reboot_block.html", "Reboot", None, None)
-        self.reboot()
+        await self.reboot()
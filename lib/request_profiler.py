@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# On-demand Request Profiler
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Runs requests under cProfile when asked with "?_profile=1" (logged users
+# only) or for every request while profiling is enabled from /sys-profiles.
+# The last MAX_PROFILES profiles are kept in memory, to be viewed as a top-N
+# summary or downloaded as .pstats (python3 -m pstats, snakeviz ...).
+#
+# cProfile hooks the whole thread, so only one request is profiled at a time:
+# time spent on other requests served meanwhile by the loop is included too.
+# ------------------------------------------------------------------------------
+
+import io
+import time
+import pstats
+import marshal
+import cProfile
+import logging
+from collections import deque
+
+MAX_PROFILES = 20
+DEFAULT_TOP = 40
+SORT_KEYS = ("cumulative", "tottime", "calls", "ncalls", "filename")
+
+
+class ProfileStats:
+    """Already collected stats, in the form pstats.Stats loads from a profiler."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class RequestProfile:
+
+    def __init__(self, id, handler):
+        self.id = id
+        self.time = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.method = handler.request.method
+        self.uri = handler.request.uri
+        self.handler = type(handler).__name__
+        self.status = None
+        self.duration = None
+        self.start = time.perf_counter()
+        self.profile = cProfile.Profile()
+        self.stats = None
+
+    def finish(self, status):
+        self.profile.disable()
+        self.duration = time.perf_counter() - self.start
+        self.status = status
+        # Keep the stats only, not the profiler
+        self.profile.create_stats()
+        self.stats = self.profile.stats
+        self.profile = None
+
+    def get_info(self):
+        return {
+            'id': self.id,
+            'time': self.time,
+            'method': self.method,
+            'uri': self.uri,
+            'handler': self.handler,
+            'status': self.status,
+            'duration_ms': None if self.duration is None else round(1000 * self.duration, 1)
+        }
+
+    def get_pstats(self):
+        """Content of a .pstats file (the format written by pstats.Stats.dump_stats)."""
+        return marshal.dumps(self.stats)
+
+    def get_summary(self, sort="cumulative", top=DEFAULT_TOP):
+        stream = io.StringIO()
+        # pstats.Stats takes the stats away from the object it loads them from
+        stats = pstats.Stats(ProfileStats(self.stats), stream=stream)
+        stats.strip_dirs().sort_stats(sort).print_stats(top)
+        return stream.getvalue()
+
+
+class RequestProfiler:
+
+    def __init__(self, max_profiles=MAX_PROFILES):
+        self.profiles = deque(maxlen=max_profiles)
+        # Profile every request, not only the ones asking for it
+        self.enabled = False
+        self.active = None
+        self.last_id = 0
+
+    def start(self, handler):
+        """Start profiling a request. Returns the profile, or None if another request is being profiled."""
+        if self.active:
+            logging.warning("Not profiling '{}': already profiling '{}'".format(handler.request.uri, self.active.uri))
+            return None
+        self.last_id += 1
+        self.active = RequestProfile(self.last_id, handler)
+        self.active.profile.enable()
+        return self.active
+
+    def stop(self, profile, status):
+        if profile is not self.active:
+            return
+        self.active = None
+        profile.finish(status)
+        self.profiles.append(profile)
+
+    def clear(self):
+        self.profiles.clear()
+
+    def get(self, id):
+        for profile in self.profiles:
+            if profile.id == id:
+                return profile
+        return None
+
+    def get_list(self):
+        """Info of the stored profiles, newest first."""
+        return [profile.get_info() for profile in reversed(self.profiles)]
+
+
+request_profiler = RequestProfiler()
+
+# ------------------------------------------------------------------------------
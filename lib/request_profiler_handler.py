@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Request Profiles Handler
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import tornado.web
+from collections import OrderedDict
+
+from lib.request_profiler import request_profiler, SORT_KEYS, DEFAULT_TOP
+from lib.zynthian_config_handler import ZynthianBasicHandler
+
+# ------------------------------------------------------------------------------
+# Request Profiles Handler
+# ------------------------------------------------------------------------------
+
+
+class RequestProfilesHandler(ZynthianBasicHandler):
+
+    profiling_allowed = False
+
+    @tornado.web.authenticated
+    def get(self, errors=None):
+        config = OrderedDict([
+            ['ENABLED', request_profiler.enabled],
+            ['PROFILES', request_profiler.get_list()]
+        ])
+        super().get("profiles.html", "Request Profiles", config, errors)
+
+    @tornado.web.authenticated
+    def post(self):
+        action = self.get_argument('_command', '')
+        if action == "ENABLE":
+            request_profiler.enabled = True
+        elif action == "DISABLE":
+            request_profiler.enabled = False
+        elif action == "CLEAR":
+            request_profiler.clear()
+        self.get()
+
+
+class RequestProfileHandler(ZynthianBasicHandler):
+
+    profiling_allowed = False
+
+    @tornado.web.authenticated
+    def get(self, id):
+        profile = request_profiler.get(int(id))
+        if profile is None:
+            raise tornado.web.HTTPError(404)
+        sort = self.get_argument('sort', SORT_KEYS[0])
+        if sort not in SORT_KEYS:
+            sort = SORT_KEYS[0]
+        try:
+            top = max(1, int(self.get_argument('top', DEFAULT_TOP)))
+        except ValueError:
+            top = DEFAULT_TOP
+        config = OrderedDict([
+            ['PROFILE', profile.get_info()],
+            ['SORT', sort],
+            ['SORT_KEYS', SORT_KEYS],
+            ['TOP', top],
+            ['SUMMARY', profile.get_summary(sort, top)]
+        ])
+        super().get("profile.html", "Request Profile #{}".format(profile.id), config, None)
+
+
+class RequestProfileDownloadHandler(ZynthianBasicHandler):
+
+    profiling_allowed = False
+
+    @tornado.web.authenticated
+    def get(self, id):
+        profile = request_profiler.get(int(id))
+        if profile is None:
+            raise tornado.web.HTTPError(404)
+        fname = "webconf-{}-{}.pstats".format(profile.id, profile.handler)
+        self.set_header('Content-Type', "application/octet-stream")
+        self.set_header("Content-Description", "File Transfer")
+        self.set_header('Content-Disposition', 'attachment; filename="{}"'.format(fname))
+        self.write(profile.get_pstats())
+
+# ------------------------------------------------------------------------------
@@ -25,10 +25,11 @@
 import os
 import re
 import PAM
+import shlex
 import logging
 import tornado.web
-from subprocess import check_output
 
+from lib import command_runner
 from lib.zynthian_config_handler import ZynthianConfigHandler
 
 # ------------------------------------------------------------------------------
@@ -84,18 +85,18 @@ class SecurityConfigHandler(ZynthianConfigHandler):
         super().get("Security/Access", config, errors)
 
     @tornado.web.authenticated
-    def post(self):
+    async def post(self):
         params = tornado.escape.recursive_unicode(self.request.arguments)
         logging.debug(f"COMMAND: {params['_command'][0]}")
         if params['_command'][0] == "REGENERATE_KEYS":
             cmd = os.environ.get('ZYNTHIAN_SYS_DIR') + "/sbin/regenerate_keys.sh"
-            check_output(cmd, shell=True)
+            await command_runner.check_output(cmd, timeout=command_runner.SHORT_TIMEOUT)
             self.redirect('/sys-reboot')
         else:
-            errors = self.update_system_config(params)
+            errors = await self.update_system_config(params)
             self.get(errors)
 
-    def update_system_config(self, config):
+    async def update_system_config(self, config):
         # PAM service callback
         def pam_conv(auth, query_list, userData):
             resp = []
@@ -148,14 +149,14 @@ class SecurityConfigHandler(ZynthianConfigHandler):
 
             # Change VNC password
             try:
-                check_output(f"echo \"{config['PASSWORD'][0]}\" | vncpasswd -f > /root/.vnc/passwd; chmod go-r /root/.vnc/passwd", shell=True)
+                await command_runner.check_output(f"echo \"{config['PASSWORD'][0]}\" | vncpasswd -f > /root/.vnc/passwd; chmod go-r /root/.vnc/passwd", timeout=command_runner.SHORT_TIMEOUT)
             except Exception as e:
                 logging.error(f"Can't set new password for VNC Server! => {e}")
                 return {'REPEAT_PASSWORD': "Can't set new password for VNC Server!"}
 
             # Change WIFI password
             try:
-                check_output(f"nmcli con modify zynthian-ap wifi-sec.psk \"{config['PASSWORD'][0]}\"", shell=True)
+                await command_runner.check_output(f"nmcli con modify zynthian-ap wifi-sec.psk \"{config['PASSWORD'][0]}\"", timeout=command_runner.SHORT_TIMEOUT)
             except Exception as e:
                 logging.error(f"Can't set new password for WIFI HotSpot! => {e}")
                 return {'REPEAT_PASSWORD': "Can't set new password for WIFI HotSpot!"}
@@ -184,10 +185,10 @@ class SecurityConfigHandler(ZynthianConfigHandler):
                 f.write(contents)
                 f.close()
 
-            check_output(["hostnamectl", "set-hostname", newHostname])
+            await command_runner.check_output("hostnamectl set-hostname {}".format(shlex.quote(newHostname)), timeout=command_runner.SHORT_TIMEOUT)
 
             try:
-                check_output(f"nmcli con modify zynthian-ap wifi.ssid \"{newHostname}\"", shell=True)
+                await command_runner.check_output(f"nmcli con modify zynthian-ap wifi.ssid \"{newHostname}\"", timeout=command_runner.SHORT_TIMEOUT)
             except Exception as e:
                 logging.error(f"Can't set WIFI HotSpot name! => {e}")
                 return {'HOSTNAME': "Can't set WIFI HotSpot name!"}
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Systemd Service State Monitor
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import time
+import asyncio
+import logging
+from subprocess import run, PIPE, DEVNULL
+
+# ------------------------------------------------------------------------------
+# Service state queries
+# ------------------------------------------------------------------------------
+
+
+def systemctl_query(services):
+    """Get the state of several units with a single systemctl call."""
+    res = run(["systemctl", "is-active"] + services, stdout=PIPE, stderr=DEVNULL)
+    states = res.stdout.decode('utf-8', 'ignore').split()
+    if len(states) != len(services):
+        raise ValueError("Unexpected systemctl output: {}".format(states))
+    return {service: (state == 'active') for service, state in zip(services, states)}
+
+
+class FakeServiceQuery:
+    """Test double for systemctl_query, answering from an in-memory dict."""
+
+    def __init__(self, states=None):
+        self.states = dict(states or {})
+        self.calls = 0
+
+    def set_active(self, service, active=True):
+        self.states[service] = active
+
+    def __call__(self, services):
+        self.calls += 1
+        return {service: self.states.get(service, False) for service in services}
+
+# ------------------------------------------------------------------------------
+# Service Monitor
+# ------------------------------------------------------------------------------
+
+
+class ServiceMonitor:
+    """
+    Serves service state lookups from memory.
+
+    All the units of interest are polled together with one batched query.
+    Stale states are returned immediately while a refresh runs in the
+    background, so page rendering never waits for systemctl except for the
+    very first lookup.
+
+    Units not given on creation are registered on their first lookup and
+    reported inactive until the background poll resolves them, so every unit
+    looked up with is_active() must be in the initial list.
+    """
+
+    max_age = 3.0
+
+    def __init__(self, services=(), query=systemctl_query):
+        self.services = set(services)
+        self.query = query
+        self.states = {}
+        self.version = 0
+        self.poll_ts = 0
+        self.polling = False
+
+    def set_query(self, query):
+        self.query = query
+        self.invalidate()
+
+    def invalidate(self):
+        self.poll_ts = 0
+
+    def poll(self, services=None):
+        """
+        Query the states of services (a snapshot of the units of interest, by
+        default). Run in a worker thread, so it must not iterate self.services,
+        that the loop may be adding to.
+        """
+        if services is None:
+            services = tuple(self.services)
+        try:
+            states = self.query(sorted(services))
+        except Exception as e:
+            logging.error("Can't get service states: {}".format(e))
+            return
+        finally:
+            self.poll_ts = time.monotonic()
+        if states != self.states:
+            self.states = states
+            self.version += 1
+
+    def poll_background(self):
+        if self.polling:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.poll()
+            return
+
+        services = tuple(self.services)
+
+        def done(future):
+            self.polling = False
+            # Units registered while polling => poll them too
+            if len(self.services) != len(services):
+                self.poll_background()
+
+        self.polling = True
+        loop.run_in_executor(None, self.poll, services).add_done_callback(done)
+
+    def refresh(self):
+        """Poll the states if they are too old. Returns the states version."""
+        if time.monotonic() - self.poll_ts > self.max_age:
+            if self.states:
+                self.poll_background()
+            else:
+                self.poll()
+        return self.version
+
+    def is_active(self, service):
+        if service not in self.services:
+            # Resolved by the background poll. Reported inactive meanwhile.
+            logging.warning("Service '{}' is not monitored => reported inactive until polled".format(service))
+            self.services.add(service)
+            self.invalidate()
+        self.refresh()
+        return self.states.get(service, False)
+
+
+# All the units looked up with is_active(), in dashboard, menu & config handlers
+service_monitor = ServiceMonitor([
+    "zynthian",
+    "mod-ui",
+    "novnc0",
+    "novnc1",
+    "touchosc2midi",
+    "jacknetumpd",
+    "jackrtpmidid",
+    "qmidinet"
+])
+
+# ------------------------------------------------------------------------------
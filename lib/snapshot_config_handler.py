@@ -33,6 +33,10 @@ import tornado.web
 from collections import OrderedDict
 
 from lib.zynthian_config_handler import ZynthianBasicHandler
+from lib.fs_watcher import fs_watcher
+from lib.job_executor import job_executor
+from lib.tmp_storage import tmp_storage, get_tree_size
+from lib.transfer_service import transfer_service
 from zyngine.zynthian_legacy_snapshot import zynthian_legacy_snapshot
 
 # ------------------------------------------------------------------------------
@@ -51,6 +55,9 @@ class SnapshotConfigHandler(ZynthianBasicHandler):
 
     @tornado.web.authenticated
     def get(self, errors=None):
+        if self.genjson and self.check_data_version(self.get_snapshots_version()):
+            return
+
         config = OrderedDict([])
 
         ssdata = self.get_snapshots_data()
@@ -60,8 +67,7 @@ class SnapshotConfigHandler(ZynthianBasicHandler):
         config['BANKS'] = self.get_existing_banks(ssdata, True)
         config['NEXT_BANK_NUM'] = self.calculate_next_bank(
             self.get_existing_banks(ssdata, False))
-        config['PROGS_NUM'] = map(lambda x: str(
-            x).zfill(3), list(range(0, 128)))
+        config['PROGS_NUM'] = [str(x).zfill(3) for x in range(0, 128)]
         config['MIDI_PROFILE_SCRIPTS'] = {os.path.splitext(
             x)[0]:  "%s/%s" % (self.PROFILES_DIRECTORY, x) for x in os.listdir(self.PROFILES_DIRECTORY)}
         config['ZYNTHIAN_UPLOAD_MULTIPLE'] = True
@@ -93,7 +99,7 @@ class SnapshotConfigHandler(ZynthianBasicHandler):
         if snapshot_warning:
             result['errors'] = snapshot_warning
 
-        self.write(result)
+        self.write_json(result)
 
     def do_new_bank(self):
         result = {}
@@ -235,6 +241,11 @@ class SnapshotConfigHandler(ZynthianBasicHandler):
                 return i
         return ''
 
+    def get_snapshots_version(self):
+        # Snapshot contents are part of the tree data (prog_details)
+        return (fs_watcher.get_version(self.SNAPSHOTS_DIRECTORY),
+                fs_watcher.get_version(self.PROFILES_DIRECTORY))
+
     def get_snapshots_data(self):
         return self.walk_directory(SnapshotConfigHandler.SNAPSHOTS_DIRECTORY)
 
@@ -468,22 +479,27 @@ class SnapshotDownloadHandler(tornado.web.RequestHandler):
         return self.get_secure_cookie("user")
 
     @tornado.web.authenticated
-    def get(self, fpath_b64):
+    async def get(self, fpath_b64):
         result = None
         fpath = None
-        delete = False
+        tmp = None
         try:
             fpath = str(base64.b64decode(fpath_b64), 'utf-8')
+            # Sent by the transfer worker, if running
+            transfer_url = transfer_service.get_download_url(self, fpath)
+            if transfer_url:
+                self.redirect(transfer_url)
+                return
             dname, fname = os.path.split(fpath)
             if os.path.isdir(fpath):
-                zfpath = TMP_DIR + "/" + fname
-                shutil.make_archive(zfpath, 'zip', fpath)
-                fpath = zfpath + ".zip"
+                # Zipped size <= tree size
+                tmp = tmp_storage.file(suffix=".zip", size_hint=get_tree_size(fpath))
+                await job_executor.run("archive", shutil.make_archive, tmp.path[:-4], 'zip', fpath)
+                tmp.settle()
+                fpath = tmp.path
                 fname += ".zip"
-                delete = True
                 mime_type = "application/zip"
             else:
-                delete = False
                 mime_type = "application/octet-stream"
 
             self.set_header('Content-Type', mime_type)
@@ -503,7 +519,7 @@ class SnapshotDownloadHandler(tornado.web.RequestHandler):
             result = {'errors': "Can't download file: {}".format(e)}
 
         finally:
-            if fpath and delete:
-                os.remove(fpath)
+            if tmp:
+                tmp.release()
 
         return result
@@ -27,8 +27,9 @@ import logging
 import tornado.web
 import tornado.websocket
 from collections import OrderedDict
-import subprocess
 import jsonpickle
+from subprocess import STDOUT
+from lib import command_runner
 from lib.zynthian_config_handler import ZynthianBasicHandler
 from lib.zynthian_websocket_handler import ZynthianWebSocketMessageHandler, ZynthianWebSocketMessage
 
@@ -58,15 +59,18 @@ class SoftwareUpdateMessageHandler(ZynthianWebSocketMessageHandler):
     def is_registered_for(cls, handler_name):
         return handler_name == 'SoftwareUpdateMessageHandler'
 
-    def on_websocket_message(self, update_command):
-        p = subprocess.Popen(
-            UPDATE_COMMANDS[update_command], shell=True, stderr=subprocess.STDOUT, stdout=subprocess.PIPE)
-        for line in p.stdout:
-            logging.info(line.decode())
-            message = ZynthianWebSocketMessage(
-                'SoftwareUpdateMessageHandler', line.decode())
-            self.websocket.write_message(jsonpickle.encode(message))
+    async def on_websocket_message(self, update_command):
+        try:
+            await command_runner.run(UPDATE_COMMANDS[update_command], stderr=STDOUT, on_line=self.send_line)
+        except Exception as e:
+            logging.error("Software update failed: {}".format(e))
 
         message = ZynthianWebSocketMessage(
             'SoftwareUpdateMessageHandler', "EOCOMMAND")
         self.websocket.write_message(jsonpickle.encode(message))
+
+    def send_line(self, line):
+        logging.info(line)
+        message = ZynthianWebSocketMessage(
+            'SoftwareUpdateMessageHandler', line)
+        self.websocket.write_message(jsonpickle.encode(message))
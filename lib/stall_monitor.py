@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Event Loop Stall Monitor
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Watchdog for the asyncio loop:
+#
+#  + A heartbeat callback runs on the loop every HEARTBEAT_INTERVAL and
+#    measures how late it was called (loop lag).
+#  + A watchdog thread checks the last heartbeat. When the loop has been
+#    blocked for longer than the threshold, it captures the stack of the loop
+#    thread while it's still blocked, so the culprit is in the stack.
+#  + When the loop resumes, the stall duration is completed & logged.
+#
+# The threshold (ms) is set with ZYNTHIAN_WEBCONF_STALL_THRESHOLD (0 disables
+# the monitor) and can be changed at runtime from the /sys-stalls page, which
+# stops or starts the monitor when it's set to 0 or back to a positive value.
+# ------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+
+import tornado.web
+
+from lib.perf_metrics import Histogram
+
+DEFAULT_THRESHOLD_MS = 250
+HEARTBEAT_INTERVAL = 0.05
+MAX_EVENTS = 50
+MAX_STACK_DEPTH = 40
+
+# Seconds
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_env_threshold():
+    try:
+        return int(os.environ.get('ZYNTHIAN_WEBCONF_STALL_THRESHOLD', DEFAULT_THRESHOLD_MS))
+    except ValueError:
+        logging.error("Bad ZYNTHIAN_WEBCONF_STALL_THRESHOLD => using {} ms".format(DEFAULT_THRESHOLD_MS))
+        return DEFAULT_THRESHOLD_MS
+
+
+def find_request(frame):
+    """Description of the request being served by the stack, if any."""
+    while frame is not None:
+        handler = frame.f_locals.get('self')
+        if isinstance(handler, tornado.web.RequestHandler):
+            return "{} {} ({})".format(handler.request.method, handler.request.uri, type(handler).__name__)
+        frame = frame.f_back
+    return None
+
+
+class StallMonitor:
+
+    def __init__(self, threshold_ms=DEFAULT_THRESHOLD_MS, max_events=MAX_EVENTS):
+        self.threshold_ms = threshold_ms
+        self.lock = threading.Lock()
+        self.events = deque(maxlen=max_events)
+        self.loop = None
+        self.loop_thread_id = None
+        self.watchdog = None
+        self.running = False
+        # Bumped on every start, so the heartbeat & watchdog of a previous run quit
+        self.generation = 0
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.events.clear()
+            self.lag = Histogram(LAG_BUCKETS)
+            self.max_lag = 0.0
+            self.stall_count = 0
+            self.stall_seconds = 0.0
+            # Ongoing stall, captured by the watchdog
+            self.stall = None
+
+    def is_running(self):
+        return self.running
+
+    def set_threshold(self, threshold_ms):
+        self.threshold_ms = max(0, int(threshold_ms))
+        logging.info("Event loop stall threshold set to {} ms".format(self.threshold_ms))
+        if self.threshold_ms > 0:
+            self.start()
+        else:
+            self.stop()
+
+    # ---------------------------------------------------------------------------
+    # Heartbeat (event loop thread)
+    # ---------------------------------------------------------------------------
+
+    def start(self, loop=None):
+        if self.running:
+            return
+        self.loop = loop or asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.running = True
+        self.generation += 1
+        self.expected = time.monotonic() + HEARTBEAT_INTERVAL
+        self.loop.call_later(HEARTBEAT_INTERVAL, self.heartbeat, self.generation)
+        self.watchdog = threading.Thread(target=self.watch, args=(self.generation,), name="stall_monitor", daemon=True)
+        self.watchdog.start()
+        logging.info("Event loop stall monitor started")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        with self.lock:
+            self.stall = None
+        logging.info("Event loop stall monitor stopped")
+
+    def heartbeat(self, generation):
+        if generation != self.generation:
+            return
+        now = time.monotonic()
+        lag = max(0.0, now - self.expected)
+        with self.lock:
+            self.lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            stall = self.stall
+            self.stall = None
+            if stall:
+                stall['duration_ms'] = round(1000 * lag)
+                self.stall_count += 1
+                self.stall_seconds += lag
+        if stall:
+            logging.warning("Event loop stalled for {} ms at {}".format(stall['duration_ms'], stall['where']))
+        if self.running:
+            self.expected = now + HEARTBEAT_INTERVAL
+            self.loop.call_later(HEARTBEAT_INTERVAL, self.heartbeat, generation)
+
+    # ---------------------------------------------------------------------------
+    # Watchdog (own thread)
+    # ---------------------------------------------------------------------------
+
+    def watch(self, generation):
+        while self.running and generation == self.generation:
+            time.sleep(HEARTBEAT_INTERVAL)
+            if self.threshold_ms <= 0:
+                continue
+            blocked = time.monotonic() - self.expected
+            if blocked * 1000 < self.threshold_ms or self.stall is not None:
+                continue
+            try:
+                self.capture(blocked)
+            except Exception as e:
+                logging.error("Can't capture event loop stack: {}".format(e))
+
+    def capture(self, blocked):
+        frame = sys._current_frames().get(self.loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.format_stack(frame, limit=MAX_STACK_DEPTH)
+        summary = traceback.extract_stack(frame, limit=1)[-1]
+        stall = {
+            'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'duration_ms': None,
+            'blocked_ms': round(1000 * blocked),
+            'where': "{}:{} in {}".format(summary.filename, summary.lineno, summary.name),
+            'request': find_request(frame),
+            'stack': "".join(stack)
+        }
+        del frame
+        with self.lock:
+            # The loop may have resumed meanwhile
+            if time.monotonic() < self.expected or self.stall is not None:
+                return
+            self.stall = stall
+            self.events.append(stall)
+        logging.warning("Event loop blocked for more than {} ms, serving {}:\n{}".format(
+            stall['blocked_ms'], stall['request'] or "no request", stall['stack']))
+
+    # ---------------------------------------------------------------------------
+    # Reporting
+    # ---------------------------------------------------------------------------
+
+    def get_events(self):
+        """Captured stalls, newest first."""
+        with self.lock:
+            return [dict(ev) for ev in reversed(self.events)]
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'running': self.running,
+                'threshold_ms': self.threshold_ms,
+                'heartbeats': self.lag.count,
+                'mean_lag_ms': round(1000 * self.lag.sum / self.lag.count, 2) if self.lag.count else 0,
+                'max_lag_ms': round(1000 * self.max_lag, 1),
+                'stall_count': self.stall_count,
+                'stall_ms': round(1000 * self.stall_seconds)
+            }
+
+    def render(self):
+        """Return the loop lag metrics in Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            lines.append("# HELP webconf_loop_lag_seconds Event loop heartbeat delay.")
+            lines.append("# TYPE webconf_loop_lag_seconds histogram")
+            for le, n in zip(self.lag.buckets, self.lag.cumulative_counts()):
+                lines.append('webconf_loop_lag_seconds_bucket{{le="{}"}} {}'.format(le, n))
+            lines.append('webconf_loop_lag_seconds_bucket{{le="+Inf"}} {}'.format(self.lag.count))
+            lines.append('webconf_loop_lag_seconds_sum {:.6f}'.format(self.lag.sum))
+            lines.append('webconf_loop_lag_seconds_count {}'.format(self.lag.count))
+            lines.append("# HELP webconf_loop_stalls_total Event loop stalls longer than the threshold.")
+            lines.append("# TYPE webconf_loop_stalls_total counter")
+            lines.append("webconf_loop_stalls_total {}".format(self.stall_count))
+        return "\n".join(lines) + "\n"
+
+
+stall_monitor = StallMonitor(get_env_threshold())
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Event Loop Stalls Handler
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import logging
+import tornado.web
+from collections import OrderedDict
+
+from lib.stall_monitor import stall_monitor
+from lib.zynthian_config_handler import ZynthianBasicHandler
+
+# ------------------------------------------------------------------------------
+# Event Loop Stalls Handler
+# ------------------------------------------------------------------------------
+
+
+class StallMonitorHandler(ZynthianBasicHandler):
+
+    @tornado.web.authenticated
+    def get(self, errors=None):
+        config = OrderedDict([
+            ['STATS', stall_monitor.get_stats()],
+            ['EVENTS', stall_monitor.get_events()]
+        ])
+        super().get("stalls.html", "Event Loop Stalls", config, errors)
+
+    @tornado.web.authenticated
+    def post(self):
+        errors = None
+        action = self.get_argument('_command', '')
+        if action == "CLEAR":
+            stall_monitor.reset()
+        elif action == "SET_THRESHOLD":
+            try:
+                stall_monitor.set_threshold(self.get_argument('THRESHOLD_MS'))
+            except Exception as e:
+                logging.error("Setting stall threshold: {}".format(e))
+                errors = "Bad threshold value"
+        self.get(errors)
+
+# ------------------------------------------------------------------------------
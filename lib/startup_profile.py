@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Startup Profiler
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Enabled with ZYNTHIAN_WEBCONF_PROFILE_STARTUP=1. Times every module import &
+# the startup phases, and prints the breakdown to stderr once webconf is
+# listening. Keep this module stdlib-only: it's imported before anything else.
+# ------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import importlib.machinery
+
+DEFAULT_TOP = 25
+
+FILE_LOADERS = (
+    importlib.machinery.SourceFileLoader,
+    importlib.machinery.SourcelessFileLoader,
+    importlib.machinery.ExtensionFileLoader
+)
+
+
+def is_enabled():
+    return os.environ.get('ZYNTHIAN_WEBCONF_PROFILE_STARTUP', '0') not in ('', '0')
+
+
+class ImportTimer:
+    """
+    Meta path finder that doesn't find anything by itself: it asks the other
+    finders and wraps the exec_module of the file loaders they return.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.stack = []
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                # Only file loaders are per-module instances. Builtin & frozen
+                # loaders are shared classes, so they are left alone.
+                if isinstance(spec.loader, FILE_LOADERS):
+                    spec.loader.exec_module = self.wrap(name, spec.loader.exec_module)
+                return spec
+        return None
+
+    def wrap(self, name, exec_module):
+        def timed_exec_module(module):
+            ts = time.perf_counter()
+            self.stack.append(0.0)
+            try:
+                exec_module(module)
+            finally:
+                dt = time.perf_counter() - ts
+                children = self.stack.pop()
+                if self.stack:
+                    self.stack[-1] += dt
+                self.records.append((name, dt, dt - children, len(self.stack)))
+        return timed_exec_module
+
+
+class StartupProfile:
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.marks = []
+        self.import_timer = None
+
+    def start(self):
+        self.t0 = time.perf_counter()
+        self.import_timer = ImportTimer()
+        sys.meta_path.insert(0, self.import_timer)
+
+    def stop(self):
+        if self.import_timer in sys.meta_path:
+            sys.meta_path.remove(self.import_timer)
+
+    def mark(self, phase):
+        """Close a startup phase, named after what was done since the previous mark."""
+        if self.import_timer:
+            self.marks.append((phase, time.perf_counter()))
+
+    def report(self, top=DEFAULT_TOP):
+        lines = []
+        prev = self.t0
+        for phase, ts in self.marks:
+            lines.append("  {:<40} {:>9.1f} ms".format(phase, 1000 * (ts - prev)))
+            prev = ts
+        lines.append("  {:<40} {:>9.1f} ms".format("total (since profiler start)", 1000 * (prev - self.t0)))
+
+        records = self.import_timer.records
+        lines.append("\nTop-level imports of webconf (cumulative ms):")
+        for name, dt, self_dt, depth in sorted((r for r in records if r[3] == 0), key=lambda r: -r[1])[:top]:
+            lines.append("  {:<50} {:>9.1f}".format(name, 1000 * dt))
+        lines.append("\nSlowest modules (self ms / cumulative ms):")
+        for name, dt, self_dt, depth in sorted(records, key=lambda r: -r[2])[:top]:
+            lines.append("  {:<50} {:>9.1f} {:>9.1f}".format(name, 1000 * self_dt, 1000 * dt))
+        lines.append("\n{} modules imported in {:.1f} ms".format(
+            len(records), 1000 * sum(r[1] for r in records if r[3] == 0)))
+        return "Startup profile:\n" + "\n".join(lines)
+
+    def print_report(self, top=DEFAULT_TOP):
+        if self.import_timer:
+            self.stop()
+            print(self.report(top), file=sys.stderr, flush=True)
+
+
+startup_profile = StartupProfile()
+
+# ------------------------------------------------------------------------------
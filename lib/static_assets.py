@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Static Asset Pipeline
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Build-free pipeline for the static assets (bower_components, css, js, fonts
+# & img):
+#
+#  + Precompressed variants (gzip & brotli, if the brotli module is installed)
+#    are generated in a cache dir, by a background thread after startup or
+#    at install time with "python3 -m lib.static_assets".
+#  + Templates use asset_url("/css/style.css"), that returns a content-hashed
+#    file name ("/css/style.1f3870be274f.css"). These are served with an
+#    immutable cache header, so browsers don't ask for them again.
+#  + AssetHandler negotiates the encoding with Accept-Encoding.
+# ------------------------------------------------------------------------------
+
+import os
+import re
+import sys
+import gzip
+import time
+import hashlib
+import logging
+import threading
+import tornado.web
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# URL prefix => directory, relative to the webconf dir
+ASSET_DIRS = {
+    "/bower_components/": "bower_components",
+    "/css/": "css",
+    "/js/": "js",
+    "/fonts/": "fonts",
+    "/img/": "img"
+}
+
+CACHE_DIR = os.environ.get('ZYNTHIAN_DIR', "/zynthian") + "/zynthian-webconf/static-cache"
+
+COMPRESSIBLE_EXTS = (".css", ".js", ".map", ".json", ".svg", ".html", ".txt", ".ttf", ".eot", ".otf", ".ico")
+MIN_COMPRESS_SIZE = 1024
+# Variants that don't save at least 10% are not worth it
+MAX_COMPRESS_RATIO = 0.9
+
+# Preferred first
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+HASH_LEN = 12
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+fingerprint_re = re.compile(r"^(.+)\.([0-9a-f]{%d})(\.[^./]+)$" % HASH_LEN)
+
+# ------------------------------------------------------------------------------
+# Asset Store
+# ------------------------------------------------------------------------------
+
+
+def compress_gzip(data):
+    # mtime=0 => same input, same output
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+class StaticAssetStore:
+
+    def __init__(self, asset_dirs, cache_dir):
+        self.asset_dirs = asset_dirs
+        self.cache_dir = cache_dir
+        # Absolute source path => (mtime, size, hash)
+        self.hashes = {}
+        self.compressors = [("gzip", ".gz", compress_gzip)]
+        if brotli:
+            self.compressors.insert(0, ("br", ".br", compress_brotli))
+
+    @staticmethod
+    def get_root(dname):
+        return os.path.abspath(dname)
+
+    def get_variant_fpath(self, fpath, fext):
+        return os.path.join(self.cache_dir, os.path.relpath(fpath) + fext)
+
+    def get_hash(self, fpath):
+        """Content hash of a source file, cached until its mtime or size change."""
+        st = os.stat(fpath)
+        cached = self.hashes.get(fpath)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        with open(fpath, "rb") as fh:
+            fhash = hashlib.md5(fh.read()).hexdigest()[:HASH_LEN]
+        self.hashes[fpath] = (st.st_mtime_ns, st.st_size, fhash)
+        return fhash
+
+    def url(self, url_path):
+        """Fingerprinted URL for an asset. Unknown assets keep their URL."""
+        for prefix, dname in self.asset_dirs.items():
+            if url_path.startswith(prefix):
+                fpath = os.path.join(self.get_root(dname), url_path[len(prefix):])
+                try:
+                    fhash = self.get_hash(fpath)
+                except OSError:
+                    logging.warning("Missing static asset '{}'".format(url_path))
+                    return url_path
+                base, ext = os.path.splitext(url_path)
+                return "{}.{}{}".format(base, fhash, ext)
+        return url_path
+
+    def get_variant(self, fpath, accept_encoding):
+        """Best precompressed variant of fpath for the client, as (encoding, fpath), or (None, fpath)."""
+        if not fpath.endswith(COMPRESSIBLE_EXTS):
+            return None, fpath
+        try:
+            mtime = os.stat(fpath).st_mtime_ns
+            for encoding, fext in ENCODINGS:
+                if encoding in accept_encoding:
+                    vfpath = self.get_variant_fpath(fpath, fext)
+                    try:
+                        # Stale variants (older than the source) are ignored
+                        if os.stat(vfpath).st_mtime_ns >= mtime:
+                            return encoding, vfpath
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        return None, fpath
+
+    def build(self):
+        """Generate the missing or stale precompressed variants. Returns (generated, total)."""
+        ts = time.monotonic()
+        count = 0
+        total = 0
+        for dname in self.asset_dirs.values():
+            for dirpath, dirnames, filenames in os.walk(self.get_root(dname)):
+                for fname in filenames:
+                    if not fname.endswith(COMPRESSIBLE_EXTS):
+                        continue
+                    total += 1
+                    try:
+                        count += self.build_file(os.path.join(dirpath, fname))
+                    except Exception as e:
+                        logging.error("Can't compress static asset '{}': {}".format(fname, e))
+        logging.info("Compressed {} static asset variants ({} files) in {:.1f} s".format(
+            count, total, time.monotonic() - ts))
+        return count, total
+
+    def start_build(self):
+        """Build in a low priority thread, so it doesn't compete with the audio stack."""
+        def run():
+            try:
+                # Linux "nice" is per thread
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+            except Exception as e:
+                logging.warning("Can't lower the static asset build priority: {}".format(e))
+            self.build()
+        threading.Thread(target=run, name="static_assets", daemon=True).start()
+
+    def build_file(self, fpath):
+        st = os.stat(fpath)
+        if st.st_size < MIN_COMPRESS_SIZE:
+            return 0
+        count = 0
+        data = None
+        for encoding, fext, compress in self.compressors:
+            vfpath = self.get_variant_fpath(fpath, fext)
+            try:
+                if os.stat(vfpath).st_mtime_ns >= st.st_mtime_ns:
+                    continue
+            except OSError:
+                pass
+            if data is None:
+                with open(fpath, "rb") as fh:
+                    data = fh.read()
+            cdata = compress(data)
+            if len(cdata) > len(data) * MAX_COMPRESS_RATIO:
+                # Make sure a previous variant is not used
+                if os.path.exists(vfpath):
+                    os.remove(vfpath)
+                continue
+            # Atomic replace, so the handler never sees a partial variant
+            os.makedirs(os.path.dirname(vfpath), exist_ok=True)
+            with open(vfpath + ".tmp", "wb") as fh:
+                fh.write(cdata)
+            os.replace(vfpath + ".tmp", vfpath)
+            count += 1
+        return count
+
+
+static_assets = StaticAssetStore(ASSET_DIRS, CACHE_DIR)
+
+
+def asset_url(handler, url_path):
+    """Template UI method: {{ asset_url("/css/style.css") }}"""
+    return static_assets.url(url_path)
+
+# ------------------------------------------------------------------------------
+# Asset Handler
+# ------------------------------------------------------------------------------
+
+
+class AssetHandler(tornado.web.StaticFileHandler):
+    """
+    StaticFileHandler serving the precompressed variants & the fingerprinted
+    file names. A fingerprint that doesn't match the current content (a page
+    cached before an update) gets the current file, without immutable cache.
+    """
+
+    fingerprinted = False
+    content_encoding = None
+
+    def parse_url_path(self, url_path):
+        path = super().parse_url_path(url_path)
+        m = fingerprint_re.match(path)
+        if m:
+            fpath = os.path.join(self.root, m.group(1) + m.group(3))
+            if os.path.isfile(fpath):
+                try:
+                    self.fingerprinted = static_assets.get_hash(fpath) == m.group(2)
+                except OSError:
+                    pass
+                path = m.group(1) + m.group(3)
+        return path
+
+    def validate_absolute_path(self, root, absolute_path):
+        # The source path is validated, the variant lives in the cache dir
+        absolute_path = super().validate_absolute_path(root, absolute_path)
+        if absolute_path is None:
+            return None
+        self.source_path = absolute_path
+        self.content_encoding, absolute_path = static_assets.get_variant(
+            absolute_path, self.request.headers.get("Accept-Encoding", ""))
+        return absolute_path
+
+    def get_content_size(self):
+        # The base class size comes from the source file stat
+        if self.content_encoding:
+            return os.path.getsize(self.absolute_path)
+        return super().get_content_size()
+
+    def get_content_type(self):
+        # Type of the source file, not of the ".gz" variant
+        absolute_path = self.absolute_path
+        self.absolute_path = self.source_path
+        try:
+            return super().get_content_type()
+        finally:
+            self.absolute_path = absolute_path
+
+    def set_extra_headers(self, path):
+        if self.source_path.endswith(COMPRESSIBLE_EXTS):
+            self.set_header("Vary", "Accept-Encoding")
+        if self.content_encoding:
+            self.set_header("Content-Encoding", self.content_encoding)
+        if self.fingerprinted:
+            self.set_header("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+
+# ------------------------------------------------------------------------------
+# Install time build: python3 -m lib.static_assets
+# ------------------------------------------------------------------------------
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(levelname)s:%(module)s: %(message)s', stream=sys.stderr, level=logging.INFO)
+    if not brotli:
+        logging.warning("Python brotli module not found => only gzip variants")
+    static_assets.build()
+
+# ------------------------------------------------------------------------------
@@ -24,16 +24,20 @@
 
 import os
 import time
+import inspect
 import logging
 import zipfile
 import jsonpickle
 import tornado.web
-from io import BytesIO
 from pathlib import Path
 
+from lib.tmp_storage import tmp_storage
+from lib.job_executor import job_executor
+from lib.job_workers import zip_tree
 from lib.zynthian_config_handler import ZynthianBasicHandler
 from lib.zynthian_websocket_handler import ZynthianWebSocketMessageHandler, ZynthianWebSocketMessage
 
+BACKUP_CHUNK_SIZE = 64 * 1024
 
 # ------------------------------------------------------------------------------
 # Snapshot Config Handler
@@ -114,7 +118,7 @@ class SystemBackupHandler(ZynthianBasicHandler):
         super().get("backup.html", "Backup / Restore", config, errors)
 
     @tornado.web.authenticated
-    def post(self):
+    async def post(self):
         command = self.get_argument('_command', '')
         logging.info("COMMAND = {}".format(command))
         if command:
@@ -125,6 +129,8 @@ class SystemBackupHandler(ZynthianBasicHandler):
                 'BACKUP_DATA': lambda: self.do_backup_data(),
                 'SAVE_BACKUP_CONFIG': lambda: self.do_save_backup_config()
             }[command]()
+            if inspect.isawaitable(errors):
+                errors = await errors
 
     def do_save_backup_config(self):
         # Save "Config" items
@@ -149,42 +155,40 @@ class SystemBackupHandler(ZynthianBasicHandler):
         active_tab = self.get_argument("ACTIVE_TAB", "BACKUP/RESTORE")
         self.do_get(active_tab)
 
-    def do_backup_all(self):
+    async def do_backup_all(self):
         backup_items = self.get_all_backup_items()
-        self.do_backup('zynthian_backup', backup_items)
+        await self.do_backup('zynthian_backup', backup_items)
 
-    def do_backup_config(self):
+    async def do_backup_config(self):
         backup_items = self.get_config_backup_items()
-        self.do_backup('zynthian_config_backup', backup_items)
+        await self.do_backup('zynthian_config_backup', backup_items)
 
-    def do_backup_data(self):
+    async def do_backup_data(self):
         backup_items = self.get_data_backup_items()
-        self.do_backup('zynthian_data_backup', backup_items)
+        await self.do_backup('zynthian_data_backup', backup_items)
 
-    def do_backup(self, fname_prefix, backup_items):
+    async def do_backup(self, fname_prefix, backup_items):
         zipname = '{0}{1}.zip'.format(
             fname_prefix, time.strftime("%Y%m%d-%H%M%S"))
-        f = BytesIO()
-        zf = zipfile.ZipFile(f, "w")
-
-        def zip_backup_items(dirname, subdirs, files):
-            logging.info(dirname)
-            if dirname != '/':
-                zf.write(dirname)
-            for filename in files:
-                logging.info(filename)
-                zf.write(os.path.join(dirname, filename))
-
-        self.walk_backup_items(zip_backup_items, backup_items)
-
-        zf.close()
-        self.set_header('Content-Type', 'application/zip')
-        self.set_header('Content-Disposition',
-                        'attachment; filename=%s' % zipname)
-
-        self.write(f.getvalue())
-        f.close()
-        self.finish()
+        valitem_info = self.get_valitem_info(backup_items)
+        # Size unknown => on disk
+        with tmp_storage.file(prefix=fname_prefix, suffix=".zip") as tmp:
+            zfpath = tmp.path
+            # Zipped by a low priority worker process, into a temp file
+            await job_executor.run("archive", zip_tree, zfpath, valitem_info["bdirs"], valitem_info["xpats"], process=True)
+            tmp.settle()
+
+            self.set_header('Content-Type', 'application/zip')
+            self.set_header('Content-Disposition',
+                            'attachment; filename=%s' % zipname)
+            with open(zfpath, 'rb') as f:
+                while True:
+                    data = f.read(BACKUP_CHUNK_SIZE)
+                    if not data:
+                        break
+                    self.write(data)
+                    await self.flush()
+            self.finish()
 
     def walk_backup_items(self, worker, backup_items):
         valitem_info = self.get_valitem_info(backup_items)
@@ -227,28 +231,31 @@ class RestoreMessageHandler(ZynthianWebSocketMessageHandler):
                 return True
         return False
 
-    def on_websocket_message(self, restore_file):
+    async def on_websocket_message(self, restore_file):
         # fileinfo = self.request.files['ZYNTHIAN_RESTORE_FILE'][0]
         # restore_file = fileinfo['filename']
-        with open(restore_file, "rb") as f:
-            self.valitem_info = SystemBackupHandler.get_valitem_info()
-            with zipfile.ZipFile(f, 'r') as restoreZip:
-                for member in restoreZip.namelist():
-                    if self.is_valid_restore_item(member):
-                        log_message = "Restored: " + member
-                        restoreZip.extract(member, "/")
-                        logging.debug(log_message)
-                        message = ZynthianWebSocketMessage(
-                            'RestoreMessageHandler', log_message)
-                        self.websocket.write_message(
-                            jsonpickle.encode(message))
-                    else:
-                        logging.warning(
-                            "Restore of " + member + " not allowed")
-                restoreZip.close()
-            f.close()
+        try:
+            await job_executor.run("extract", self.extract_restore_file, restore_file)
+        except Exception as e:
+            logging.error("Can't restore backup: {}".format(e))
         os.remove(restore_file)
         SystemBackupHandler.update_sys()
-        message = ZynthianWebSocketMessage(
-            'RestoreMessageHandler', 'EOCOMMAND')
+        self.send_message('EOCOMMAND')
+
+    def extract_restore_file(self, restore_file):
+        """Run as an "extract" job => progress messages are sent from the loop."""
+        self.valitem_info = SystemBackupHandler.get_valitem_info()
+        with zipfile.ZipFile(restore_file, 'r') as restoreZip:
+            for member in restoreZip.namelist():
+                if self.is_valid_restore_item(member):
+                    log_message = "Restored: " + member
+                    restoreZip.extract(member, "/")
+                    logging.debug(log_message)
+                    self.ioloop.call_soon_threadsafe(self.send_message, log_message)
+                else:
+                    logging.warning(
+                        "Restore of " + member + " not allowed")
+
+    def send_message(self, data):
+        message = ZynthianWebSocketMessage('RestoreMessageHandler', data)
         self.websocket.write_message(jsonpickle.encode(message))
@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# Temporary Storage
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Temporary files for uploads, download packages & installs:
+#
+#  + Uploads go to TMP_DIR, on disk. Other temp files & dirs are taken as
+#    handles: tmp_storage.file() / tmp_storage.dir(), used as context
+#    managers (or released in a finally), that remove them whatever happens.
+#  + Handles given a size hint up to RAM_MAX_FILE_SIZE are staged on tmpfs
+#    (RAM_TMP_DIR), if available, saving SD card writes. The rest, and those
+#    of unknown size, go to disk.
+#  + Each area has a byte quota (ZYNTHIAN_WEBCONF_TMP_QUOTA &
+#    ZYNTHIAN_WEBCONF_TMP_RAM_QUOTA). Handles reserve their size hint. The
+#    files not held by a handle (uploads, orphans) are measured in the
+#    background (every MEASURE_INTERVAL, and after a refusal), never while
+#    serving a request. The disk also keeps MIN_DISK_FREE free. Over quota,
+#    TmpQuotaError is raised (uploads get a 507).
+#  + A hint is not trusted: files written with handle.open() are resized as
+#    they grow, and handles written by other means are settle()d when done.
+#    A RAM handle outgrowing its room is moved to disk.
+#  + Startup doesn't remove anything: the temp dir of the previous run is
+#    renamed away. A background GC removes it, and then periodically the
+#    files not held by a handle older than ORPHAN_MAX_AGE. After a graceful
+#    restart (re-exec) the temp dirs are kept, as the pages may still hold
+#    the paths of uploads not installed yet.
+# ------------------------------------------------------------------------------
+
+import os
+import glob
+import time
+import errno
+import shutil
+import asyncio
+import logging
+import tempfile
+import threading
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+
+TMP_DIR = os.environ.get('ZYNTHIAN_DIR', "/zynthian") + "/zynthian-webconf/tmp"
+RAM_TMP_DIR = os.environ.get('ZYNTHIAN_WEBCONF_TMP_RAM_DIR', "/dev/shm/zynthian-webconf")
+RAM_MAX_FILE_SIZE = 16 * MB
+MIN_DISK_FREE = 256 * MB
+GC_INTERVAL = 600
+MEASURE_INTERVAL = 60
+# Room reserved at once when a handle's file outgrows its reservation
+WRITER_STEP = 1 * MB
+# Uploaded files wait in TMP_DIR until installed
+ORPHAN_MAX_AGE = 6 * 3600
+
+
+def get_env_size(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        logging.error("Bad {} => using {}".format(name, default))
+        return default
+
+
+def get_tree_size(path):
+    """Size of a file, or of all the files in a directory tree."""
+    if not os.path.isdir(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+    size = 0
+    for dirname, subdirs, files in os.walk(path):
+        for fname in files:
+            try:
+                size += os.path.getsize(os.path.join(dirname, fname))
+            except OSError:
+                pass
+    return size
+
+
+def remove_path(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def init_tmp_dir(keep=False):
+    """
+    Start with an empty TMP_DIR. The one left by the previous run is renamed
+    away, so it can be removed later (see clean_old_tmp_dirs) without delaying
+    the startup. With keep, the existing one is used.
+    """
+    if os.path.isdir(TMP_DIR) and not keep:
+        try:
+            os.rename(TMP_DIR, "{}.old-{}".format(TMP_DIR, os.getpid()))
+        except Exception as e:
+            logging.error("Can't rename old temp dir: {}".format(e))
+            shutil.rmtree(TMP_DIR, ignore_errors=True)
+    os.makedirs(TMP_DIR, exist_ok=True)
+
+
+def clean_old_tmp_dirs():
+    """Remove the temp dirs left by previous runs. It may be slow, so run it in a thread."""
+    for dpath in glob.glob(TMP_DIR + ".old-*"):
+        shutil.rmtree(dpath, ignore_errors=True)
+        logging.debug("Removed old temp dir '{}'".format(dpath))
+
+
+class TmpQuotaError(OSError):
+
+    def __init__(self, area, size):
+        super().__init__(errno.ENOSPC, "No room for {} bytes in the {} temp storage".format(size, area.name))
+
+
+class TmpArea:
+
+    def __init__(self, name, path, quota, min_free=0):
+        self.name = name
+        self.path = path
+        self.quota = quota
+        # Free space to leave in the filesystem
+        self.min_free = min_free
+        # Size hints of the live handles
+        self.reserved = 0
+        # Files not held by a handle, as last measured
+        self.untracked = 0
+        self.handles = 0
+        # Handles & uploads refused
+        self.quota_errors = 0
+
+    def measure(self, held):
+        """Measure the files not held by a handle. It may be slow, so run it in a thread."""
+        size = 0
+        try:
+            entries = list(os.scandir(self.path))
+        except OSError:
+            entries = []
+        for entry in entries:
+            if entry.path not in held:
+                size += get_tree_size(entry.path)
+        self.untracked = size
+        return size
+
+    def fits(self, size):
+        # Untracked files as last measured by the GC
+        if self.reserved + self.untracked + size > self.quota:
+            return False
+        if self.min_free:
+            try:
+                if shutil.disk_usage(self.path).free - size < self.min_free:
+                    return False
+            except OSError:
+                pass
+        return True
+
+
+class TmpHandle:
+    """A temp file or dir, removed when released (or at the end of the with block)."""
+
+    def __init__(self, storage, area, path, size):
+        self.storage = storage
+        self.area = area
+        self.path = path
+        # Reserved bytes
+        self.size = size
+        # Bytes written with open()
+        self.written = 0
+        self.released = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        remove_path(self.path)
+        self.storage.forget(self)
+
+    def open(self, path=None, mode="wb"):
+        """Open the handle's file (or path, in the handle's dir) for writing, accounting its growth."""
+        return TmpWriter(self, path, mode)
+
+    def resize(self, size, strict=True):
+        """
+        Reserve size bytes for the handle. Raises TmpQuotaError if there is no
+        room (unless not strict: the bytes are already written). A RAM handle
+        is moved to disk if it doesn't fit there anymore (path changes).
+        """
+        self.storage.resize(self, size, strict)
+
+    def settle(self):
+        """Account the size of what was written (by other means than open())."""
+        self.resize(get_tree_size(self.path), strict=False)
+
+
+class TmpWriter:
+    """Writable file of a handle. The handle is resized before the file outgrows it."""
+
+    def __init__(self, handle, path=None, mode="wb"):
+        self.handle = handle
+        self.relpath = os.path.relpath(path, handle.path) if path else None
+        self.fh = open(self.get_path(), mode)
+
+    def get_path(self):
+        if self.relpath:
+            return os.path.join(self.handle.path, self.relpath)
+        return self.handle.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, data):
+        handle = self.handle
+        handle.written += len(data)
+        if handle.written > handle.size:
+            self.fh.flush()
+            path = handle.path
+            handle.resize(handle.written + WRITER_STEP)
+            if handle.path != path:
+                # Moved to disk
+                self.fh.close()
+                self.fh = open(self.get_path(), "ab")
+        return self.fh.write(data)
+
+    def close(self):
+        self.fh.close()
+
+
+class TmpStorage:
+
+    def __init__(self):
+        self.disk = TmpArea("disk", TMP_DIR, get_env_size('ZYNTHIAN_WEBCONF_TMP_QUOTA', 4 * GB), MIN_DISK_FREE)
+        self.ram = TmpArea("ram", RAM_TMP_DIR, get_env_size('ZYNTHIAN_WEBCONF_TMP_RAM_QUOTA', 64 * MB))
+        self.ram_available = False
+        # path => live handle
+        self.handles = {}
+        # Handles may be written from job threads
+        self.lock = threading.RLock()
+        self.gc_removed = 0
+        self.gc_task = None
+        self.measure_task = None
+        self.spilled = 0
+
+    def init(self, keep=False):
+        """
+        Set up the temp areas. With keep (graceful restart), the files of the
+        previous process are kept: uploads may be waiting to be installed. The
+        GC removes them when they become orphans.
+        """
+        init_tmp_dir(keep)
+        # Small & in RAM, so it's quickly removed. Files left there by the previous run are orphans.
+        try:
+            if os.path.isdir(os.path.dirname(RAM_TMP_DIR)):
+                if not keep:
+                    shutil.rmtree(RAM_TMP_DIR, ignore_errors=True)
+                os.makedirs(RAM_TMP_DIR, exist_ok=True)
+                self.ram_available = self.ram.quota > 0
+        except Exception as e:
+            logging.warning("No RAM temp storage => staging on disk: {}".format(e))
+
+    def start(self):
+        """Run the GC in the background. The first run removes the temp dirs of previous runs."""
+        self.gc_task = asyncio.get_running_loop().create_task(self.gc_loop())
+
+    def stop(self):
+        if self.gc_task:
+            self.gc_task.cancel()
+            self.gc_task = None
+
+    # ---------------------------------------------------------------------------
+    # Handles
+    # ---------------------------------------------------------------------------
+
+    def refuse(self, area, size):
+        area.quota_errors += 1
+        # Things may have been removed since the last measure
+        self.request_measure()
+        raise TmpQuotaError(area, size)
+
+    def get_area(self, size_hint):
+        if self.ram_available and size_hint is not None and size_hint <= RAM_MAX_FILE_SIZE:
+            if self.ram.fits(size_hint):
+                return self.ram
+        if not self.disk.fits(size_hint or 0):
+            self.refuse(self.disk, size_hint or 0)
+        return self.disk
+
+    def add(self, area, path, size):
+        handle = TmpHandle(self, area, path, size)
+        area.reserved += size
+        area.handles += 1
+        self.handles[path] = handle
+        return handle
+
+    def forget(self, handle):
+        with self.lock:
+            if self.handles.pop(handle.path, None):
+                handle.area.reserved -= handle.size
+                handle.area.handles -= 1
+
+    def file(self, suffix="", prefix="webconf-", size_hint=None):
+        """New empty temp file, staged in RAM if size_hint is small enough."""
+        with self.lock:
+            area = self.get_area(size_hint)
+            fd, path = tempfile.mkstemp(suffix=suffix, prefix=prefix, dir=area.path)
+            os.close(fd)
+            return self.add(area, path, size_hint or 0)
+
+    def dir(self, prefix="webconf-", size_hint=None):
+        """New empty temp dir, staged in RAM if size_hint is small enough."""
+        with self.lock:
+            area = self.get_area(size_hint)
+            return self.add(area, tempfile.mkdtemp(prefix=prefix, dir=area.path), size_hint or 0)
+
+    def resize(self, handle, size, strict=True):
+        with self.lock:
+            if handle.released:
+                return
+            area = handle.area
+            extra = size - handle.size
+            if extra <= 0:
+                area.reserved += extra
+                handle.size = size
+            elif area is self.ram and (size > RAM_MAX_FILE_SIZE or not area.fits(extra)):
+                self.spill(handle, size, strict)
+            elif area.fits(extra) or not strict:
+                area.reserved += extra
+                handle.size = size
+            else:
+                self.refuse(area, size)
+
+    def spill(self, handle, size, strict=True):
+        """Move a RAM handle to disk, reserving size bytes there."""
+        if strict and not self.disk.fits(size):
+            self.refuse(self.disk, size)
+        path = os.path.join(self.disk.path, os.path.basename(handle.path))
+        shutil.move(handle.path, path)
+        logging.info("Temp '{}' outgrew its RAM room => moved to disk".format(handle.path))
+        del self.handles[handle.path]
+        self.ram.reserved -= handle.size
+        self.ram.handles -= 1
+        handle.area = self.disk
+        handle.path = path
+        handle.size = size
+        self.disk.reserved += size
+        self.disk.handles += 1
+        self.handles[path] = handle
+        self.spilled += 1
+
+    def check_upload(self, size):
+        """Raise TmpQuotaError if an upload of size bytes doesn't fit in TMP_DIR."""
+        if not self.disk.fits(size):
+            self.refuse(self.disk, size)
+        # Not held by a handle => counted as untracked, until measured again
+        self.disk.untracked += size
+
+    # ---------------------------------------------------------------------------
+    # GC
+    # ---------------------------------------------------------------------------
+
+    def gc(self, held, max_age=ORPHAN_MAX_AGE):
+        """
+        Remove the files not in held (the paths of the live handles) & older
+        than max_age. Runs in a thread.
+        """
+        removed = 0
+        now = time.time()
+        for area in (self.disk, self.ram):
+            try:
+                entries = list(os.scandir(area.path))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.path in held or now - entry.stat(follow_symlinks=False).st_mtime < max_age:
+                        continue
+                except OSError:
+                    continue
+                remove_path(entry.path)
+                logging.info("Removed orphan temp file '{}'".format(entry.path))
+                removed += 1
+        self.gc_removed += removed
+        self.measure(held)
+        return removed
+
+    def measure(self, held):
+        """Measure the files not held by a handle, in all the areas. Runs in a thread."""
+        for area in (self.disk, self.ram):
+            area.measure(held)
+
+    def get_held(self):
+        with self.lock:
+            return set(self.handles)
+
+    def request_measure(self):
+        """Measure the areas again, in the background."""
+        if self.measure_task:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Called from a job thread
+            return
+
+        def done(future):
+            self.measure_task = None
+
+        self.measure_task = loop.run_in_executor(None, self.measure, self.get_held())
+        self.measure_task.add_done_callback(done)
+
+    async def gc_loop(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, clean_old_tmp_dirs)
+        except Exception as e:
+            logging.error("Removing old temp dirs: {}".format(e))
+        gc_ts = 0
+        while True:
+            try:
+                if time.monotonic() - gc_ts >= GC_INTERVAL:
+                    gc_ts = time.monotonic()
+                    await loop.run_in_executor(None, self.gc, self.get_held())
+                else:
+                    await loop.run_in_executor(None, self.measure, self.get_held())
+            except Exception as e:
+                logging.error("Temp storage GC: {}".format(e))
+            await asyncio.sleep(MEASURE_INTERVAL)
+
+    # ---------------------------------------------------------------------------
+    # Status
+    # ---------------------------------------------------------------------------
+
+    def render(self):
+        """Return the temp storage usage in Prometheus text exposition format."""
+        areas = (self.disk, self.ram) if self.ram_available else (self.disk,)
+        lines = [
+            "# HELP webconf_tmp_bytes Temp storage used (reserved by handles & measured otherwise), by area.",
+            "# TYPE webconf_tmp_bytes gauge"
+        ]
+        for area in areas:
+            lines.append('webconf_tmp_bytes{{area="{}"}} {}'.format(area.name, area.reserved + area.untracked))
+        lines += [
+            "# HELP webconf_tmp_quota_bytes Temp storage quota, by area.",
+            "# TYPE webconf_tmp_quota_bytes gauge"
+        ]
+        for area in areas:
+            lines.append('webconf_tmp_quota_bytes{{area="{}"}} {}'.format(area.name, area.quota))
+        lines += [
+            "# HELP webconf_tmp_handles Live temp file handles, by area.",
+            "# TYPE webconf_tmp_handles gauge"
+        ]
+        for area in areas:
+            lines.append('webconf_tmp_handles{{area="{}"}} {}'.format(area.name, area.handles))
+        lines += [
+            "# HELP webconf_tmp_quota_errors_total Temp files refused for lack of room.",
+            "# TYPE webconf_tmp_quota_errors_total counter",
+            "webconf_tmp_quota_errors_total {}".format(self.disk.quota_errors),
+            "# HELP webconf_tmp_spilled_total Temp files moved from RAM to disk, as they outgrew their room.",
+            "# TYPE webconf_tmp_spilled_total counter",
+            "webconf_tmp_spilled_total {}".format(self.spilled),
+            "# HELP webconf_tmp_gc_removed_total Orphan temp files removed by the GC.",
+            "# TYPE webconf_tmp_gc_removed_total counter",
+            "webconf_tmp_gc_removed_total {}".format(self.gc_removed)
+        ]
+        return "\n".join(lines) + "\n"
+
+
+tmp_storage = TmpStorage()
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# File Transfer Worker Supervisor
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Runs the file transfer worker (see transfer_worker.py) on the port set by
+# ZYNTHIAN_WEBCONF_TRANSFER_PORT (disabled if unset or 0):
+#
+#  + The worker is restarted if it dies & stopped on shutdown.
+#  + Upload progress reported by the worker is forwarded to the page's
+#    upload progress websocket.
+#  + get_download_url() returns the worker URL (with a signed ticket) for
+#    sending a file, directory or list of files. Handlers redirect there, or
+#    send the file themselves if it returns None (worker disabled or not
+#    ready, HTTPS page: the worker serves plain HTTP only).
+# ------------------------------------------------------------------------------
+
+import os
+import sys
+import json
+import asyncio
+import logging
+from subprocess import PIPE
+from urllib.parse import quote
+
+from lib import command_runner
+from lib.upload_handler import send_upload_progress
+from lib.graceful_restart import graceful_restart
+from lib.job_executor import ROOT_DIR
+
+TICKET_NAME = "transfer"
+RESTART_DELAY = 5
+
+
+class TransferService:
+
+    def __init__(self, port=0):
+        self.port = port
+        self.app = None
+        self.process = None
+        self.ready = False
+        self.stopping = False
+        self.starts = 0
+
+    def is_enabled(self):
+        return self.port > 0
+
+    def start(self, app):
+        if not self.is_enabled():
+            return
+        self.app = app
+        command_runner.spawn(self.run())
+
+    async def run(self):
+        while not self.stopping:
+            try:
+                await self.run_worker()
+            except Exception as e:
+                logging.error("Transfer worker failed: {}".format(e))
+            self.ready = False
+            if not self.stopping:
+                logging.warning("Transfer worker exited. Restarting in {} seconds ...".format(RESTART_DELAY))
+                await asyncio.sleep(RESTART_DELAY)
+
+    async def run_worker(self):
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "lib.transfer_worker", str(self.port),
+            stdin=PIPE, stdout=PIPE, cwd=ROOT_DIR)
+        self.starts += 1
+        # stdin is kept open: the worker exits when it's closed (webconf is gone)
+        self.process.stdin.write((self.app.settings["cookie_secret"] + "\n").encode())
+        await self.process.stdin.drain()
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                break
+            self.on_worker_line(line.decode(errors="replace").split())
+        await self.process.wait()
+
+    def on_worker_line(self, fields):
+        if not fields:
+            return
+        if fields[0] == "ready":
+            self.ready = True
+            logging.info("Transfer worker listening on port {}".format(self.port))
+        elif fields[0] == "progress" and len(fields) == 3:
+            progress_handler = self.app.settings['upload_progress_handler'].get(fields[1])
+            if progress_handler:
+                send_upload_progress(progress_handler, fields[2])
+
+    async def stop(self):
+        self.stopping = True
+        process = self.process
+        if process and process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), 5)
+            except asyncio.TimeoutError:
+                process.kill()
+
+    # ---------------------------------------------------------------------------
+    # URLs
+    # ---------------------------------------------------------------------------
+
+    def get_base_url(self, handler):
+        """Worker URL for the handler's request, or None if it can't be used."""
+        if not self.ready or handler.request.protocol != "http":
+            return None
+        return "http://{}:{}".format(handler.request.host_name, self.port)
+
+    def get_download_url(self, handler, paths, name=None):
+        """
+        Worker URL for downloading paths: a file, a directory (zipped) or a list
+        of files (zipped). name is the downloaded file name. None if the worker
+        can't be used.
+        """
+        base_url = self.get_base_url(handler)
+        if not base_url:
+            return None
+        if not name:
+            name = os.path.basename(paths) if isinstance(paths, str) else "download"
+            if not (isinstance(paths, str) and os.path.isfile(paths)):
+                name += ".zip"
+        ticket = handler.create_signed_value(TICKET_NAME, json.dumps({'paths': paths, 'name': name}))
+        return "{}/download?t={}".format(base_url, quote(ticket.decode(), safe=""))
+
+
+transfer_service = TransferService(int(os.environ.get('ZYNTHIAN_WEBCONF_TRANSFER_PORT', "0") or 0))
+graceful_restart.add_shutdown_callback(transfer_service.stop)
+
+# ------------------------------------------------------------------------------
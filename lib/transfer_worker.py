@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# File Transfer Worker Process
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# Serves the big uploads & downloads on its own port, so multipart parsing,
+# zipping & streaming don't load webconf's event loop. Started & supervised
+# by transfer_service.py:
+#
+#   python3 -m lib.transfer_worker <port>
+#
+#  + The cookie secret is read from stdin (first line). When stdin is closed
+#    (webconf is gone), the worker exits.
+#  + Requests are authenticated with webconf's "user" secure cookie (same
+#    host => same cookies, whatever the port).
+#  + Downloads need a ticket, signed by webconf with the cookie secret, with
+#    the files to send. Directories & lists of files are zipped on the fly.
+#  + Upload progress is written to stdout ("progress <client id> <percent>"),
+#    so webconf can forward it to the page's websocket.
+# ------------------------------------------------------------------------------
+
+import io
+import os
+import sys
+import json
+import asyncio
+import logging
+import zipfile
+import mimetypes
+from urllib.parse import urlparse
+
+import tornado.web
+import tornado.httpserver
+
+from lib.body_limit import BodyLimitApplication
+from lib.upload_handler import UploadHandler, UploadPostDataStreamer, MAX_STREAMED_SIZE
+from lib.job_workers import lower_priority
+from lib.job_executor import PRIORITIES, get_env_cpus
+
+TICKET_NAME = "transfer"
+# One hour
+TICKET_MAX_AGE_DAYS = 1 / 24
+CHUNK_SIZE = 64 * 1024
+
+
+def report(*fields):
+    """Send a line to webconf."""
+    sys.stdout.write(" ".join(str(field) for field in fields) + "\n")
+    sys.stdout.flush()
+
+# ------------------------------------------------------------------------------
+# Streamed zip
+# ------------------------------------------------------------------------------
+
+
+class ZipStream(io.RawIOBase):
+    """Non seekable file for zipfile, keeping the written data until it's popped."""
+
+    def __init__(self):
+        self.chunks = []
+        self.pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.pos
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def get_zip_entries(paths):
+    """(path, arcname) of the files to zip: a directory's tree, relative to it, or a list of files."""
+    if isinstance(paths, str):
+        entries = []
+        for dirname, subdirs, files in os.walk(paths):
+            subdirs.sort()
+            if dirname != paths:
+                entries.append((dirname, os.path.relpath(dirname, paths)))
+            for fname in sorted(files):
+                fpath = os.path.join(dirname, fname)
+                entries.append((fpath, os.path.relpath(fpath, paths)))
+        return entries
+    return [(fpath, os.path.basename(fpath)) for fpath in paths]
+
+# ------------------------------------------------------------------------------
+# Handlers
+# ------------------------------------------------------------------------------
+
+
+class TransferHandlerMixin:
+
+    def get_current_user(self):
+        return self.get_secure_cookie("user", max_age_days=5200)
+
+    def set_default_headers(self):
+        # The pages come from webconf's port: allow them to read the responses
+        origin = self.request.headers.get("Origin")
+        if origin and urlparse(origin).hostname == self.request.host_name:
+            self.set_header("Access-Control-Allow-Origin", origin)
+            self.set_header("Access-Control-Allow-Credentials", "true")
+            self.set_header("Vary", "Origin")
+
+    def check_user(self):
+        if not self.current_user:
+            raise tornado.web.HTTPError(403)
+
+
+class ReportingUploadStreamer(UploadPostDataStreamer):
+
+    def __init__(self, client_id, destinationPath, total):
+        self.client_id = client_id
+        super().__init__(None, destinationPath, total)
+
+    def send_progress(self, percent):
+        report("progress", self.client_id, percent)
+
+
+@tornado.web.stream_request_body
+class TransferUploadHandler(TransferHandlerMixin, UploadHandler):
+
+    def prepare(self):
+        self.check_user()
+        super().prepare()
+
+    def create_streamer(self, client_id, destinationPath, total):
+        return ReportingUploadStreamer(client_id, destinationPath, total)
+
+
+class TransferDownloadHandler(TransferHandlerMixin, tornado.web.RequestHandler):
+
+    def prepare(self):
+        self.check_user()
+
+    async def get(self):
+        ticket = self.get_signed_cookie_value(self.get_argument("t"))
+        paths = ticket['paths']
+        fname = ticket['name']
+        self.set_header("Content-Description", "File Transfer")
+        self.set_header('Content-Disposition', 'attachment; filename="{}"'.format(fname))
+        if isinstance(paths, str) and os.path.isfile(paths):
+            await self.send_file(paths, fname)
+        else:
+            await self.send_zip(get_zip_entries(paths))
+
+    def get_signed_cookie_value(self, ticket):
+        value = tornado.web.decode_signed_value(self.application.settings["cookie_secret"], TICKET_NAME,
+                                                ticket, max_age_days=TICKET_MAX_AGE_DAYS)
+        if not value:
+            raise tornado.web.HTTPError(403, "Bad or expired download ticket")
+        return json.loads(value)
+
+    async def send_file(self, fpath, fname):
+        self.set_header('Content-Type', mimetypes.guess_type(fname)[0] or "application/octet-stream")
+        self.set_header('Content-Length', os.path.getsize(fpath))
+        with open(fpath, 'rb') as f:
+            while True:
+                data = f.read(CHUNK_SIZE)
+                if not data:
+                    break
+                self.write(data)
+                await self.flush()
+
+    async def send_zip(self, entries):
+        self.set_header('Content-Type', "application/zip")
+        stream = ZipStream()
+        with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as zf:
+            for fpath, arcname in entries:
+                zinfo = zipfile.ZipInfo.from_file(fpath, arcname)
+                if zinfo.is_dir():
+                    zf.writestr(zinfo, b"")
+                    continue
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+                with open(fpath, 'rb') as src, zf.open(zinfo, 'w') as dst:
+                    while True:
+                        data = src.read(CHUNK_SIZE)
+                        if not data:
+                            break
+                        dst.write(data)
+                        self.write(stream.pop())
+                        await self.flush()
+        self.write(stream.pop())
+
+# ------------------------------------------------------------------------------
+# Main
+# ------------------------------------------------------------------------------
+
+
+def make_app(cookie_secret):
+    return BodyLimitApplication([
+        (r"/upload$", TransferUploadHandler),
+        (r"/download$", TransferDownloadHandler)
+    ], cookie_secret=cookie_secret, upload_progress_handler={})
+
+
+async def amain(port, cookie_secret):
+    lower_priority(*PRIORITIES["low"], get_env_cpus())
+    server = tornado.httpserver.HTTPServer(make_app(cookie_secret), max_body_size=MAX_STREAMED_SIZE)
+    server.listen(port)
+    done = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    def on_stdin():
+        # Only EOF is expected
+        if not os.read(sys.stdin.fileno(), 1024):
+            done.set()
+
+    loop.add_reader(sys.stdin.fileno(), on_stdin)
+    report("ready", port)
+    await done.wait()
+    logging.info("Webconf is gone. Transfer worker exiting.")
+
+
+def main(argv):
+    logging.basicConfig(format='%(levelname)s:transfer_worker: %(message)s', stream=sys.stderr,
+                        level=int(os.environ.get('ZYNTHIAN_WEBCONF_LOG_LEVEL') or logging.WARNING))
+    cookie_secret = sys.stdin.readline().strip()
+    asyncio.run(amain(int(argv[1]), cookie_secret))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
+
+# ------------------------------------------------------------------------------
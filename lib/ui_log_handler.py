@@ -24,15 +24,15 @@
 
 
 import logging
-import time
 import asyncio
 import subprocess
 import jsonpickle
 import tornado.web
 from collections import OrderedDict
 from multiprocessing import Queue
-from subprocess import check_output
+from lib import command_runner
 from lib.tail_thread import TailThread, AsynchronousFileReader
+from lib.service_monitor import service_monitor
 
 from lib.zynthian_config_handler import ZynthianBasicHandler
 from lib.zynthian_websocket_handler import ZynthianWebSocketMessageHandler, ZynthianWebSocketMessage
@@ -75,17 +75,17 @@ class UiTailThread(TailThread):
 
         while self.is_running and (not stdout_reader.eof() or not stderr_reader.eof()):
             while self.is_running and not stdout_queue.empty() and not stdout_reader.eof():
-                line = stdout_queue.get()
-                logging.info("stdout: %s" % line.decode())
+                line = stdout_queue.get().decode()
+                logging.debug("stdout: %s", line)
                 message = ZynthianWebSocketMessage(
-                    'UiLogMessageHandler', line.decode())
+                    'UiLogMessageHandler', line)
                 self.websocket.write_message(jsonpickle.encode(message))
 
             while self.is_running and not stderr_queue.empty() and not stderr_reader.eof():
-                line = stderr_queue.get()
-                logging.info("stderr: %s" % line.decode())
+                line = stderr_queue.get().decode()
+                logging.debug("stderr: %s", line)
                 message = ZynthianWebSocketMessage(
-                    'UiLogMessageHandler', line.decode())
+                    'UiLogMessageHandler', line)
                 self.websocket.write_message(jsonpickle.encode(message))
 
         stdout_reader.join()
@@ -113,29 +113,36 @@ class UiLogMessageHandler(ZynthianWebSocketMessageHandler):
             self.websocket, loop, self.get_process_command(debug_level))
         UiLogMessageHandler.logging_thread.start()
 
-    def toggle_service(self, running_service, next_service):
-        check_output("(systemctl stop %s)&" % running_service, shell=True)
+    @staticmethod
+    async def systemctl(action, service):
+        # Bounded by the unit's start/stop timeouts => no timeout here
+        returncode, output = await command_runner.run("systemctl %s %s" % (action, service),
+                                                      stderr=subprocess.STDOUT)
+        if returncode:
+            logging.error("Can't %s %s: %s" % (action, service, output.decode("utf-8", "ignore").strip()))
+
+    async def toggle_service(self, running_service, next_service):
+        await self.systemctl("stop", running_service)
 
         is_active = True
         max_trials = 20
         while is_active and max_trials > 0:
             logging.info("getting status of %s" % running_service)
-            try:
-                check_output("systemctl status %s" %
-                             running_service, shell=True)
-            except subprocess.CalledProcessError as e:
-                for byte_line in e.output.splitlines():
+            returncode, output = await command_runner.run("systemctl status %s" % running_service, timeout=command_runner.SHORT_TIMEOUT)
+            if returncode:
+                for byte_line in output.splitlines():
                     line = byte_line.decode("utf-8")
                     logging.info(line)
                     if "Active:" in line and ("inactive" in line or "inactive" in line):
                         is_active = False
 
-            time.sleep(1)
+            await asyncio.sleep(1)
             max_trials -= 1
 
-        check_output("(systemctl start %s)&" % next_service, shell=True)
+        await self.systemctl("start", next_service)
+        service_monitor.invalidate()
 
-    def do_start_debug_logging(self):
+    async def do_start_debug_logging(self):
         logging.info("start debug logging")
         message = ZynthianWebSocketMessage(
             'UiLogMessageHandler', 'Restarting UI in debug mode')
@@ -143,11 +150,11 @@ class UiLogMessageHandler(ZynthianWebSocketMessageHandler):
         if UiLogMessageHandler.logging_thread:
             UiLogMessageHandler.logging_thread.stop()
 
-        self.toggle_service("zynthian", "zynthian_debug")
+        await self.toggle_service("zynthian", "zynthian_debug")
 
         self.spawn_tail_thread(True)
 
-    def do_stop_debug_logging(self):
+    async def do_stop_debug_logging(self):
         logging.info("stop debug logging")
         message = ZynthianWebSocketMessage(
             'UiLogMessageHandler', 'Restarting UI in normal mode')
@@ -155,16 +162,16 @@ class UiLogMessageHandler(ZynthianWebSocketMessageHandler):
         if UiLogMessageHandler.logging_thread:
             UiLogMessageHandler.logging_thread.stop()
 
-        self.toggle_service("zynthian_debug", "zynthian")
+        await self.toggle_service("zynthian_debug", "zynthian")
 
         self.spawn_tail_thread(False)
 
-    def on_websocket_message(self, action):
+    async def on_websocket_message(self, action):
         logging.debug("action: %s " % action)
         if action == 'SHOW_DEBUG_LOGGING':
-            self.do_start_debug_logging()
+            await self.do_start_debug_logging()
         elif action == 'HIDE_DEBUG_LOGGING':
-            self.do_stop_debug_logging()
+            await self.do_stop_debug_logging()
         elif action == 'SHOW_DEFAULT':
             if UiLogMessageHandler.logging_thread:
                 UiLogMessageHandler.logging_thread.stop()
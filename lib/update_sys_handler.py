@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# System Config Update Status Handler
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+import tornado.web
+
+from lib.config_writer import config_writer
+from lib.zynthian_config_handler import ZynthianBasicHandler
+
+# ------------------------------------------------------------------------------
+# update_sys Status Handler (polled by the pages while it's running)
+# ------------------------------------------------------------------------------
+
+
+class UpdateSysStatusHandler(ZynthianBasicHandler):
+
+    profiling_allowed = False
+
+    @tornado.web.authenticated
+    def get(self):
+        self.set_header("Cache-Control", "no-store")
+        self.write_json(config_writer.get_status())
+
+# ------------------------------------------------------------------------------
@@ -29,23 +29,30 @@ import jsonpickle
 import tornado.websocket
 from tornadostreamform.multipart_streamer import MultiPartStreamer, TemporaryFileStreamedPart
 
+from lib.tmp_storage import TMP_DIR, TmpQuotaError, tmp_storage
 from lib.zynthian_websocket_handler import ZynthianWebSocketMessageHandler, ZynthianWebSocketMessage
 
 # ------------------------------------------------------------------------------
 # Upload Handling
 # ------------------------------------------------------------------------------
 
-TMP_DIR = "/zynthian/zynthian-webconf/tmp"
-if os.path.isdir(TMP_DIR):
-    shutil.rmtree(TMP_DIR, ignore_errors=True)
-os.mkdir(TMP_DIR)
-
 MB = 1024 * 1024
 GB = 1024 * MB
 TB = 1024 * GB
 MAX_STREAMED_SIZE = 1*TB
 
 
+def send_upload_progress(progress_handler, percent):
+    try:
+        message = ZynthianWebSocketMessage(
+            'UploadProgressHandler', str(percent))
+        progress_handler.websocket.write_message(
+            jsonpickle.encode(message))
+    except:
+        logging.warning(
+            f"Can't send upload progress to websocket: {percent}")
+
+
 class UploadStreamPart(TemporaryFileStreamedPart):
 
     def move(self, file_path):
@@ -79,17 +86,12 @@ class UploadPostDataStreamer(MultiPartStreamer):
             new_percent = received*100//total
             if new_percent != self.percent:
                 self.percent = new_percent
-                logging.debug(
-                    f"Upload progress: {new_percent}, received: {received}, total: {total}")
-                if self.webSocketHandler:
-                    try:
-                        message = ZynthianWebSocketMessage(
-                            'UploadProgressHandler', str(new_percent))
-                        self.webSocketHandler.websocket.write_message(
-                            jsonpickle.encode(message))
-                    except:
-                        logging.warning(
-                            f"Can't send upload progress to websocket: {new_percent}")
+                logging.debug("Upload progress: %s, received: %s, total: %s", new_percent, received, total)
+                self.send_progress(new_percent)
+
+    def send_progress(self, percent):
+        if self.webSocketHandler:
+            send_upload_progress(self.webSocketHandler, percent)
 
     def examine(self):
         print("============= structure =============")
@@ -144,6 +146,9 @@ class UploadProgressHandler(ZynthianWebSocketMessageHandler):
 @tornado.web.stream_request_body
 class UploadHandler(tornado.web.RequestHandler):
 
+    # Streamed to disk
+    max_body_size = MAX_STREAMED_SIZE
+
     def get_current_user(self):
         return self.get_secure_cookie("user")
 
@@ -180,12 +185,15 @@ class UploadHandler(tornado.web.RequestHandler):
             self.finish
 
     def prepare(self):
+        # Refused before receiving anything
+        try:
+            tmp_storage.check_upload(int(self.request.headers.get("Content-Length", "0")))
+        except TmpQuotaError as e:
+            raise tornado.web.HTTPError(507, str(e))
+        except ValueError:
+            pass
         destinationPath = None
         try:
-            global MAX_STREAMED_SIZE
-            if self.request.method.lower() == "post":
-                self.request.connection.set_max_body_size(MAX_STREAMED_SIZE)
-
             total = int(self.request.headers.get("Content-Length", "0"))
             client_id = self.get_argument("clientId")
             destinationPath = self.get_argument("destinationPath", TMP_DIR)
@@ -194,10 +202,13 @@ class UploadHandler(tornado.web.RequestHandler):
             total = 0
             client_id = '1'
 
+        self.ps = self.create_streamer(client_id, destinationPath, total)
+
+    def create_streamer(self, client_id, destinationPath, total):
         upload_progress_handler = None
         if client_id in self.application.settings['upload_progress_handler']:
             upload_progress_handler = self.application.settings['upload_progress_handler'][client_id]
-        self.ps = UploadPostDataStreamer(
+        return UploadPostDataStreamer(
             upload_progress_handler,  destinationPath, total)
 
     def data_received(self, chunk):
@@ -55,7 +55,7 @@ class WifiConfigHandler(ZynthianBasicHandler):
             'ZYNTHIAN_WIFI_NETWORKS': networks
         }
         if 'X-Requested-With' in self.request.headers and self.request.headers['X-Requested-With'] == 'XMLHttpRequest':
-            self.write(config)
+            self.write_json(config)
         else:
             super().get("wifi.html", "Wifi", config, errors)
 
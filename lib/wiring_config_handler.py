@@ -24,14 +24,16 @@
 
 import os
 import re
+import asyncio
 import logging
 import tornado.web
-from subprocess import check_output
 
 from zyngui.zynthian_gui import zynthian_gui
 from zynconf import CustomSwitchActionType, ZynSensorActionType
 
+from lib import command_runner
 from lib.dashboard_handler import DashboardHandler
+from lib.fs_watcher import fs_watcher
 from lib.zynthian_config_handler import ZynthianConfigHandler
 
 
@@ -40,15 +42,20 @@ from lib.zynthian_config_handler import ZynthianConfigHandler
 # ------------------------------------------------------------------------------
 
 
+# Set on the presets below by WiringConfigHandler.detect_i2c_chips(), from the
+# first request, so i2cdetect doesn't block the loop when importing this module.
 ADS1115_I2C_ADDRESS = ""
 MCP4728_I2C_ADDRESS = ""
 
-for i2chip in DashboardHandler.get_i2c_chips():
-    parts = i2chip.split('@')
-    if parts[0] == 'ADS1115':
-        ADS1115_I2C_ADDRESS = parts[1]
-    elif parts[0] == 'MCP4728':
-        MCP4728_I2C_ADDRESS = parts[1]
+# Presets using the autodetected I2C addresses
+I2C_AUTODETECT_PRESETS = (
+    "V5_ZYNFACE",
+    "MCP23017_Zynaptik-3_Zynface",
+    "MCP23017_Zynaptik-3",
+    "MCP23017_ZynScreen_Zynface",
+    "MCP23017_ZynScreen_Zynaptik",
+    "CUSTOM"
+)
 
 # ------------------------------------------------------------------------------
 # Wiring Configuration
@@ -59,6 +66,9 @@ class WiringConfigHandler(ZynthianConfigHandler):
     PROFILES_DIRECTORY = "{}/wiring-profiles".format(
         os.environ.get("ZYNTHIAN_CONFIG_DIR"))
 
+    # (profiles dir version, parsed custom profiles)
+    custom_profiles_cache = None
+
     wiring_presets = {
         "MINI_V2": {
             'ZYNTHIAN_WIRING_ENCODER_A': "",
@@ -385,8 +395,31 @@ class WiringConfigHandler(ZynthianConfigHandler):
             cuia_param = ""
         return cuia_name, cuia_param
 
-    def prepare(self):
+    i2c_detection = None
+
+    @classmethod
+    async def detect_i2c_chips(cls):
+        """Set the autodetected I2C addresses on the presets. Detected once."""
+        if cls.i2c_detection is None:
+            cls.i2c_detection = asyncio.ensure_future(cls.run_i2c_detection())
+        await asyncio.shield(cls.i2c_detection)
+
+    @classmethod
+    async def run_i2c_detection(cls):
+        addresses = {}
+        try:
+            for i2chip in await DashboardHandler.get_i2c_chips():
+                parts = i2chip.split('@')
+                if parts[0] in ('ADS1115', 'MCP4728'):
+                    addresses['ZYNTHIAN_WIRING_ZYNAPTIK_{}_I2C_ADDRESS'.format(parts[0])] = parts[1]
+        except Exception as e:
+            logging.error("Can't detect I2C chips: {}".format(e))
+        for name in I2C_AUTODETECT_PRESETS:
+            cls.wiring_presets[name].update(addresses)
+
+    async def prepare(self):
         super().prepare()
+        await self.detect_i2c_chips()
         self.current_custom_profile = os.environ.get(
             'ZYNTHIAN_WIRING_LAYOUT_CUSTOM_PROFILE', "")
         self.load_custom_profiles()
@@ -1076,7 +1109,7 @@ class WiringConfigHandler(ZynthianConfigHandler):
         super().get("Wiring", config, errors)
 
     @tornado.web.authenticated
-    def post(self):
+    async def post(self):
         command = self.get_argument('_command', '')
         logging.info("COMMAND = {}".format(command))
         self.request_data = self.get_request_data()
@@ -1112,7 +1145,7 @@ class WiringConfigHandler(ZynthianConfigHandler):
                 iter(self.custom_profiles.items()))[0]
             self.config_env(self.request_data)
         else:
-            errors = self.update_config(self.request_data)
+            errors = await self.update_config(self.request_data)
 
         self.get(errors)
 
@@ -1134,7 +1167,7 @@ class WiringConfigHandler(ZynthianConfigHandler):
                     logging.error(e)
         return data
 
-    def update_config(self, data):
+    async def update_config(self, data):
         # Check if restarting UI is needed
         ignore_varnames = [
             "LAYOUT_CUSTOM_PROFILE",
@@ -1161,7 +1194,7 @@ class WiringConfigHandler(ZynthianConfigHandler):
         errors = super().update_config(data)
 
         if self.restart_ui_flag:
-            self.rebuild_zyncoder()
+            await self.rebuild_zyncoder()
         else:
             self.reload_wiring_layout_flag = True
 
@@ -1277,6 +1310,12 @@ class WiringConfigHandler(ZynthianConfigHandler):
     # Load custom profiles
 
     def load_custom_profiles(self):
+        # Parsed profiles are kept until the profiles directory changes
+        version = fs_watcher.get_version(self.PROFILES_DIRECTORY)
+        cached = WiringConfigHandler.custom_profiles_cache
+        if cached and cached[0] == version:
+            self.custom_profiles = dict(cached[1])
+            return
         self.custom_profiles = {}
         p = re.compile("(\w*)=\"(.*)\"")
 
@@ -1309,6 +1348,7 @@ class WiringConfigHandler(ZynthianConfigHandler):
             except Exception as e:
                 logging.warning(
                     "Invalid wiring custom profile '{}' will be ignored: {}".format(fpath, e))
+        WiringConfigHandler.custom_profiles_cache = (version, dict(self.custom_profiles))
 
     def save_custom_profile(self, fname, data):
         try:
@@ -1332,11 +1372,11 @@ class WiringConfigHandler(ZynthianConfigHandler):
                 "Can't delete wiring custom profile '{}': {}".format(fpath, e))
 
     @classmethod
-    def rebuild_zyncoder(cls):
+    async def rebuild_zyncoder(cls):
         try:
             cmd = "cd %s/zyncoder/build;cmake ..;make" % os.environ.get(
                 'ZYNTHIAN_DIR')
-            check_output(cmd, shell=True)
+            await command_runner.check_output(cmd)
         except Exception as e:
             logging.error("Rebuilding Zyncoder Library: %s" % e)
 
@@ -23,24 +23,38 @@
 # ********************************************************************
 
 import os
-import liblo
+import gzip
+import asyncio
+import hashlib
 import logging
 import tornado.web
-from time import sleep
-from subprocess import check_output
+import tornado.escape
+from pathlib import Path
 
 import zynconf
-import zyngine.zynthian_lv2 as zynthian_lv2
+
+from lib import command_runner
+from lib.osc_bridge import osc_bridge
+from lib.config_cache import config_cache
+from lib.config_writer import config_writer
+from lib.menu_context import menu_context
+from lib.transfer_service import transfer_service
+from lib.engine_registry import engine_registry
+from lib.service_monitor import service_monitor
+from lib.request_profiler import request_profiler
+from lib.graceful_restart import graceful_restart
+from lib.perf_metrics import perf_metrics, current_timer, RequestTimer
 
 # Avoid unwanted debug messages from zynconf module
 zynconf_logger = logging.getLogger('zynconf')
 zynconf_logger.setLevel(logging.INFO)
 
 # ------------------------------------------------------------------------------
-# Zynthian-UI OSC Address
+# JSON responses smaller than a TCP segment are not worth compressing
 # ------------------------------------------------------------------------------
 
-zynthian_ui_osc_addr = liblo.Address('localhost', 1370, liblo.UDP)
+JSON_GZIP_MIN_SIZE = 1400
+JSON_GZIP_LEVEL = 6
 
 # ------------------------------------------------------------------------------
 # Zynthian Basic Handler
@@ -60,15 +74,22 @@ class ZynthianBasicHandler(tornado.web.RequestHandler):
     restart_webconf_flag_fpath = "/tmp/zynthian_restart_webconf"
     reboot_flag_fpath = "/tmp/zynthian_reboot"
 
+    timer = None
+    profile = None
+    # Profiling pages don't profile themselves
+    profiling_allowed = True
+
     def get_current_user(self):
         return self.get_secure_cookie("user", max_age_days=5200)
 
     def prepare(self):
-        zynconf.load_config()
-        zynconf.load_midi_config()
+        self.start_profile()
+        self.start_timer()
 
-        zynthian_lv2.load_engines()
-        # zynthian_lv2.sanitize_engines()
+        with self.timer.phase("config"):
+            config_cache.load()
+        with self.timer.phase("engines"):
+            engine_registry.refresh()
 
         self.read_reboot_flag()
         self.genjson = False
@@ -78,50 +99,118 @@ class ZynthianBasicHandler(tornado.web.RequestHandler):
         except:
             pass
 
-        # Send NOP CUIA to wake-up zynthian
-        liblo.send(zynthian_ui_osc_addr, "/CUIA/NOP")
+        # Send NOP CUIA to wake-up zynthian (rate limited)
+        osc_bridge.wake_up()
 
     def on_finish(self):
+        self.stop_timer()
+        self.stop_profile()
         if self.restart_webconf_flag:
-            self.restart_webconf()
+            command_runner.spawn(self.restart_webconf())
+
+    # ---------------------------------------------------------------------------
+    # Timing instrumentation
+    # ---------------------------------------------------------------------------
+
+    def start_timer(self):
+        self.timer = RequestTimer(type(self).__name__)
+        self.timer_token = current_timer.set(self.timer)
+
+    def stop_timer(self):
+        if self.timer:
+            self.timer.observe()
+            perf_metrics.count_request(self.timer.route, self.request.method, self.get_status())
+            try:
+                current_timer.reset(self.timer_token)
+            except ValueError:
+                # Finished from a different context
+                current_timer.set(None)
+            self.timer = None
+
+    def start_profile(self):
+        if not self.profiling_allowed:
+            return
+        if request_profiler.enabled or self.get_query_argument("_profile", "0") not in ("", "0"):
+            # Only for logged users
+            if self.current_user:
+                self.profile = request_profiler.start(self)
+                if self.profile:
+                    self.set_header("X-Webconf-Profile", "/sys-profiles/{}".format(self.profile.id))
+
+    def stop_profile(self):
+        if self.profile:
+            request_profiler.stop(self.profile, self.get_status())
+            self.profile = None
+
+    def timed(self, phase):
+        """Context manager accounting a block of code to a request phase."""
+        return self.timer.phase(phase)
+
+    def flush(self, include_footers=False):
+        # Headers go out with the first flush, so add the phase timings here
+        if self.timer and not self.timer.header_sent:
+            self.timer.header_sent = True
+            self.set_header("Server-Timing", self.timer.server_timing())
+        return super().flush(include_footers)
+
+    def render_string(self, template_name, **kwargs):
+        if self.timer:
+            with self.timer.phase("render"):
+                return super().render_string(template_name, **kwargs)
+        return super().render_string(template_name, **kwargs)
+
+    # ---------------------------------------------------------------------------
+    # JSON responses
+    # ---------------------------------------------------------------------------
+
+    def accepts_gzip(self):
+        return "gzip" in self.request.headers.get("Accept-Encoding", "")
+
+    def write_json(self, data):
+        """Write data as JSON, gzipped if it's big & the client accepts it."""
+        chunk = tornado.escape.utf8(tornado.escape.json_encode(data))
+        self.set_header("Content-Type", "application/json; charset=UTF-8")
+        self.set_header("Vary", "Accept-Encoding")
+        if len(chunk) >= JSON_GZIP_MIN_SIZE and self.accepts_gzip():
+            # mtime=0 => same data, same bytes (and same default ETag)
+            chunk = gzip.compress(chunk, compresslevel=JSON_GZIP_LEVEL, mtime=0)
+            self.set_header("Content-Encoding", "gzip")
+        self.write(chunk)
+
+    def check_data_version(self, *version):
+        """
+        Set a strong ETag for a GET response from the version of the data it's
+        built from (plus the route & query arguments), so it can be checked
+        before building the response. Returns True if the client has it
+        already: the handler must return without writing, a 304 is sent.
+        """
+        if self.request.method not in ("GET", "HEAD"):
+            return False
+        # gzip & identity bodies are different representations => different strong ETags
+        key = (type(self).__name__, self.request.path, sorted(self.request.query_arguments.items()), version,
+               self.accepts_gzip())
+        self.set_header("Etag", '"{}"'.format(hashlib.sha1(repr(key).encode()).hexdigest()))
+        # Cacheable, but revalidated on every use
+        self.set_header("Cache-Control", "no-cache")
+        if self.check_etag_header():
+            self.set_status(304)
+            return True
+        return False
 
     def render(self, tpl, **kwargs):
-        info = {
-            'host_name': self.request.host,
-            'reboot_flag': self.reboot_flag
-        }
-
-        # Check enabled engines
-        try:
-            if zynthian_lv2.engines["JV/Osirus"]["ENABLED"] or zynthian_lv2.engines["JV/OsTIrus"]["ENABLED"]:
-                info["sw-dsp56300"] = True
-            else:
-                info["sw-dsp56300"] = False
-        except:
-            info["sw-dsp56300"] = False
-
-        try:
-            if zynthian_lv2.engines["PT"]["ENABLED"]:
-                info["sw-pianoteq"] = True
-            else:
-                info["sw-pianoteq"] = False
-        except:
-            info["sw-pianoteq"] = False
-
-        # If MOD-UI is enabled, add access URI to info
-        if self.is_service_active("mod-ui"):
-            info['modui_uri'] = "http://{}:8888".format(self.request.host)
-
-        # If VNC Server is enabled, add access URI to info
-        if self.is_service_active("novnc0"):
-            info['novnc0_uri'] = "http://{}:6080/vnc.html".format(self.request.host)
-        if self.is_service_active("novnc1"):
-            info['novnc1_uri'] = "http://{}:6081/vnc.html".format(self.request.host)
+        # Menu info & menu are cached, until the engines or the services change
+        menu_info = menu_context.get_info(self.request.host)
+        info = dict(menu_info)
+        info['host_name'] = self.request.host
+        info['reboot_flag'] = self.reboot_flag
+        info['update_sys'] = config_writer.get_status()
+        info['transfer_url'] = transfer_service.get_base_url(self)
 
         # Restore scroll position
         info['scrollTop'] = int(float(self.get_argument('_scrollTop', '0')))
 
-        super().render(tpl, info=info, **kwargs)
+        menu_html = menu_context.get_fragment(self, menu_info) if self.current_user else ""
+        super().render(tpl, info=info, menu_html=menu_html, **kwargs)
 
     @tornado.web.authenticated
     def get(self, body, title, config, errors=None):
@@ -131,7 +220,7 @@ class ZynthianBasicHandler(tornado.web.RequestHandler):
             self.persist_reboot_flag()
 
         if self.restart_ui_flag:
-            self.restart_ui()
+            command_runner.spawn(self.restart_ui())
         else:
             if self.reload_wiring_layout_flag:
                 self.reload_wiring_layout()
@@ -143,81 +232,84 @@ class ZynthianBasicHandler(tornado.web.RequestHandler):
                 self.reload_key_binding()
 
         if self.genjson:
-            self.write(config)
+            self.write_json(config)
         else:
             self.render("config.html", body=body, config=config, title=title, errors=errors)
 
     def is_service_active(self, service):
-        return zynconf.is_service_active(service)
+        return service_monitor.is_active(service)
 
-    def power_off(self):
+    async def power_off(self):
         try:
             if self.is_service_active("zynthian"):
-                liblo.send(zynthian_ui_osc_addr, "/CUIA/POWER_OFF", ("s", "CONFIRM"))
-                sleep(5)
-            check_output("killall -SIGQUIT zynthian_gui.py; sleep 5; poweroff", shell=True)
+                osc_bridge.send("/CUIA/POWER_OFF", ("s", "CONFIRM"))
+                await asyncio.sleep(5)
+            await command_runner.check_output("killall -SIGQUIT zynthian_gui.py; sleep 5; poweroff")
         except Exception as e:
             logging.error("Power Off: {}".format(e))
 
-    def reboot(self):
+    async def reboot(self):
         try:
             self.reboot_flag = False
             if os.path.isfile(self.reboot_flag_fpath):
                 os.remove(self.reboot_flag_fpath)
             if self.is_service_active("zynthian"):
-                liblo.send(zynthian_ui_osc_addr, "/CUIA/REBOOT", ("s", "CONFIRM"))
-                sleep(5)
-            check_output("killall -SIGINT zynthian_gui.py; sleep 5; reboot", shell=True)
+                osc_bridge.send("/CUIA/REBOOT", ("s", "CONFIRM"))
+                await asyncio.sleep(5)
+            await command_runner.check_output("killall -SIGINT zynthian_gui.py; sleep 5; reboot")
         except Exception as e:
             logging.error("Reboot: {}".format(e))
 
-    def restart_ui(self):
+    async def restart_ui(self):
         try:
-            check_output("systemctl restart zynthian", shell=True)
             self.restart_ui_flag = False
+            # The UI must start with the system config regenerated by the deferred update_sys
+            await config_writer.wait_update_sys()
+            await command_runner.check_output("systemctl restart zynthian")
+            service_monitor.invalidate()
             if os.path.isfile(self.restart_ui_flag_fpath):
                 os.remove(self.restart_ui_flag_fpath)
         except Exception as e:
             logging.error("Restarting UI: %s" % e)
 
-    def restart_webconf(self):
+    async def restart_webconf(self):
         try:
-            check_output("systemctl restart zynthian-webconf", shell=True)
             self.restart_webconf_flag = False
             if os.path.isfile(self.restart_webconf_flag_fpath):
                 os.remove(self.restart_webconf_flag_fpath)
+            if graceful_restart.is_serving():
+                # Keeps the listening sockets => no connection is refused
+                await graceful_restart.restart()
+            else:
+                await command_runner.check_output("systemctl restart zynthian-webconf")
         except Exception as e:
             logging.error("Restarting Webconf: %s" % e)
 
     def reload_wiring_layout(self):
-        liblo.send(zynthian_ui_osc_addr, "/CUIA/RELOAD_WIRING_LAYOUT")
+        osc_bridge.cuia("RELOAD_WIRING_LAYOUT")
         self.reload_wiring_layout_flag = False
 
     def reload_midi_config(self):
-        liblo.send(zynthian_ui_osc_addr, "/CUIA/RELOAD_MIDI_CONFIG")
+        osc_bridge.cuia("RELOAD_MIDI_CONFIG")
         self.reload_midi_config_flag = False
 
     def reload_key_binding(self):
-        liblo.send(zynthian_ui_osc_addr, "/CUIA/RELOAD_KEY_BINDING")
+        osc_bridge.cuia("RELOAD_KEY_BINDING")
         self.reload_key_binding_flag = False
 
     def persist_update_sys_flag(self):
-        check_output("touch /zynthian_update_sys", shell=True)
+        Path("/zynthian_update_sys").touch()
 
     def persist_reboot_flag(self):
-        check_output(f"touch {self.reboot_flag_fpath}", shell=True)
+        Path(self.reboot_flag_fpath).touch()
 
     def read_reboot_flag(self):
         self.reboot_flag = os.path.exists(self.reboot_flag_fpath)
 
     @classmethod
     def update_sys(cls):
-        try:
-            zynconf.update_sys()
-            if os.path.isfile("/zynthian_update_sys"):
-                os.remove("/zynthian_update_sys")
-        except Exception as e:
-            logging.error("Updating System Config: %s" % e)
+        # Deferred & coalesced => it doesn't block the loop
+        config_writer.request_update_sys()
 
 
 # ------------------------------------------------------------------------------
@@ -237,9 +329,12 @@ class ZynthianConfigHandler(ZynthianBasicHandler):
             if vn[0] != '_':
                 sconfig[vn] = config[vn][0]
 
-        zynconf.save_config(sconfig, updsys=True)
+        # Written once per transaction, if any
+        config_writer.save_config(sconfig, updsys=True)
 
     def config_env(self, config):
         for vn in config:
             if vn[0] != '_':
                 os.environ[vn] = config[vn][0]
+        # Environment doesn't match the config file anymore => reload on next request
+        config_cache.invalidate()
@@ -22,20 +22,59 @@
 #
 # ********************************************************************
 
+import sys
+import time
 import logging
+import importlib
 import asyncio
+import inspect
 import jsonpickle
 import tornado.websocket
 
+from lib import command_runner
+from lib.access_log import access_log
+from lib.graceful_restart import graceful_restart
+from lib.perf_metrics import perf_metrics
+
 # ------------------------------------------------------------------------------
 # Zynthian Websocket Handling
 # ------------------------------------------------------------------------------
 
 
+def observe_message(route, nbytes, ts, error=False):
+    dt = time.perf_counter() - ts
+    perf_metrics.observe(route, "message", dt)
+    access_log.log_message(route, nbytes, dt, error)
+
+
+async def observe_message_task(route, nbytes, result, ts):
+    error = True
+    try:
+        await result
+        error = False
+    finally:
+        observe_message(route, nbytes, ts, error)
+
+
+# Handler modules are loaded lazily, so the message handlers defined in a
+# module that wasn't imported yet are not subclasses yet either.
+MESSAGE_HANDLER_MODULES = {
+    'AudioConfigMessageHandler': "lib.audio_mixer_handler",
+    'UploadProgressHandler': "lib.upload_handler",
+    'MidiLogMessageHandler': "lib.midi_log_handler",
+    'UiLogMessageHandler': "lib.ui_log_handler",
+    'RestoreMessageHandler': "lib.system_backup_handler",
+    'SoftwareUpdateMessageHandler': "lib.software_update_handler"
+}
+
+
 def ZynthianWebSocketMessageHandlerFactory(handler_name, websocket):
     for cls in ZynthianWebSocketMessageHandler.__subclasses__():
         if cls.is_registered_for(handler_name):
             return cls(handler_name, websocket)
+    if handler_name in MESSAGE_HANDLER_MODULES and MESSAGE_HANDLER_MODULES[handler_name] not in sys.modules:
+        importlib.import_module(MESSAGE_HANDLER_MODULES[handler_name])
+        return ZynthianWebSocketMessageHandlerFactory(handler_name, websocket)
     raise ValueError
 
 
@@ -78,27 +117,54 @@ class ZynthianWebSocketMessage(object):
 
 
 class ZynthianWebSocketHandler(tornado.websocket.WebSocketHandler):
-    handlers = []
+    # Open websockets
+    connections = set()
+
+    def initialize(self):
+        # Message handlers of this connection, by name. One per name, reused for every message.
+        self.handlers = {}
 
     def check_origin(self, origin):
         return True
 
+    @classmethod
+    def close_all(cls):
+        """Close all the websockets as "going away", so the clients reconnect."""
+        for ws in list(cls.connections):
+            ws.close(1001, "Webconf is restarting")
+
     # the client connected
     def open(self):
         logging.info("New client connected to ZynthianWebSocketHandler")
+        self.connections.add(self)
 
     # the client sent the message
     def on_message(self, message):
         if message:
+            ts = time.perf_counter()
             decoded_message = jsonpickle.decode(message)
             logging.info("incoming ws message %s " % decoded_message)
-            handler = ZynthianWebSocketMessageHandlerFactory(
-                decoded_message['handler_name'], self)
-            handler.on_websocket_message(decoded_message['data'])
-            self.handlers.append(handler)
+            handler_name = decoded_message['handler_name']
+            handler = self.handlers.get(handler_name)
+            if handler is None:
+                handler = ZynthianWebSocketMessageHandlerFactory(handler_name, self)
+                self.handlers[handler_name] = handler
+            route = "ws:" + handler_name
+            result = handler.on_websocket_message(decoded_message['data'])
+            if inspect.isawaitable(result):
+                command_runner.spawn(observe_message_task(route, len(message), result, ts))
+            else:
+                observe_message(route, len(message), ts)
 
     # client disconnected
     def on_close(self):
         logging.info("Client disconnected")
-        for handler in self.handlers:
+        self.connections.discard(self)
+        for handler in self.handlers.values():
             handler.on_close()
+        self.handlers.clear()
+
+
+graceful_restart.add_shutdown_callback(ZynthianWebSocketHandler.close_all)
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# ********************************************************************
+# ZYNTHIAN PROJECT: Zynthian Web Configurator
+#
+# OSC Bridge Tests
+#
+# Copyright (C) 2024 Fernando Moyano <jofemodo@zynthian.org>
+#
+# ********************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ********************************************************************
+
+# ------------------------------------------------------------------------------
+# The bridge is driven against a local liblo.Server standing for zynthian-ui.
+# Without pyliblo (not a zynthian), the fake backend's liblo is used.
+#
+#   python3 -m unittest discover -s tests -t .
+# ------------------------------------------------------------------------------
+
+import sys
+import asyncio
+import unittest
+
+try:
+    import liblo
+except ImportError:
+    from lib.fake_backend import liblo
+    sys.modules['liblo'] = liblo
+
+from lib import osc_bridge as osc_bridge_module
+from lib.osc_bridge import OscBridge
+
+
+class UiStandIn:
+    """OSC server receiving the bridge messages, as zynthian-ui does."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.messages = []
+        # path => reply (path, args)
+        self.replies = {}
+        self.server = liblo.Server()
+        self.server.add_method(None, None, self.on_message)
+        self.port = int(self.server.port)
+        loop.add_reader(self.server.fileno(), self.recv)
+
+    def recv(self):
+        while self.server.recv(0):
+            pass
+
+    def on_message(self, path, args, types, src):
+        self.messages.append((path, list(args)))
+        if path in self.replies:
+            reply_path, reply_args = self.replies[path]
+            self.server.send(src, reply_path, *reply_args)
+
+    def paths(self):
+        return [path for path, args in self.messages]
+
+    def free(self):
+        self.loop.remove_reader(self.server.fileno())
+        self.server.free()
+
+
+class OscBridgeTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.loop = asyncio.get_running_loop()
+        self.ui = UiStandIn(self.loop)
+        self.bridge = OscBridge("localhost", self.ui.port)
+        self.bridge.start()
+
+    async def asyncTearDown(self):
+        self.bridge.stop()
+        self.ui.free()
+
+    async def wait_messages(self, n, timeout=1.0):
+        deadline = self.loop.time() + timeout
+        while len(self.ui.messages) < n and self.loop.time() < deadline:
+            await asyncio.sleep(0.01)
+
+    async def test_send(self):
+        self.bridge.send("/CUIA/REBOOT", ("s", "CONFIRM"))
+        await self.wait_messages(1)
+        self.assertEqual(self.ui.messages, [("/CUIA/REBOOT", ["CONFIRM"])])
+        self.assertEqual(self.bridge.stats['sent'], 1)
+
+    async def test_cuia_coalescing(self):
+        for i in range(5):
+            self.bridge.cuia("RELOAD_MIDI_CONFIG")
+        self.bridge.cuia("RELOAD_KEY_BINDING")
+        # Nothing is sent before CUIA_DELAY
+        await asyncio.sleep(0)
+        self.assertEqual(self.ui.messages, [])
+        await asyncio.sleep(osc_bridge_module.CUIA_DELAY * 2)
+        await self.wait_messages(2)
+        self.assertEqual(sorted(self.ui.paths()), ["/CUIA/RELOAD_KEY_BINDING", "/CUIA/RELOAD_MIDI_CONFIG"])
+        self.assertEqual(self.bridge.stats['coalesced'], 4)
+        # Once sent, the same CUIA is sent again
+        self.bridge.cuia("RELOAD_MIDI_CONFIG")
+        await asyncio.sleep(osc_bridge_module.CUIA_DELAY * 2)
+        await self.wait_messages(3)
+        self.assertEqual(self.ui.paths().count("/CUIA/RELOAD_MIDI_CONFIG"), 2)
+
+    async def test_stop_sends_pending_cuias(self):
+        self.bridge.cuia("RELOAD_WIRING_LAYOUT")
+        self.bridge.stop()
+        await self.wait_messages(1)
+        self.assertEqual(self.ui.paths(), ["/CUIA/RELOAD_WIRING_LAYOUT"])
+
+    async def test_nop_rate_limit(self):
+        for i in range(10):
+            self.bridge.wake_up()
+        await self.wait_messages(1)
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.ui.paths(), ["/CUIA/NOP"])
+        self.assertEqual(self.bridge.stats['nop_skipped'], 9)
+        # Sent again once NOP_INTERVAL has passed
+        self.bridge.last_nop -= osc_bridge_module.NOP_INTERVAL
+        self.bridge.wake_up()
+        await self.wait_messages(2)
+        self.assertEqual(self.ui.paths(), ["/CUIA/NOP", "/CUIA/NOP"])
+
+    async def test_request_reply(self):
+        self.ui.replies["/get/status"] = ("/status", [("i", 1), ("s", "ok")])
+        args = await self.bridge.request("/get/status", reply_path="/status", timeout=1.0)
+        self.assertEqual(list(args), [1, "ok"])
+        self.assertEqual(self.bridge.stats['replies'], 1)
+        # Waiters are cleaned up
+        self.assertEqual(self.bridge.waiters, {})
+
+    async def test_request_timeout(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.bridge.request("/get/nothing", timeout=0.05)
+        self.assertEqual(self.bridge.stats['timeouts'], 1)
+        self.assertEqual(self.bridge.waiters, {})
+        # A late reply is not delivered to anybody
+        self.ui.server.send(liblo.Address("localhost", self.bridge.server.port), "/get/nothing", 1)
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.bridge.stats['unsolicited'], 1)
+
+    async def test_unsolicited(self):
+        self.ui.server.send(liblo.Address("localhost", self.bridge.server.port), "/whatever", "x")
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.bridge.stats['unsolicited'], 1)
+        self.assertEqual(self.bridge.stats['replies'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ------------------------------------------------------------------------------
@@ -23,6 +23,17 @@
 #
 # ********************************************************************
 
+# autopep8: off
+# Startup profile mode: must be enabled before any other import, to time them all
+from lib.startup_profile import startup_profile, is_enabled as startup_profile_enabled
+if startup_profile_enabled():
+    startup_profile.start()
+
+# Memory tracing from boot (ZYNTHIAN_WEBCONF_TRACEMALLOC=<frames>), started early to trace the imports too
+from lib.memory_monitor import memory_monitor, get_env_frames
+if get_env_frames() > 0:
+    memory_monitor.start(get_env_frames())
+
 import os
 import sys
 import string
@@ -32,44 +43,28 @@ import asyncio
 import tornado.web
 import tornado.ioloop
 import tornado_xstatic
-from terminado import TermSocket, SingleTermManager
+startup_profile.mark("tornado")
+
+# Offline mode: replace device-only modules (zynconf, zyngine, jack, liblo, PAM ...) by in-process fakes
+from lib import fake_backend
+if fake_backend.is_enabled():
+    fake_backend.install()
+    startup_profile.mark("fake backend")
 
-# autopep8: off
 # TODO: This initialisatoin needs to be here before other imports due to odd dependancies but it shouldn't. Need to fix inappropriate inter-dependancies.
 sys.path.append(os.environ.get('ZYNTHIAN_UI_DIR'))
 from zyncoder.zyncore import lib_zyncore_init_minimal
 lib_zyncore_init_minimal()
+startup_profile.mark("zyncore")
 
-from lib.zynterm_handler import ZyntermHandler
-from lib.audio_mixer_handler import AudioConfigMessageHandler, AudioMixerHandler
-from lib.repository_handler import RepositoryHandler
-from lib.midi_log_handler import MidiLogHandler
-from lib.ui_log_handler import UiLogHandler
-from lib.engines_handler import EnginesHandler
-from lib.captures_config_handler import CapturesConfigHandler
-from lib.pianoteq_handler import PianoteqHandler
-from lib.dsp56300_handler import dsp56300Handler
-from lib.zynthian_websocket_handler import ZynthianWebSocketHandler
-from lib.presets_config_handler import PresetsConfigHandler
-from lib.software_update_handler import SoftwareUpdateHandler
-from lib.system_backup_handler import SystemBackupHandler
-from lib.upload_handler import UploadHandler
-from lib.midi_config_handler import MidiConfigHandler
-from lib.snapshot_config_handler import SnapshotConfigHandler, SnapshotRemoveOptionHandler, SnapshotAddOptionsHandler, SnapshotDownloadHandler, SnapshotRemoveChainHandler
-from lib.wifi_config_handler import WifiConfigHandler
-from lib.hwoptions_config_handler import HWOptionsConfigHandler
-from lib.wiring_config_handler import WiringConfigHandler
-from lib.kit_config_handler import KitConfigHandler
-from lib.ui_keybind_handler import UiKeybindHandler
-from lib.ui_config_handler import UiConfigHandler
-from lib.security_config_handler import SecurityConfigHandler
-from lib.poweroff_handler import PoweroffHandler
-from lib.reboot_handler import RebootConfirmedHandler
-from lib.reboot_handler import RebootHandler
-from lib.display_config_handler import DisplayConfigHandler
-from lib.audio_config_handler import AudioConfigHandler
-from lib.dashboard_handler import DashboardHandler
-from lib.login_handler import LoginHandler, LogoutHandler
+# Handler modules are imported on the first request to their routes (see make_app)
+from lib.lazy_handler import LazyApplication
+from lib.tmp_storage import tmp_storage
+from lib.static_assets import static_assets, asset_url, AssetHandler
+from lib.stall_monitor import stall_monitor
+from lib.access_log import access_log
+from lib.graceful_restart import graceful_restart
+from lib.log_pipeline import log_pipeline
 # autopep8: on
 
 # ------------------------------------------------------------------------------
@@ -89,10 +84,8 @@ else:
     log_level = logging.WARNING
     # log_level = logging.ERROR
 
-# Set root logging level
-logging.basicConfig(format='%(levelname)s:%(module)s: %(message)s',
-                    stream=sys.stderr, level=log_level)
-logging.getLogger().setLevel(level=log_level)
+# Set root logging level. Records are queued & written by a background thread.
+log_pipeline.setup(log_level, '%(levelname)s:%(module)s: %(message)s', sys.stderr)
 
 # ------------------------------------------------------------------------------
 # Non cached static files (capture log)
@@ -141,80 +134,125 @@ def make_app():
         "template_whitespace": "single",
         "cookie_secret": get_cookie_secret(),
         "login_url": "/login",
-        "upload_progress_handler": dict()
+        "upload_progress_handler": dict(),
+        "ui_methods": {'asset_url': asset_url},
+        "log_function": access_log.log_request
         # "autoescape": None
     }
 
-    return tornado.web.Application([
-        (r"/$", DashboardHandler),
+    return LazyApplication([
+        (r"/$", "lib.dashboard_handler.DashboardHandler"),
         (r"/mockup/capture/(.*\.log)$",
          CaptureLogStaticFileHandler, {'path': 'mockup/capture'}),
         (r"/mockup/(.*)$", tornado.web.StaticFileHandler,
          {'path': 'mockup'}),
         # (r'/()$', tornado.web.StaticFileHandler, {'path': 'html', "default_filename": "index.html"}),
         (r"/(.*\.html)$", tornado.web.StaticFileHandler, {'path': 'html'}),
-        (r"/(favicon\.ico)$",
-         tornado.web.StaticFileHandler, {'path': 'img'}),
-        (r"/fonts/(.*)$", tornado.web.StaticFileHandler,
-         {'path': 'fonts'}),
-        (r"/img/(.*)$", tornado.web.StaticFileHandler, {'path': 'img'}),
-        (r"/css/(.*)$", tornado.web.StaticFileHandler, {'path': 'css'}),
-        (r"/js/(.*)$", tornado.web.StaticFileHandler, {'path': 'js'}),
+        (r"/(favicon\.ico)$", AssetHandler, {'path': 'img'}),
+        (r"/fonts/(.*)$", AssetHandler, {'path': 'fonts'}),
+        (r"/img/(.*)$", AssetHandler, {'path': 'img'}),
+        (r"/css/(.*)$", AssetHandler, {'path': 'css'}),
+        (r"/js/(.*)$", AssetHandler, {'path': 'js'}),
         # (r"/captures/(.*)$", tornado.web.StaticFileHandler, {'path': 'captures'}),
-        (r"/bower_components/(.*)$", tornado.web.StaticFileHandler,
-         {'path': 'bower_components'}),
-        (r"/login", LoginHandler),
-        (r"/logout", LogoutHandler),
-        (r"/lib-snapshot$", SnapshotConfigHandler),
-        (r"/lib-snapshot/ajax/(.*)$", SnapshotConfigHandler),
-        (r"/lib-snapshot/download/(.*)$", SnapshotDownloadHandler),
-        (r"/lib-snapshot/remove/(.*)/(.*)$", SnapshotRemoveOptionHandler),
-        (r"/lib-snapshot/remove-chain/(.*)/(.*)$", SnapshotRemoveChainHandler),
-        (r"/lib-snapshot/add/(.*)/(.*)$", SnapshotAddOptionsHandler),
-        (r"/lib-presets$", PresetsConfigHandler),
-        (r"/lib-presets/(.*)$", PresetsConfigHandler),
-        (r"/lib-presets/(.*)/(.*)$", PresetsConfigHandler),
-        (r"/lib-captures$", CapturesConfigHandler),
-        (r"/hw-kit$", KitConfigHandler),
-        (r"/hw-audio$", AudioConfigHandler),
-        (r"/hw-audio-mixer$", AudioMixerHandler),
-        (r"/hw-audio-mixer/(.*)/(.*)$", AudioMixerHandler),
-        (r"/hw-display$", DisplayConfigHandler),
-        (r"/hw-wiring$", WiringConfigHandler),
-        (r"/hw-options$", HWOptionsConfigHandler),
-        (r"/sw-update$", SoftwareUpdateHandler),
-        (r"/sw-pianoteq$", PianoteqHandler),
-		(r"/sw-dsp56300$", dsp56300Handler),
-		(r"/sw-engines$", EnginesHandler),
-        (r"/sw-repos$", RepositoryHandler),
-        (r"/ui-options$", UiConfigHandler),
-        (r"/ui-keybind$", UiKeybindHandler),
-        (r"/ui-log$", UiLogHandler),
-        (r"/ui-midi-options$", MidiConfigHandler),
-        (r"/ui-midi-log$", MidiLogHandler),
-        (r"/sys-wifi$", WifiConfigHandler),
-        (r"/sys-backup$", SystemBackupHandler),
-        (r"/sys-security$", SecurityConfigHandler),
-        (r"/sys-reboot$", RebootHandler),
-        (r"/sys-reboot/confirmed$", RebootConfirmedHandler),
-        (r"/sys-poweroff$", PoweroffHandler),
-        (r'/upload$', UploadHandler),
-        (r"/ws$", ZynthianWebSocketHandler),
-        (r"/zynterm", ZyntermHandler),
-        (r"/zynterm_ws", TermSocket, {'term_manager': term_manager}),
+        (r"/bower_components/(.*)$", AssetHandler, {'path': 'bower_components'}),
+        (r"/login", "lib.login_handler.LoginHandler"),
+        (r"/logout", "lib.login_handler.LogoutHandler"),
+        (r"/lib-snapshot$", "lib.snapshot_config_handler.SnapshotConfigHandler"),
+        (r"/lib-snapshot/ajax/(.*)$", "lib.snapshot_config_handler.SnapshotConfigHandler"),
+        (r"/lib-snapshot/download/(.*)$", "lib.snapshot_config_handler.SnapshotDownloadHandler"),
+        (r"/lib-snapshot/remove/(.*)/(.*)$", "lib.snapshot_config_handler.SnapshotRemoveOptionHandler"),
+        (r"/lib-snapshot/remove-chain/(.*)/(.*)$", "lib.snapshot_config_handler.SnapshotRemoveChainHandler"),
+        (r"/lib-snapshot/add/(.*)/(.*)$", "lib.snapshot_config_handler.SnapshotAddOptionsHandler"),
+        (r"/lib-presets$", "lib.presets_config_handler.PresetsConfigHandler"),
+        (r"/lib-presets/(.*)$", "lib.presets_config_handler.PresetsConfigHandler"),
+        (r"/lib-presets/(.*)/(.*)$", "lib.presets_config_handler.PresetsConfigHandler"),
+        (r"/lib-captures$", "lib.captures_config_handler.CapturesConfigHandler"),
+        (r"/hw-kit$", "lib.kit_config_handler.KitConfigHandler"),
+        (r"/hw-audio$", "lib.audio_config_handler.AudioConfigHandler"),
+        (r"/hw-audio-mixer$", "lib.audio_mixer_handler.AudioMixerHandler"),
+        (r"/hw-audio-mixer/(.*)/(.*)$", "lib.audio_mixer_handler.AudioMixerHandler"),
+        (r"/hw-display$", "lib.display_config_handler.DisplayConfigHandler"),
+        (r"/hw-wiring$", "lib.wiring_config_handler.WiringConfigHandler"),
+        (r"/hw-options$", "lib.hwoptions_config_handler.HWOptionsConfigHandler"),
+        (r"/sw-update$", "lib.software_update_handler.SoftwareUpdateHandler"),
+        (r"/sw-pianoteq$", "lib.pianoteq_handler.PianoteqHandler"),
+        (r"/sw-dsp56300$", "lib.dsp56300_handler.dsp56300Handler"),
+        (r"/sw-engines$", "lib.engines_handler.EnginesHandler"),
+        (r"/sw-repos$", "lib.repository_handler.RepositoryHandler"),
+        (r"/ui-options$", "lib.ui_config_handler.UiConfigHandler"),
+        (r"/ui-keybind$", "lib.ui_keybind_handler.UiKeybindHandler"),
+        (r"/ui-log$", "lib.ui_log_handler.UiLogHandler"),
+        (r"/ui-midi-options$", "lib.midi_config_handler.MidiConfigHandler"),
+        (r"/ui-midi-log$", "lib.midi_log_handler.MidiLogHandler"),
+        (r"/sys-wifi$", "lib.wifi_config_handler.WifiConfigHandler"),
+        (r"/sys-backup$", "lib.system_backup_handler.SystemBackupHandler"),
+        (r"/sys-security$", "lib.security_config_handler.SecurityConfigHandler"),
+        (r"/sys-reboot$", "lib.reboot_handler.RebootHandler"),
+        (r"/sys-reboot/confirmed$", "lib.reboot_handler.RebootConfirmedHandler"),
+        (r"/sys-poweroff$", "lib.poweroff_handler.PoweroffHandler"),
+        (r"/sys-perf$", "lib.access_log_handler.AccessLogHandler"),
+        (r"/sys-stalls$", "lib.stall_monitor_handler.StallMonitorHandler"),
+        (r"/sys-update-status$", "lib.update_sys_handler.UpdateSysStatusHandler"),
+        (r"/sys-memory$", "lib.memory_handler.MemoryHandler"),
+        (r"/sys-logging$", "lib.logging_handler.LoggingHandler"),
+        (r"/sys-profiles$", "lib.request_profiler_handler.RequestProfilesHandler"),
+        (r"/sys-profiles/([0-9]+)$", "lib.request_profiler_handler.RequestProfileHandler"),
+        (r"/sys-profiles/([0-9]+)\.pstats$", "lib.request_profiler_handler.RequestProfileDownloadHandler"),
+        (r"/metrics$", "lib.metrics_handler.MetricsHandler"),
+        (r"/api/v1/?$", "lib.api_handler.ApiIndexHandler"),
+        (r"/api/v1/snapshots$", "lib.api_handler.ApiSnapshotsHandler"),
+        (r"/api/v1/presets$", "lib.api_handler.ApiPresetsHandler"),
+        (r"/api/v1/captures$", "lib.api_handler.ApiCapturesHandler"),
+        (r"/api/v1/engines$", "lib.api_handler.ApiEnginesHandler"),
+        (r"/api/v1/midi-ports$", "lib.api_handler.ApiMidiPortsHandler"),
+        (r"/api/v1/system$", "lib.api_handler.ApiSystemHandler"),
+        (r'/upload$', "lib.upload_handler.UploadHandler"),
+        (r"/ws$", "lib.zynthian_websocket_handler.ZynthianWebSocketHandler"),
+        (r"/zynterm", "lib.zynterm_handler.ZyntermHandler"),
+        (r"/zynterm_ws", "terminado.TermSocket", {'term_manager': term_manager}),
         (r"/xstatic/(.*)", tornado_xstatic.XStaticFileHandler,
          {'allowed_modules': ['termjs']})
     ], **settings)
 
 
 async def amain():
+    # A graceful restart keeps the uploads waiting to be installed
+    tmp_storage.init(keep=graceful_restart.reexec)
     app = make_app()
-    app.listen(os.environ.get('ZYNTHIAN_WEBCONF_PORT', 80),
-               max_body_size=MAX_STREAMED_SIZE)
-    app.listen(443, max_body_size=MAX_STREAMED_SIZE, ssl_options={
-        "certfile": "cert/cert.pem",
-        "keyfile": "cert/key.pem"
-    })
+    # Listening sockets may be inherited from systemd or from the previous process (graceful restart)
+    graceful_restart.listen(app, "http", os.environ.get('ZYNTHIAN_WEBCONF_PORT', 80),
+                            max_body_size=MAX_STREAMED_SIZE)
+    if os.path.isfile("cert/cert.pem") and os.path.isfile("cert/key.pem"):
+        graceful_restart.listen(app, "https", os.environ.get('ZYNTHIAN_WEBCONF_SSL_PORT', 443),
+                                max_body_size=MAX_STREAMED_SIZE, ssl_options={
+                                    "certfile": "cert/cert.pem",
+                                    "keyfile": "cert/key.pem"
+                                })
+    else:
+        logging.warning("No SSL certificate => HTTPS disabled")
+    graceful_restart.add_shutdown_callback(term_manager.shutdown)
+    graceful_restart.install_signal_handler()
+    if stall_monitor.threshold_ms > 0:
+        stall_monitor.start()
+    from lib.fs_watcher import fs_watcher
+    fs_watcher.start()
+    graceful_restart.add_shutdown_callback(fs_watcher.stop)
+    if os.environ.get('ZYNTHIAN_WEBCONF_TRANSFER_PORT', "0") not in ("", "0"):
+        from lib.transfer_service import transfer_service
+        transfer_service.start(app)
+    startup_profile.mark("make app & listen")
+
+    # Not needed to accept connections. Done once listening, before serving the first request.
+    from lib.engine_registry import engine_registry
+    engine_registry.load()
+    startup_profile.mark("engine registry")
+    startup_profile.print_report()
+
+    # Removes the temp files of previous runs, then the orphans
+    tmp_storage.start()
+    graceful_restart.add_shutdown_callback(tmp_storage.stop)
+    # Precompress the static assets changed since the last run
+    static_assets.start_build()
     await asyncio.Event().wait()
 
 
@@ -224,6 +262,7 @@ async def ashutdown():
 
 if __name__ == "__main__":
     try:
+        from terminado import SingleTermManager
         term_manager = SingleTermManager(shell_command=['./zynbash.sh'])
         asyncio.run(amain())
     except KeyboardInterrupt: